@@ -0,0 +1,107 @@
+"""Account and region resolution for stack synth
+
+The account id and region of a stack are looked up from a chain of
+sources, the first one knowing a value wins:
+
+    context   cdk.json or `cdk synth -c account=... -c region=...`
+    env       CDK_DEFAULT_ACCOUNT/AWS_ACCOUNT_ID, CDK_DEFAULT_REGION/AWS_DEFAULT_REGION/AWS_REGION
+    cache     values resolved earlier, kept on disk for ttl seconds
+    sts       get_caller_identity, only when nothing else knows the account
+
+Results of the sts source are written to the cache, keyed by the AWS
+profile and access key, so later synths run offline.
+
+"""
+
+import os
+
+from .cache import DiskCache
+from .helpers import get_client
+
+account_env_vars = ('CDK_DEFAULT_ACCOUNT', 'AWS_ACCOUNT_ID')
+region_env_vars = ('CDK_DEFAULT_REGION', 'AWS_DEFAULT_REGION', 'AWS_REGION')
+
+
+class AccountResolver:
+    """Resolve the account id and region from context, env, disk cache or STS"""
+
+    cache_file = os.path.join(os.path.expanduser('~'), '.cache', 'aip', 'account.json')
+    ttl = 12 * 3600
+
+    def __init__(self, scope=None, cache_file: str = None, ttl: float = None, sources: list = None):
+        """Set up the sources
+
+        Parameters
+        ----------
+        scope : core.Construct
+            construct to read the account and region context from
+        cache_file : str
+            json file of the disk cache
+        ttl : float
+            seconds a cached value is valid, 0 disables the cache
+        sources : list
+            callables returning a dict with some of 'account' and 'region',
+            default is context, env, cache and sts
+
+        """
+        self.scope = scope
+        self.cache_file = cache_file or self.cache_file
+        self.ttl = self.ttl if ttl is None else ttl
+        self.cache = DiskCache(self.cache_file, self.ttl)
+        self.sources = sources or [self.from_context, self.from_env, self.from_cache, self.from_sts]
+
+    def resolve(self):
+        """Resolve the account and region
+
+        Returns
+        -------
+        tuple
+            (account_id, region_name)
+
+        Raises
+        ------
+        RuntimeError
+            No source knows the account or the region
+
+        """
+        values = {}
+        for source in self.sources:
+            found = source() or {}
+            for key in ('account', 'region'):
+                if not values.get(key) and found.get(key):
+                    values[key] = found[key]
+            if values.get('account') and values.get('region'):
+                return values['account'], values['region']
+        missing = [v for v in ('account', 'region') if not values.get(v)]
+        raise RuntimeError(f'Unable to resolve {" and ".join(missing)} of the stack')
+
+    def from_context(self):
+        """account and region context values of the scope"""
+        if self.scope is None:
+            return {}
+        return {
+            'account': self.scope.node.try_get_context('account'),
+            'region': self.scope.node.try_get_context('region'),
+        }
+
+    @staticmethod
+    def from_env():
+        """account and region environment variables"""
+        return {
+            'account': next(filter(None, map(os.environ.get, account_env_vars)), None),
+            'region': next(filter(None, map(os.environ.get, region_env_vars)), None),
+        }
+
+    def from_cache(self):
+        """Unexpired values of the disk cache for the current credentials"""
+        return self.cache.read() or {}
+
+    def from_sts(self):
+        """Ask STS, then cache the result"""
+        sts = get_client('sts')
+        values = {
+            'account': sts.get_caller_identity()['Account'],
+            'region': sts.meta.region_name,
+        }
+        self.cache.write(values)
+        return values
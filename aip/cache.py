@@ -0,0 +1,87 @@
+"""Disk cache of AWS lookups
+
+Entries are kept in a json file for ttl seconds, keyed by the AWS
+profile and access key of the current credentials, and by any scope the
+lookup depends on, like the region and stack name:
+
+    cache = DiskCache('~/.cache/aip/outputs.json', 300, 'us-east-1', 'Infra')
+    entry = cache.read() or cache.write(lookup())
+
+Writes are atomic, so concurrent processes share the file safely, and a
+failed read or write only loses the cache.
+
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+
+class DiskCache:
+    """Expiring json entries of the current credentials"""
+
+    def __init__(self, cache_file: str, ttl: float, *scope):
+        """Set up the cache
+
+        Parameters
+        ----------
+        cache_file : str
+            json file of the entries
+        ttl : float
+            seconds an entry is valid, 0 disables the cache
+        scope :
+            values the entry depends on besides the credentials
+
+        """
+        self.cache_file = os.path.expanduser(cache_file)
+        self.ttl = ttl
+        self.scope = scope
+
+    def key(self) -> str:
+        """Profile and access key of the current credentials and the scope, hashed"""
+        identity = ':'.join(map(str, (
+            os.environ.get('AWS_PROFILE', 'default'), os.environ.get('AWS_ACCESS_KEY_ID', ''), *self.scope,
+        )))
+        return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+    def read(self) -> dict:
+        """Unexpired entry, None if there is none"""
+        if not self.ttl:
+            return None
+        entry = self._entries().get(self.key())
+        if entry is None or entry.get('expires_at', 0) < time.time():
+            return None
+        return entry
+
+    def write(self, entry: dict) -> dict:
+        """Write an entry expiring in ttl seconds, nothing is written if the cache is disabled
+
+        Returns
+        -------
+        dict
+            entry, with its expires_at
+
+        """
+        entry = dict(entry, expires_at=time.time() + self.ttl)
+        if not self.ttl:
+            return entry
+        entries = self._entries()
+        entries[self.key()] = entry
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            fd, path = tempfile.mkstemp(dir=os.path.dirname(self.cache_file))
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(entries, fp)
+            os.replace(path, self.cache_file)
+        except OSError:
+            pass
+        return entry
+
+    def _entries(self) -> dict:
+        try:
+            with open(self.cache_file) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,113 @@
+"""CloudFront distribution lookup
+
+All distributions of the account are listed page by page, their tags
+fetched concurrently, and indexed by every origin domain name and by
+tag. The index is kept on disk for ttl seconds, keyed by the AWS profile
+and access key, so showdomain.py and the behave steps share one listing:
+
+    index = DistributionIndex()
+    distribution = index.by_origin(website_domain('eric-devops-demo-web', 'us-east-1'))
+
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from .cache import DiskCache
+from .helpers import get_client
+
+
+def website_domain(bucket_name: str, region_name: str) -> str:
+    """Domain name of the website endpoint of an S3 bucket, the origin of the web distribution"""
+    return f'{bucket_name}.s3-website-{region_name}.amazonaws.com'
+
+
+class DistributionIndex:
+    """CloudFront distributions by origin domain and by tag"""
+
+    cache_file = os.path.join(os.path.expanduser('~'), '.cache', 'aip', 'cloudfront.json')
+    ttl = 300
+
+    def __init__(self, session: boto3.session.Session = None, cache_file: str = None, ttl: float = None):
+        """Set up the index, distributions are listed on first lookup
+
+        Parameters
+        ----------
+        session : boto3.session.Session
+            session of the CloudFront client
+        cache_file : str
+            json file of the disk cache
+        ttl : float
+            seconds the cached index is valid, 0 disables the cache
+
+        """
+        self.session = session or boto3.session.Session()
+        self.cache_file = cache_file or self.cache_file
+        self.ttl = self.ttl if ttl is None else ttl
+        self.cache = DiskCache(self.cache_file, self.ttl)
+        self._index = None
+
+    @property
+    def index(self) -> dict:
+        """{'distributions': {id: summary}, 'origins': {domain: [id]}, 'tags': {'key=value': [id]}}"""
+        if self._index is None:
+            self._index = self.cache.read() or self.refresh()
+        return self._index
+
+    def refresh(self) -> dict:
+        """List the distributions again and rebuild the index"""
+        client = get_client('cloudfront', self.session)
+        distributions = [
+            item
+            for page in client.get_paginator('list_distributions').paginate()
+            for item in page['DistributionList'].get('Items', [])
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tags = list(executor.map(
+                lambda v: client.list_tags_for_resource(Resource=v['ARN'])['Tags'].get('Items', []),
+                distributions,
+            ))
+        self._index = self.cache.write(self.build(distributions, tags))
+        return self._index
+
+    @staticmethod
+    def build(distributions: list, tags: list) -> dict:
+        """Index distribution summaries and their tags
+
+        Parameters
+        ----------
+        distributions : list
+            DistributionSummary items of list_distributions
+        tags : list
+            tag items of each distribution, in the same order
+
+        Returns
+        -------
+        dict
+
+        """
+        index = {'distributions': {}, 'origins': {}, 'tags': {}}
+        for distribution, distribution_tags in zip(distributions, tags):
+            distribution_id = distribution['Id']
+            index['distributions'][distribution_id] = json.loads(json.dumps(distribution, default=str))
+            for origin in distribution['Origins'].get('Items', []):
+                index['origins'].setdefault(origin['DomainName'], []).append(distribution_id)
+            for tag in distribution_tags:
+                index['tags'].setdefault(f'{tag["Key"]}={tag["Value"]}', []).append(distribution_id)
+        return index
+
+    def get(self, distribution_id: str) -> dict:
+        """Distribution summary by id"""
+        return self.index['distributions'].get(distribution_id)
+
+    def by_origin(self, domain_name: str) -> dict:
+        """First distribution having an origin on domain_name, None if there is none"""
+        ids = self.index['origins'].get(domain_name)
+        return self.get(ids[0]) if ids else None
+
+    def by_tag(self, key: str, value: str) -> list:
+        """Distributions tagged key=value"""
+        return [self.get(v) for v in self.index['tags'].get(f'{key}={value}', [])]
@@ -0,0 +1,303 @@
+"""Typed stack configurations
+
+Frozen dataclasses validated at construction, so a missing or misspelt
+setting fails when the configurations are loaded instead of producing
+None resource names in the middle of a synth. Attribute access only
+knows the declared fields; the read API of DotDict (config['name'],
+config.get('name')) is kept for existing callers.
+
+Configurations are immutable, use replace() to derive one per
+environment or stage.
+
+The app configs (demoapp/*/config.json) are read by load_app_configs,
+parsed once and cached until the file changes. An environment's
+config.<env>.json is layered over them. Reading, layering and checking
+the API settings is shared with the API, see load_api_module.
+
+"""
+
+import os
+import sys
+import glob
+import dataclasses
+import importlib.util
+from dataclasses import dataclass, field
+
+# Repository root, app config paths don't depend on the working directory
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_api_module(name: str):
+    """Load a module of demoapp/api, like 'settings' for demoapp/api/settings.py
+
+    The API is built from its directory alone, without the aip package,
+    so the code both need lives there and is loaded by path here. The
+    module is loaded once.
+    """
+    module_name = f'aip._{name}'
+    if module_name not in sys.modules:
+        path = os.path.join(root_dir, 'demoapp', 'api', f'{name}.py')
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = sys.modules[module_name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+_settings = load_api_module('settings')
+ConfigError = _settings.ConfigError
+read_json = _settings.read_json
+merge = _settings.merge
+
+# Keys each app config must have
+required_app_keys = {
+    'api': ('source_repo', 'ecr_repo', 'table_name', 'status_index'),
+    'web': ('source_repo', 'bucket_name'),
+}
+
+
+class ConfigBase:
+    """Validation and dict-like read access of the config dataclasses"""
+
+    __slots__ = ()
+
+    def __post_init__(self):
+        for f in dataclasses.fields(self):
+            value = getattr(self, f.name)
+            expected = (int, float) if f.type is float else f.type
+            if isinstance(value, bool) and f.type is not bool or not isinstance(value, expected):
+                raise ConfigError(
+                    f'{type(self).__name__}.{f.name} should be {f.type.__name__}, got {value!r}')
+            if isinstance(value, str) and not value:
+                raise ConfigError(f'{type(self).__name__}.{f.name} is empty')
+        self.validate()
+
+    def validate(self):
+        """Check values across fields, raise ConfigError if invalid"""
+
+    @classmethod
+    def from_dict(cls, values: dict, **extra):
+        """Create from a dict, like a section of config.json
+
+        Parameters
+        ----------
+        values : dict
+            field values, unknown keys are errors
+        extra :
+            more field values, override values
+
+        Returns
+        -------
+        ConfigBase
+
+        Raises
+        ------
+        ConfigError
+            Unknown, missing or invalid values
+
+        """
+        values = dict(values, **extra)
+        names = {v.name for v in dataclasses.fields(cls)}
+        unknown = set(values) - names
+        if unknown:
+            raise ConfigError(f'Unknown {cls.__name__} settings: {", ".join(sorted(unknown))}')
+        try:
+            return cls(**values)
+        except TypeError as ex:
+            raise ConfigError(f'{cls.__name__}: {ex}') from None
+
+    def replace(self, **changes):
+        """A copy with some fields changed, validated again"""
+        return dataclasses.replace(self, **changes)
+
+    def __getitem__(self, name: str):
+        if name not in self:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__dataclass_fields__
+
+    def get(self, name: str, default=None):
+        return getattr(self, name) if name in self else default
+
+    def keys(self):
+        return list(self.__dataclass_fields__)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.__dataclass_fields__]
+
+    def to_dict(self) -> dict:
+        """Nested plain dict of the values"""
+        return dataclasses.asdict(self)
+
+
+# Fargate memory limits by CPU units: (min, max) MiB
+fargate_memory = {
+    256: (512, 2048),
+    512: (1024, 4096),
+    1024: (2048, 8192),
+    2048: (4096, 16384),
+    4096: (8192, 30720),
+}
+
+
+@dataclass(frozen=True)
+class ServerConfig(ConfigBase):
+    """API task size and server process settings, see gunicorn_conf.py"""
+
+    cpu: int = 256
+    memory: int = 512
+    workers_per_cpu: float = 2
+    max_requests: int = 10000
+    max_requests_jitter: int = 1000
+    timeout: int = 30
+    graceful_timeout: int = 30
+    alb_idle_timeout: int = 60
+    desired_count: int = 2
+
+    def validate(self):
+        if self.cpu not in fargate_memory:
+            raise ConfigError(f'ServerConfig.cpu should be one of {sorted(fargate_memory)}, got {self.cpu}')
+        low, high = fargate_memory[self.cpu]
+        if not low <= self.memory <= high:
+            raise ConfigError(f'ServerConfig.memory should be {low}-{high} for cpu {self.cpu}, got {self.memory}')
+
+
+# DynamoDB billing modes
+billing_modes = ('PROVISIONED', 'PAY_PER_REQUEST')
+
+
+@dataclass(frozen=True)
+class TableConfig(ConfigBase):
+    """DynamoDB table capacity and backups, see aip.stacks.DataStack
+
+    With PROVISIONED billing, read_capacity and write_capacity are the
+    capacity of the table and its status index, and the minimum of their
+    autoscaling. A max_*_capacity above it scales the capacity to keep the
+    utilization at target_utilization percent, 0 turns autoscaling off.
+    """
+
+    billing_mode: str = 'PROVISIONED'
+    read_capacity: int = 10
+    write_capacity: int = 10
+    max_read_capacity: int = 0
+    max_write_capacity: int = 0
+    target_utilization: int = 70
+    point_in_time_recovery: bool = False
+
+    @property
+    def provisioned(self) -> bool:
+        return self.billing_mode == 'PROVISIONED'
+
+    def validate(self):
+        if self.billing_mode not in billing_modes:
+            raise ConfigError(f'TableConfig.billing_mode should be one of {billing_modes}, got {self.billing_mode}')
+        for name in ('read', 'write'):
+            low, high = getattr(self, f'{name}_capacity'), getattr(self, f'max_{name}_capacity')
+            if low < 1:
+                raise ConfigError(f'TableConfig.{name}_capacity should be at least 1, got {low}')
+            if high and high < low:
+                raise ConfigError(f'TableConfig.max_{name}_capacity should be 0 or at least {low}, got {high}')
+        # Target tracking range of DynamoDB
+        if not 20 <= self.target_utilization <= 90:
+            raise ConfigError(f'TableConfig.target_utilization should be 20-90, got {self.target_utilization}')
+
+
+@dataclass(frozen=True)
+class DaxConfig(ConfigBase):
+    """DAX cluster in front of the table, in the private subnets
+
+    item_ttl and query_ttl are the seconds DAX caches items and query
+    results. The API reads and writes items through it, queries go to the
+    table, see demoapp/api/main.py.
+    """
+
+    enabled: bool = False
+    node_type: str = 'dax.t3.small'
+    replication_factor: int = 2
+    item_ttl: int = 5
+    query_ttl: int = 5
+
+    def validate(self):
+        if not 1 <= self.replication_factor <= 10:
+            raise ConfigError(f'DaxConfig.replication_factor should be 1-10, got {self.replication_factor}')
+        if not self.node_type.startswith('dax.'):
+            raise ConfigError(f'DaxConfig.node_type should be a DAX node type, got {self.node_type}')
+
+
+@dataclass(frozen=True)
+class ApiConfig(ConfigBase):
+    """API source, pipeline, image and table names"""
+
+    source_repo: str
+    build_output: str
+    pipeline: str
+    ecr_repo: str
+    table_name: str
+    status_index: str
+    server: ServerConfig
+    table: TableConfig = field(default_factory=TableConfig)
+    dax: DaxConfig = field(default_factory=DaxConfig)
+
+
+@dataclass(frozen=True)
+class WebConfig(ConfigBase):
+    """Web source, pipeline and bucket names"""
+
+    source_repo: str
+    build_output: str
+    pipeline: str
+    bucket_name: str
+
+
+@dataclass(frozen=True)
+class StackConfig(ConfigBase):
+    """Configurations of the stack"""
+
+    vpc_cidr: str
+    cluster_name: str
+    api: ApiConfig
+    web: WebConfig
+    account_id: str
+    region_name: str
+
+
+def load_app_configs(env: str = None, root: str = root_dir) -> dict:
+    """Load the config.json of every app under demoapp
+
+    Parameters
+    ----------
+    env : str
+        environment name, default is the AIP_ENV environment variable.
+        demoapp/<app>/config.<env>.json is merged over config.json
+    root : str
+        repository root
+
+    Returns
+    -------
+    dict
+        App configs by app name, like {'api': {...}, 'web': {...}}
+
+    Raises
+    ------
+    ConfigError
+        An app config misses a required key, or the API config has an
+        unknown or mistyped setting
+
+    """
+    env = env or os.environ.get('AIP_ENV')
+    configs = {}
+    for path in sorted(glob.glob(os.path.join(root, 'demoapp', '*', 'config.json'))):
+        name = os.path.basename(os.path.dirname(path))
+        config = read_json(path)
+        override = os.path.join(os.path.dirname(path), f'config.{env}.json')
+        if env and os.path.exists(override):
+            config = merge(config, read_json(override))
+        configs[name] = config
+    for name, keys in required_app_keys.items():
+        missing = [v for v in keys if not configs.get(name, {}).get(v)]
+        if missing:
+            raise ConfigError(f'demoapp/{name}/config.json misses {", ".join(missing)}')
+    if 'api' in configs:
+        _settings.validate(configs['api'], 'demoapp/api/config.json')
+    return configs
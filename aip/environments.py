@@ -0,0 +1,154 @@
+"""Environment matrix of the stacks
+
+environments.json lists the environments to deploy, each one gets stacks
+of its own, named after its stack_name (see aip.stacks.Infra):
+
+    {
+      "app": "EricDemo",
+      "cidr_pool": "10.20.0.0/14",
+      "environments": [
+        {"name": "default", "stack_name": "Infra", "vpc_cidr": "10.20.0.0/16"},
+        {"name": "prod", "region": "eu-west-1", "server": {"cpu": 1024, "memory": 2048}}
+      ]
+    }
+
+name selects the config.<name>.json overrides of the apps and is passed
+to the API container as AIP_ENV. account and region default to the ones
+resolved by AccountResolver. Environments without vpc_cidr get the next
+free /16 of cidr_pool, in matrix order, so CIDRs never overlap and don't
+change between synths. server overrides the API server section.
+
+"""
+
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .account import AccountResolver
+from .config import ConfigBase, ConfigError, load_app_configs, merge, read_json, root_dir
+
+environments_file = f'{root_dir}/environments.json'
+
+
+@dataclass(frozen=True)
+class Environment(ConfigBase):
+    """A resolved environment of the matrix"""
+
+    name: str
+    stack_name: str
+    app: str
+    account: str
+    region: str
+    vpc_cidr: str
+    app_configs: dict
+
+    @property
+    def prefix(self):
+        """Prefix of the resource names, like EricDemo or EricDemoProd"""
+        return self.app if self.name == 'default' else f'{self.app}{self.name.title()}'
+
+
+def allocate_cidrs(entries: list, pool: str, prefix: int = 16):
+    """VPC CIDR of each environment
+
+    Parameters
+    ----------
+    entries : list
+        environment entries of the matrix, vpc_cidr is kept if set
+    pool : str
+        network the missing CIDRs are allocated from
+    prefix : int
+        prefix length of the allocated CIDRs
+
+    Returns
+    -------
+    list
+        CIDR strings in the order of entries
+
+    Raises
+    ------
+    ConfigError
+        CIDRs overlap or the pool is exhausted
+
+    """
+    networks = [entry.get('vpc_cidr') and ipaddress.ip_network(entry['vpc_cidr']) for entry in entries]
+    taken = [v for v in networks if v]
+    for i, network in enumerate(taken):
+        for other in taken[i + 1:]:
+            if network.overlaps(other):
+                raise ConfigError(f'VPC CIDRs {network} and {other} overlap')
+    free = (v for v in ipaddress.ip_network(pool).subnets(new_prefix=prefix)
+            if not any(v.overlaps(t) for t in taken))
+    result = []
+    for entry, network in zip(entries, networks):
+        if network is None:
+            network = next(free, None)
+            if network is None:
+                raise ConfigError(f'No free /{prefix} left in {pool} for {entry["name"]}')
+        result.append(str(network))
+    return result
+
+
+def _resolve(context: dict, entry: dict, vpc_cidr: str, matrix: dict):
+    """Resolve account, region and app configs of a matrix entry"""
+    resolver = AccountResolver()
+    resolver.sources[:1] = [
+        lambda: {'account': entry.get('account'), 'region': entry.get('region')},
+        lambda: context,
+    ]
+    account, region = resolver.resolve()
+    app_configs = load_app_configs(entry['name'])
+    if entry.get('server'):
+        app_configs['api'] = merge(app_configs['api'], {'server': entry['server']})
+    return Environment(
+        name=entry['name'],
+        stack_name=entry.get('stack_name') or f'Infra-{entry["name"]}',
+        app=matrix['app'],
+        account=account,
+        region=region,
+        vpc_cidr=vpc_cidr,
+        app_configs=app_configs,
+    )
+
+
+def load_environments(scope=None, names: list = None, path: str = environments_file):
+    """Load and resolve the environments of the matrix
+
+    Account/region lookups and config loading run in parallel, they may
+    reach STS. Stacks are built from the result afterwards.
+
+    Parameters
+    ----------
+    scope : core.Construct
+        construct to read the account and region context from
+    names : list
+        environment names to keep, all if not given
+    path : str
+        matrix file
+
+    Returns
+    -------
+    list
+        Environment in matrix order
+
+    Raises
+    ------
+    ConfigError
+        Invalid matrix or unknown environment name
+
+    """
+    matrix = read_json(path)
+    entries = matrix['environments']
+    if len({v['name'] for v in entries}) != len(entries):
+        raise ConfigError('Environment names should be unique')
+    # Allocated on the whole matrix, so selecting environments doesn't move CIDRs
+    cidrs = dict(zip((v['name'] for v in entries), allocate_cidrs(entries, matrix['cidr_pool'])))
+    if names:
+        unknown = set(names) - set(cidrs)
+        if unknown:
+            raise ConfigError(f'Unknown environments: {", ".join(sorted(unknown))}')
+        entries = [v for v in entries if v['name'] in names]
+    # jsii calls aren't thread safe, read the context before
+    context = AccountResolver(scope).from_context()
+    with ThreadPoolExecutor(max_workers=max(1, len(entries))) as executor:
+        return list(executor.map(lambda v: _resolve(context, v, cidrs[v['name']], matrix), entries))
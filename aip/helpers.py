@@ -1,12 +1,11 @@
-import sys
-import io
+import os
 import re
-import logging
+
+from .config import load_api_module, read_json, root_dir
 
 require_regx = re.compile(r'^-r\s+(.+?)\.txt$')
 editable_regx = re.compile(r'^(?:-e\s+|)(.+?#egg=(.+))')
 
-
 class DotDict(dict):
     """ dot.notation access to dictionary attributes.
     Examples:
@@ -19,40 +18,14 @@ class DotDict(dict):
     __delattr__ = dict.__delitem__
 
 
-def get_logger(
-    name: str,
-    level: int = logging.INFO,
-    stream: io.TextIOWrapper = sys.stdout,
-    log_format: str = '[{levelname}] [{asctime}.{msecs:.0f}] {name} {message}',
-    date_format: str = '%Y-%m-%d %H:%M:%S',
-) -> logging.Logger:
-    """A helper function to get logger for printing logs
+_settings = load_api_module('settings')
+boto_defaults = _settings.boto_defaults
 
-    Parameters
-    ----------
-    name : str
-        logger name showing in the log
-    level : int
-        log level, logging.DEBUG, INFO, WARN, ERROR, CRITICAL
-    stream : io.TextIOWrapper
-        stream to print out the log
-    log_format : str
-        log_format
-    date_format : str
-        datetime format in the log
-
-    Returns
-    -------
-    logging.Logger
-
-    """
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    formatter = logging.Formatter(log_format, datefmt=date_format, style='{')
-    ch = logging.StreamHandler(stream)
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-    return logger
+_logs = load_api_module('logs')
+JSONFormatter = _logs.JSONFormatter
+SamplingFilter = _logs.SamplingFilter
+get_logger = _logs.get_logger
+stop_loggers = _logs.stop_loggers
 
 
 def get_install_requires(name: str = 'base', base_dir: str = 'requirements') -> list:
@@ -89,3 +62,79 @@ def get_install_requires(name: str = 'base', base_dir: str = 'requirements') ->
                 continue
             requirements.append(req)
     return requirements
+
+
+def get_boto_settings(
+    env: str = None, config_file: str = os.path.join(root_dir, 'demoapp', 'api', 'config.json'),
+) -> dict:
+    """Get boto3 client settings of an environment, see demoapp/api/settings.py
+
+    Parameters
+    ----------
+    env : str
+        environment name, default is the AIP_ENV environment variable
+    config_file : str
+        json file with the "boto" section
+
+    Returns
+    -------
+    dict
+        boto_defaults updated by the default and the env settings
+
+    """
+    return _settings.get_boto_settings(read_json(config_file), env)
+
+
+def get_boto_config(settings: dict = None, **overrides) -> 'botocore.config.Config':
+    """Build the botocore Config of boto3 clients, see demoapp/api/settings.py
+
+    Parameters
+    ----------
+    settings : dict
+        client settings, see get_boto_settings, loaded if not given
+    overrides :
+        settings to override, like max_pool_connections=50
+
+    Returns
+    -------
+    botocore.config.Config
+
+    """
+    return _settings.get_boto_config(get_boto_settings() if settings is None else settings, **overrides)
+
+
+def get_client(service: str, session: 'boto3.session.Session' = None, **overrides):
+    """Create a boto3 client with the tuned Config
+
+    Parameters
+    ----------
+    service : str
+        service name, like 'dynamodb'
+    session : boto3.session.Session
+        session to create the client from, a new one if not given
+    overrides :
+        settings to override, see get_boto_config
+
+    Returns
+    -------
+    botocore.client.BaseClient
+
+    """
+    import boto3
+
+    session = session or boto3.session.Session()
+    return session.client(service, config=get_boto_config(**overrides))
+
+
+def get_resource(service: str, session: 'boto3.session.Session' = None, **overrides):
+    """Create a boto3 resource with the tuned Config, see get_client
+
+    Returns
+    -------
+    boto3.resources.base.ServiceResource
+
+    """
+    import boto3
+
+    session = session or boto3.session.Session()
+    return session.resource(service, config=get_boto_config(**overrides))
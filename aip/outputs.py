@@ -0,0 +1,97 @@
+"""Outputs of the deployed stacks
+
+The stacks of an environment output the names and ids of the resources
+the tooling needs, see aip.stacks.BaseStack.add_outputs. They are read
+with a single paginated describe_stacks call for the stacks named
+<stack_name>-<suffix> of stack_suffixes, and kept on disk for ttl
+seconds, keyed by the AWS profile and access key:
+
+    outputs = StackOutputs('Infra')
+    outputs.get('ClusterArn')
+    outputs.of_stack('Compute')
+
+"""
+
+import os
+
+import boto3
+
+from .cache import DiskCache
+from .helpers import get_client
+
+# Stacks of an environment by name suffix, see aip.stacks.Infra. Only
+# these are read: Infra-dev-Compute isn't a stack of Infra
+stack_suffixes = ('Network', 'Data', 'Compute', 'Delivery', 'Pipelines')
+
+
+class StackOutputs:
+    """Outputs of the deployed stacks of an environment"""
+
+    cache_file = os.path.join(os.path.expanduser('~'), '.cache', 'aip', 'outputs.json')
+    ttl = 300
+
+    def __init__(
+        self, stack_name: str = 'Infra', session: boto3.session.Session = None,
+        cache_file: str = None, ttl: float = None,
+    ):
+        """Set up the outputs, the stacks are described on first lookup
+
+        Parameters
+        ----------
+        stack_name : str
+            stack name prefix of the environment, see aip.stacks.Infra
+        session : boto3.session.Session
+            session of the CloudFormation client
+        cache_file : str
+            json file of the disk cache
+        ttl : float
+            seconds the cached outputs are valid, 0 disables the cache
+
+        """
+        self.stack_name = stack_name
+        self.session = session or boto3.session.Session()
+        self.cache_file = cache_file or self.cache_file
+        self.ttl = self.ttl if ttl is None else ttl
+        self.cache = DiskCache(self.cache_file, self.ttl, self.session.region_name, stack_name)
+        self._stacks = None
+
+    @property
+    def stacks(self) -> dict:
+        """{stack name suffix: {output key: value}}, like {'Compute': {'ClusterArn': ...}}"""
+        if self._stacks is None:
+            entry = self.cache.read()
+            self._stacks = entry['stacks'] if entry else self.refresh()
+        return self._stacks
+
+    def refresh(self) -> dict:
+        """Describe the stacks again, after a deploy"""
+        client = get_client('cloudformation', self.session)
+        names = {f'{self.stack_name}-{v}': v for v in stack_suffixes}
+        self._stacks = {
+            names[stack['StackName']]: {v['OutputKey']: v['OutputValue'] for v in stack.get('Outputs', [])}
+            for page in client.get_paginator('describe_stacks').paginate()
+            for stack in page['Stacks']
+            if stack['StackName'] in names
+        }
+        self.cache.write({'stacks': self._stacks})
+        return self._stacks
+
+    def of_stack(self, name: str) -> dict:
+        """Outputs of a stack by name suffix, like 'Compute', empty if it's not deployed"""
+        return self.stacks.get(name, {})
+
+    def get(self, key: str, default=None):
+        """Value of an output of any stack of the environment
+
+        Parameters
+        ----------
+        key : str
+            output key, like 'ClusterArn'
+        default :
+            value if no stack has the output, like stacks deployed before it was added
+
+        """
+        for outputs in self.stacks.values():
+            if key in outputs:
+                return outputs[key]
+        return default
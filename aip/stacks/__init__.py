@@ -1,36 +1,56 @@
 import os
-import json
-import boto3
 from aws_cdk import core
+from ..config import ApiConfig, DaxConfig, ServerConfig, StackConfig, TableConfig, WebConfig
+from ..environments import Environment, load_environments
 from ..helpers import DotDict
 
 
 class BaseStack(core.Stack):
     """Stack configurations like bucket or repo names"""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, environment: Environment = None, **kwargs):
         """Set all configurations that the stack class needs
+
+        The account and region are resolved offline when possible, see
+        aip.account.AccountResolver.
+
+        Parameters
+        ----------
+        environment : aip.environments.Environment
+            environment of the matrix to build, the default one if not given
+
+        Raises
+        ------
+        aip.config.ConfigError
+            A configuration is missing or invalid
         """
 
-        sts = boto3.client('sts')
-        app = 'EricDemo'
+        if environment is None:
+            environment = load_environments(args[0] if args else kwargs.get('scope'), ['default'])[0]
+        # Stack.environment is the CDK env string
+        self.target_env = environment
+        app = environment.prefix
         app_config = self._load_configs()
 
-        self.config = DotDict(
-            vpc_cidr='10.20.0.0/16',
+        self.config = StackConfig(
+            vpc_cidr=environment.vpc_cidr,
             cluster_name=f'{app}Cluster',
 
             # API config
-            api=DotDict(
+            api=ApiConfig(
                 source_repo=app_config.api.source_repo,
                 build_output=f'{app}ApiBuildOutput',
                 pipeline=f'{app}ApiPipeline',
                 ecr_repo=app_config.api.ecr_repo,
                 table_name=app_config.api.table_name,
+                status_index=app_config.api.status_index,
+                server=ServerConfig.from_dict(app_config.api.server or {}),
+                table=TableConfig.from_dict(app_config.api.table or {}),
+                dax=DaxConfig.from_dict(app_config.api.dax or {}),
             ),
 
             # WEB config
-            web=DotDict(
+            web=WebConfig(
                 source_repo=app_config.web.source_repo,
                 build_output=f'{app}WebBuildOutput',
                 pipeline=f'{app}WebPipeline',
@@ -38,22 +58,25 @@ class BaseStack(core.Stack):
             ),
 
             # Account info
-            account_id=sts.get_caller_identity()['Account'],
-            region_name=sts.meta.region_name,
+            account_id=environment.account,
+            region_name=environment.region,
         )
         kwargs['env'] = core.Environment(
             account=self.config.account_id, region=self.config.region_name)
         super().__init__(*args, **kwargs)
 
+    def add_outputs(self, **values):
+        """Add stack outputs, by output key
+
+        The tooling reads them with one describe_stacks call instead of
+        searching the resources, see aip.outputs.StackOutputs.
+        """
+        for key, value in values.items():
+            core.CfnOutput(self, key, value=value)
+
     def _load_configs(self):
-        with open('demoapp/api/config.json') as fp:
-            api_config = DotDict(json.load(fp))
-        with open('demoapp/web/config.json') as fp:
-            web_config = DotDict(json.load(fp))
-        return DotDict(
-            api=api_config,
-            web=web_config,
-        )
+        """App configs of the environment, see aip.config.load_app_configs"""
+        return DotDict({name: DotDict(config) for name, config in self.target_env.app_configs.items()})
 
 
 for filename in os.listdir(os.path.dirname(__file__)):
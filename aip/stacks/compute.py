@@ -0,0 +1,190 @@
+"""Compute stack: ECS cluster with Fargate service and Load Balancer"""
+
+from aws_cdk import (
+    core,
+
+    aws_ec2 as ec2,
+    aws_ecr as ecr,
+    aws_iam as iam,
+
+    aws_ecs as ecs,
+    aws_dynamodb as db,
+    aws_ecs_patterns as patterns,
+)
+
+from . import BaseStack
+
+
+class ComputeStack(BaseStack):
+    """ECS cluster and the API Fargate service"""
+
+    def __init__(
+        self, scope: core.Construct, construct_id: str, vpc: ec2.IVpc, table: db.ITable,
+        dax_arn: str = None, dax_endpoint: str = None, **kwargs
+    ) -> None:
+        """ComputeStack.__init__.
+
+        Parameters
+        ----------
+        scope : core.Construct
+        construct_id : str
+        vpc : aws_ec2.IVpc
+            VPC of the NetworkStack
+        table : aws_dynamodb.ITable
+            table of the DataStack
+        dax_arn : str
+            ARN of the DAX cluster of the DataStack, None without DAX
+        dax_endpoint : str
+            discovery endpoint URL of the DAX cluster, set as DAX_ENDPOINT of the API
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.vpc = vpc
+        self.dax_endpoint = dax_endpoint
+        self.cluster = self.setup_cluster()
+        self.ecr_repo = self.setup_api_ecr()
+        self.service = self.setup_service()
+        self.setup_table_access(table)
+        if dax_arn:
+            self.setup_dax_access(dax_arn)
+        self.add_outputs(
+            ClusterArn=self.cluster.cluster_arn,
+            ServiceName=self.service.service.service_name,
+            TaskRoleName=self.service.task_definition.task_role.role_name,
+            LoadBalancerDnsName=self.service.load_balancer.load_balancer_dns_name,
+        )
+
+    def setup_table_access(self, table: db.ITable):
+        """Allow the Fargate task to access the DynamoDB table
+
+        Notes
+        -----
+        Have to assign dynamodb scan,read/write permissions to Fargate task.
+        The table is passed as ITable, grant the index access here.
+
+        Parameters
+        ----------
+        table : aws_dynamodb.ITable
+            table of the DataStack
+        """
+
+        self.service.task_definition.add_to_task_role_policy(iam.PolicyStatement(
+            resources=[
+                table.table_arn,
+                f'{table.table_arn}/index/{self.config.api.status_index}',
+            ],
+            actions=[
+                "dynamodb:Scan",
+                "dynamodb:Query",
+                'dynamodb:GetItem',
+                "dynamodb:PutItem",
+                'dynamodb:UpdateItem',
+                "dynamodb:DeleteItem",
+                "dynamodb:BatchGetItem",
+                "dynamodb:BatchWriteItem",
+                # connect() checks the table exists, /ready fails without it
+                'dynamodb:DescribeTable',
+            ],
+            sid='AllowFargateAccessDynamoDB'
+        ))
+
+    def setup_dax_access(self, dax_arn: str):
+        """Allow the Fargate task to read and write items through DAX
+
+        Parameters
+        ----------
+        dax_arn : str
+            ARN of the DAX cluster of the DataStack
+        """
+
+        self.service.task_definition.add_to_task_role_policy(iam.PolicyStatement(
+            resources=[dax_arn],
+            actions=[
+                'dax:GetItem',
+                'dax:BatchGetItem',
+                'dax:PutItem',
+                'dax:UpdateItem',
+                'dax:BatchWriteItem',
+            ],
+            sid='AllowFargateAccessDAX'
+        ))
+
+    def setup_cluster(self):
+        """Setup ECS cluster"""
+
+        return ecs.Cluster(
+            self, 'Cluster', vpc=self.vpc,
+            cluster_name=self.config.cluster_name,
+        )
+
+    def setup_service(self):
+        """Setup ALB Fargate service
+
+        Notes
+        -----
+        The container_name in task_image_options shoue be an exsiting image in
+        ECR repository. Otherwise, the CFN stack will be stuck waiting for the image.
+
+        CPU and memory come from the server section of the API config.json,
+        the API image runs as many workers as the CPU allocation allows, so
+        resizing the task there scales the throughput of each task.
+
+        Returns
+        -------
+        aws_ecs_patterns.ApplicationLoadBalancedFargateService
+
+        """
+
+        server = self.config.api.server
+        # gunicorn sizes its workers by the CPU allocation,
+        # the API reads the config.<env>.json of its environment
+        environment = {'TASK_CPU': str(server.cpu), 'AIP_ENV': self.target_env.name}
+        if self.dax_endpoint:
+            environment['DAX_ENDPOINT'] = self.dax_endpoint
+        service = patterns.ApplicationLoadBalancedFargateService(
+            self, 'FargateService',
+            cluster=self.cluster,       # Required
+            cpu=server.cpu,             # 1024 per vCPU
+            memory_limit_mib=server.memory,
+            desired_count=server.desired_count,
+            task_image_options=patterns.ApplicationLoadBalancedTaskImageOptions(
+                container_name=self.config.api.ecr_repo,
+                container_port=80,
+                image=ecs.ContainerImage.from_ecr_repository(self.ecr_repo),
+                environment=environment),
+            public_load_balancer=True
+        )
+        # The API keepalive is longer than it, see gunicorn_conf.py
+        service.load_balancer.set_attribute(
+            'idle_timeout.timeout_seconds', str(server.alb_idle_timeout))
+        # The API connects DynamoDB in the background, take traffic once it's ready
+        service.target_group.configure_health_check(
+            path='/ready',
+            healthy_http_codes='200',
+            interval=core.Duration.seconds(10),
+            healthy_threshold_count=2,
+        )
+        return service
+
+    def setup_api_ecr(self):
+        """Get ECR repository for API image
+
+        Notes
+        -----
+        The repo and the image should be existing before the stack deploy.
+        Otherwise, the CFN stack creation will be stuck
+
+        Returns
+        -------
+        aws_ecr.Repository object will be used in ALB Fargate service
+
+        """
+
+        return ecr.Repository.from_repository_name(
+            self, 'Repository', repository_name=self.config.api.ecr_repo
+        )
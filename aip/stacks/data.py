@@ -0,0 +1,173 @@
+"""Data stack: DynamoDB table of the API and its DAX cluster"""
+
+from aws_cdk import (
+    core,
+
+    aws_ec2 as ec2,
+    aws_iam as iam,
+    aws_dax as dax,
+    aws_dynamodb as db,
+)
+
+from . import BaseStack
+
+# Port of unencrypted DAX connections
+dax_port = 8111
+
+
+class DataStack(BaseStack):
+    """DynamoDB table of the API, with an optional DAX cluster in front of it"""
+
+    def __init__(self, scope: core.Construct, construct_id: str, vpc: ec2.IVpc, **kwargs) -> None:
+        """DataStack.__init__.
+
+        Parameters
+        ----------
+        scope : core.Construct
+        construct_id : str
+        vpc : aws_ec2.IVpc
+            VPC of the NetworkStack, the DAX cluster is in its private subnets
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.vpc = vpc
+        self.table = self.setup_db()
+        self.dax = self.setup_dax() if self.config.api.dax.enabled else None
+
+        outputs = dict(TableName=self.table.table_name)
+        if self.dax is not None:
+            outputs['DaxEndpoint'] = self.dax_endpoint
+        self.add_outputs(**outputs)
+
+    @property
+    def dax_endpoint(self):
+        """Discovery endpoint URL of the DAX cluster, None without DAX"""
+        if self.dax is None:
+            return None
+        return f'dax://{self.dax.attr_cluster_discovery_endpoint}'
+
+    def setup_db(self):
+        """Setup DynamoDB database
+
+        Notes
+        -----
+        The table has the id key and the status index the API queries for
+        task listing, see SimpleTodoDB._table_spec. The billing mode,
+        capacity and backups come from the table section of the API
+        config.json. The table is kept when the stack is deleted.
+        ComputeStack grants the Fargate task access to it.
+
+        Returns
+        -------
+        aws_dynamodb.Table
+        """
+
+        settings = self.config.api.table
+        capacity = dict(
+            read_capacity=settings.read_capacity,
+            write_capacity=settings.write_capacity,
+        ) if settings.provisioned else {}
+
+        table = db.Table(
+            self, 'Table',
+            table_name=self.config.api.table_name,
+            partition_key=db.Attribute(name='id', type=db.AttributeType.STRING),
+            billing_mode=db.BillingMode.PROVISIONED if settings.provisioned else db.BillingMode.PAY_PER_REQUEST,
+            point_in_time_recovery=settings.point_in_time_recovery,
+            removal_policy=core.RemovalPolicy.RETAIN,
+            **capacity,
+        )
+        table.add_global_secondary_index(
+            index_name=self.config.api.status_index,
+            partition_key=db.Attribute(name='task_status', type=db.AttributeType.STRING),
+            sort_key=db.Attribute(name='created_at', type=db.AttributeType.STRING),
+            projection_type=db.ProjectionType.ALL,
+            **capacity,
+        )
+        if settings.provisioned:
+            self.setup_autoscaling(table)
+        return table
+
+    def setup_autoscaling(self, table: db.Table):
+        """Scale the provisioned capacity of the table and its status index
+
+        The capacity tracks target_utilization percent, between the
+        configured capacity and max_read_capacity / max_write_capacity.
+        A max of 0 keeps the capacity fixed.
+
+        Parameters
+        ----------
+        table : aws_dynamodb.Table
+        """
+
+        settings = self.config.api.table
+        index_name = self.config.api.status_index
+        scalables = []
+        if settings.max_read_capacity:
+            limits = dict(min_capacity=settings.read_capacity, max_capacity=settings.max_read_capacity)
+            scalables += [
+                table.auto_scale_read_capacity(**limits),
+                table.auto_scale_global_secondary_index_read_capacity(index_name, **limits),
+            ]
+        if settings.max_write_capacity:
+            limits = dict(min_capacity=settings.write_capacity, max_capacity=settings.max_write_capacity)
+            scalables += [
+                table.auto_scale_write_capacity(**limits),
+                table.auto_scale_global_secondary_index_write_capacity(index_name, **limits),
+            ]
+        for scalable in scalables:
+            scalable.scale_on_utilization(target_utilization_percent=settings.target_utilization)
+
+    def setup_dax(self):
+        """Setup the DAX cluster in the private subnets
+
+        Notes
+        -----
+        Clients in the VPC connect on port 8111. Items and query results
+        are cached for item_ttl and query_ttl seconds of the dax section of
+        the API config.json.
+
+        Returns
+        -------
+        aws_dax.CfnCluster
+        """
+
+        settings = self.config.api.dax
+        role = iam.Role(self, 'DaxRole', assumed_by=iam.ServicePrincipal('dax.amazonaws.com'))
+        self.table.grant_read_write_data(role)
+
+        subnet_group = dax.CfnSubnetGroup(
+            self, 'DaxSubnetGroup',
+            description='Private subnets of the DAX cluster',
+            subnet_ids=self.vpc.select_subnets(subnet_type=ec2.SubnetType.PRIVATE).subnet_ids,
+        )
+        parameter_group = dax.CfnParameterGroup(
+            self, 'DaxParameterGroup',
+            description='Cache TTLs of the DAX cluster',
+            parameter_name_values={
+                'record-ttl-millis': str(settings.item_ttl * 1000),
+                'query-ttl-millis': str(settings.query_ttl * 1000),
+            },
+        )
+        security_group = ec2.SecurityGroup(
+            self, 'DaxSecurityGroup', vpc=self.vpc,
+            description='DAX cluster of the API table',
+        )
+        security_group.add_ingress_rule(
+            ec2.Peer.ipv4(self.config.vpc_cidr), ec2.Port.tcp(dax_port), 'DAX clients in the VPC')
+
+        return dax.CfnCluster(
+            self, 'Dax',
+            iam_role_arn=role.role_arn,
+            node_type=settings.node_type,
+            replication_factor=settings.replication_factor,
+            subnet_group_name=subnet_group.ref,
+            parameter_group_name=parameter_group.ref,
+            security_group_ids=[security_group.security_group_id],
+            sse_specification=dax.CfnCluster.SSESpecificationProperty(sse_enabled=True),
+        )
@@ -0,0 +1,106 @@
+"""Web delivery stack: website bucket and CloudFront"""
+
+from aws_cdk import (
+    core,
+
+    aws_s3 as s3,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_cloudfront as cf,
+    aws_cloudfront_origins as origins,
+)
+
+from . import BaseStack
+
+
+class DeliveryStack(BaseStack):
+    """Website bucket and the CloudFront distribution in front of it and the API"""
+
+    def __init__(
+        self, scope: core.Construct, construct_id: str, load_balancer: elbv2.ILoadBalancerV2, **kwargs
+    ) -> None:
+        """DeliveryStack.__init__.
+
+        Parameters
+        ----------
+        scope : core.Construct
+        construct_id : str
+        load_balancer : aws_elasticloadbalancingv2.ILoadBalancerV2
+            load balancer of the API service, origin of /api/*
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.load_balancer = load_balancer
+        self.web_bucket = self.setup_web_bucket()
+        self.distribution = self.setup_cloudfront()
+        self.add_outputs(
+            WebBucketName=self.web_bucket.bucket_name,
+            DistributionId=self.distribution.distribution_id,
+            DistributionDomainName=self.distribution.distribution_domain_name,
+        )
+
+    def setup_web_bucket(self):
+        """Setup S3 bucket to host website
+
+        Returns
+        -------
+        aws_s3.Bucket to host the web front end
+        """
+
+        return s3.Bucket(
+            self, 'WebBucket',
+            bucket_name=self.config.web.bucket_name,
+            public_read_access=True,
+            removal_policy=core.RemovalPolicy.DESTROY,
+            website_index_document='index.html',
+        )
+
+    def setup_cloudfront(self):
+        """Setup CloudFront
+            / is pointing to S3
+            /api is pointing to Load Balancer
+
+        Notes
+        -----
+        The API sends ETag with Cache-Control: no-cache on task lists, so
+        /api responses are cached with 0 default TTL: CloudFront revalidates
+        every request with If-None-Match, answered by a cheap 304 from the API.
+        Query strings are part of the cache key for list pagination.
+
+        Returns
+        -------
+        aws_cloudfront.Distribution that redirecting traffic to ALB
+
+        """
+
+        api_cache_policy = cf.CachePolicy(
+            self, 'ApiCachePolicy',
+            comment='Revalidate API responses by ETag',
+            default_ttl=core.Duration.seconds(0),
+            min_ttl=core.Duration.seconds(0),
+            max_ttl=core.Duration.days(1),
+            query_string_behavior=cf.CacheQueryStringBehavior.all(),
+            header_behavior=cf.CacheHeaderBehavior.none(),
+            cookie_behavior=cf.CacheCookieBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
+        return cf.Distribution(
+            self, 'CloudFront',
+            default_behavior=cf.BehaviorOptions(
+                origin=origins.S3Origin(self.web_bucket)),
+            additional_behaviors={
+                '/api/*': cf.BehaviorOptions(
+                    origin=origins.LoadBalancerV2Origin(
+                        self.load_balancer,
+                        protocol_policy=cf.OriginProtocolPolicy.HTTP_ONLY,
+                    ),
+                    cache_policy=api_cache_policy,
+                    allowed_methods=cf.AllowedMethods.ALLOW_ALL,
+                )
+            }
+        )
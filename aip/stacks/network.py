@@ -0,0 +1,60 @@
+"""Network stack: VPC and subnets"""
+
+from aws_cdk import (
+    core,
+
+    aws_ec2 as ec2,
+)
+
+from . import BaseStack
+
+
+class NetworkStack(BaseStack):
+    """VPC of the environment"""
+
+    def __init__(self, scope: core.Construct, construct_id: str, **kwargs) -> None:
+        """NetworkStack.__init__.
+
+        Parameters
+        ----------
+        scope : core.Construct
+        construct_id : str
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.vpc = self.setup_vpc()
+        self.add_outputs(VpcId=self.vpc.vpc_id)
+
+    def setup_vpc(self):
+        """Setup VPC and network
+
+        Create Vpc with 2 subnets on 2 availability zones, in the /16 of the
+        environment, like for 10.20.0.0/16:
+            Public:  10.20.0.0/24 on AZ1 | 10.20.1.0/24 on AZ2
+            Private: 10.20.2.0/24 on AZ1 | 10.20.3.0/24 on AZ2
+
+        Returns
+        -------
+        aws_ce2.Vpc
+        """
+
+        return ec2.Vpc(
+            self, 'Vpc', cidr=self.config.vpc_cidr,
+            max_azs=2,
+            subnet_configuration=[
+                ec2.SubnetConfiguration(
+                    subnet_type=ec2.SubnetType.PUBLIC,
+                    name='Public',
+                    cidr_mask=24,
+                ), ec2.SubnetConfiguration(
+                    subnet_type=ec2.SubnetType.PRIVATE,
+                    name='Application',
+                    cidr_mask=24,
+                )
+            ]
+        )
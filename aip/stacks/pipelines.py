@@ -0,0 +1,313 @@
+"""CI/CD stack: build projects and pipelines of the API and the website"""
+
+from aws_cdk import (
+    core,
+
+    aws_s3 as s3,
+    aws_ecr as ecr,
+    aws_iam as iam,
+    aws_ecs as ecs,
+
+    aws_codecommit as cc,
+    aws_codebuild as cb,
+    aws_codepipeline as cp,
+    aws_codepipeline_actions as cp_actions,
+)
+
+from . import BaseStack
+
+
+class PipelineStack(BaseStack):
+    """Pipelines deploying the API image and the website"""
+
+    def __init__(
+        self, scope: core.Construct, construct_id: str,
+        ecr_repo: ecr.IRepository, service: ecs.IBaseService, web_bucket: s3.IBucket, **kwargs
+    ) -> None:
+        """PipelineStack.__init__.
+
+        Parameters
+        ----------
+        scope : core.Construct
+        construct_id : str
+        ecr_repo : aws_ecr.IRepository
+            repository the API image is pushed to
+        service : aws_ecs.IBaseService
+            API service of the ComputeStack, updated by the API pipeline
+        web_bucket : aws_s3.IBucket
+            website bucket of the DeliveryStack
+
+        Returns
+        -------
+        None
+
+        """
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.ecr_repo = ecr_repo
+        self.service = service
+        self.web_bucket = web_bucket
+
+        # API pipeline
+        self.api_source = self.setup_api_source()
+        self.api_build_project = self.setup_api_build_project()
+        self.api_pipeline = self.setup_api_pipeline()
+
+        # Web pipeline
+        self.web_source = self.setup_web_source()
+        self.web_build_project = self.setup_web_build_project()
+        self.web_pipeline = self.setup_web_pipeline()
+
+        self.add_outputs(
+            ApiPipelineName=self.api_pipeline.pipeline_name,
+            ApiBuildRoleName=self.api_build_project.role.role_name,
+            WebPipelineName=self.web_pipeline.pipeline_name,
+            WebBuildRoleName=self.web_build_project.role.role_name,
+        )
+
+    def setup_api_build_project(self):
+        """Setup the build project.
+
+        Using codebuild to create a PipelineProject with four phases:
+            * install:    Instaall requirements for unit test
+            * pre_build:  Run unit tests and show coverage
+            * build:      Build and tag docker image
+            * post_build: Login into aws ecr, push image to ECR
+
+        Returns
+        -------
+        aws_codebuild.PipelineProject object to be used in Pipeline
+
+        """
+        project = cb.PipelineProject(
+            self, 'ApiBuild',
+            environment={
+                'build_image': cb.LinuxBuildImage.STANDARD_4_0,
+                'privileged': True,
+            },
+            build_spec=cb.BuildSpec.from_object(dict(
+                version=0.2,
+                phases={
+                    'install': {'commands': [
+                        'pip install -r requirements_test.txt',
+                        'pip install -U awscli',
+                    ]},
+                    'pre_build': {'commands': [
+                        'coverage run --source=. -m unittest',
+                        'coverage report -m',
+                    ]},
+                    'build': {'commands': [
+                        f'docker build . -t {self.ecr_repo.repository_uri}:latest',
+                    ]},
+                    'post_build': {'commands': [
+                        '$(aws ecr get-login --no-include-email)',
+                        f'docker push {self.ecr_repo.repository_uri}:latest',
+                        ''.join([
+                            'printf \'[{',
+                            f'"name": "{self.config.api.ecr_repo}",',
+                            f'"imageUri": "{self.ecr_repo.repository_uri}:latest"',
+                            '}]\' > imagedefinitions.json',
+                        ]),
+                        'cat imagedefinitions.json',
+                    ]},
+                },
+                artifacts={
+                    'files': 'imagedefinitions.json'
+                }
+            ))
+        )
+        project.role.add_to_policy(iam.PolicyStatement(
+            resources=['*'],
+            actions=[
+                'ecr:GetAuthorizationToken',
+                "ecr:InitiateLayerUpload",
+                "ecr:UploadLayerPart",
+                "ecr:CompleteLayerUpload",
+                "ecr:BatchCheckLayerAvailability",
+                'ecr:PutImage',
+            ],
+            sid='AllowECRLoginAndPush'
+        ))
+        return project
+
+    def setup_api_source(self):
+        """Get the CodeCommit repository for API code
+
+        Notes
+        -----
+        The repo should be existing before the stack deploy
+
+        Returns
+        -------
+        aws_codecommit.Repository
+
+        """
+
+        return cc.Repository.from_repository_name(
+            self, 'ApiSourceRepo',
+            repository_name=self.config.api.source_repo
+        )
+
+    def setup_api_pipeline(self):
+        """Setup the build pipeline for API.
+
+        Using codepipeline to create a Pipeline with 3 steps
+            * Source: CodeCommitSourceAction
+            * Build:  CodeBuildActioin
+            * Deploy: EcsDeployAction: deploy to ECS service
+
+        Returns
+        -------
+        aws_codepipeline.Pipeline
+
+        """
+
+        source_output = cp.Artifact()
+        build_output = cp.Artifact(self.config.api.build_output)
+        return cp.Pipeline(
+            self, 'ApiPipeline',
+            pipeline_name=self.config.api.pipeline,
+            stages=[
+                cp.StageProps(
+                    stage_name='Source',
+                    actions=[
+                        cp_actions.CodeCommitSourceAction(
+                            action_name='Source',
+                            repository=self.api_source,
+                            branch='master',
+                            output=source_output,
+                        )
+                    ]
+                ),
+                cp.StageProps(
+                    stage_name='Build',
+                    actions=[
+                        cp_actions.CodeBuildAction(
+                            action_name='Build',
+                            project=self.api_build_project,
+                            input=source_output,
+                            outputs=[build_output]
+                        )
+                    ]
+                ),
+                cp.StageProps(
+                    stage_name='Deploy',
+                    actions=[
+                        cp_actions.EcsDeployAction(
+                            action_name='Deploy',
+                            service=self.service,
+                            input=build_output,
+                            # image_file=build_output.at_path('imagedefinitions.json')
+                        )
+                    ]
+                )
+            ]
+        )
+
+    def setup_web_source(self):
+        """Get source repo for WEB frontend code
+
+        Notes
+        -----
+        Should be existing source created before the stack deploy
+
+        Returns
+        -------
+        aws_codecommit.Repository for the web front end
+
+        """
+
+        return cc.Repository.from_repository_name(
+            self, 'WebSourceRepo',
+            repository_name=self.config.web.source_repo
+        )
+
+    def setup_web_build_project(self):
+        """Setup build project for Web frontend
+        Using codebuild to create a PipelineProject with 3 phases:
+            * install:   npm install
+            * pre_build: run unit tests
+            * build:     npm run build and setup artifacts
+
+        Returns
+        -------
+        aws_codepipeline.PipelineProject used for web front end deploy
+
+        """
+
+        return cb.PipelineProject(
+            self, 'WebBuild',
+            build_spec=cb.BuildSpec.from_object(dict(
+                version=0.2,
+                phases={
+                    'install': {'commands': ['npm install']},
+                    'pre_build': {'commands': ['npm run test:unit']},
+                    'build': {'commands': [
+                        'npm run build',
+                        'COMMIT_HAHS=$(echo $CODEBUILD_RESOLVED_SOURCE_VERSION |cut -c 1-7)'
+                        'echo ${COMMIT_HASH} > dist/version.txt',
+                    ]}
+                },
+                artifacts={
+                    'files': ['**/*'],
+                    'base-directory': 'dist',
+                    'name': "dist-${COMMIT_HASH}"
+                }
+            ))
+        )
+
+    def setup_web_pipeline(self):
+        """Setup the build pipeline.
+
+        Using codepipeline to create a Web Pipeline with 3 stages:
+            * Source: CodeCommitSourceAction
+            * Build : CodeBuildActioin
+            * Deploy: S3DeployAction
+
+        Returns
+        -------
+        aws_codepipeline.Pipeline
+
+        """
+
+        source_output = cp.Artifact()
+        build_output = cp.Artifact(self.config.web.build_output)
+        return cp.Pipeline(
+            self, 'WebPipeline',
+            pipeline_name=self.config.web.pipeline,
+            stages=[
+                cp.StageProps(
+                    stage_name='Source',
+                    actions=[
+                        cp_actions.CodeCommitSourceAction(
+                            action_name='Source',
+                            repository=self.web_source,
+                            branch='master',
+                            output=source_output,
+                        )
+                    ]
+                ),
+                cp.StageProps(
+                    stage_name='Build',
+                    actions=[
+                        cp_actions.CodeBuildAction(
+                            action_name='Build',
+                            project=self.web_build_project,
+                            input=source_output,
+                            outputs=[build_output]
+                        )
+                    ]
+                ),
+                cp.StageProps(
+                    stage_name='Deploy',
+                    actions=[
+                        cp_actions.S3DeployAction(
+                            action_name='Deploy',
+                            bucket=self.web_bucket,
+                            input=build_output,
+                            access_control=s3.BucketAccessControl.PUBLIC_READ
+                        )
+                    ]
+                )
+            ]
+        )
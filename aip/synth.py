@@ -0,0 +1,222 @@
+"""Synth output cache and changed stack detection
+
+Synthesizing the stacks goes through the jsii bridge and takes a while,
+even when nothing changed. app.py fingerprints the synth inputs:
+
+    source    aip/**/*.py and app.py
+    configs   cdk.json, environments.json, demoapp/*/config*.json
+    context   cdk.json and -c values, as passed by the CDK CLI
+    versions  aws-cdk.core library version
+    envs      resolved environments (account, region, CIDR, app configs)
+
+and reuses the cloud assembly synthesized earlier for the same
+fingerprint instead of building the stacks again.
+
+changed_stacks() compares the templates of an assembly with the deployed
+ones by content hash, so deploys skip the stacks that didn't change, see
+bin/deploy.sh.
+
+"""
+
+import os
+import glob
+import json
+import shutil
+import hashlib
+import tempfile
+from importlib import metadata
+
+import boto3
+from botocore.exceptions import ClientError
+
+from .config import root_dir
+from .helpers import get_client
+
+# Files the synthesized templates depend on, relative to the repository root
+input_patterns = (
+    'app.py',
+    'cdk.json',
+    'environments.json',
+    'aip/**/*.py',
+    'demoapp/*/config*.json',
+)
+
+
+def cdk_context() -> dict:
+    """Context the CDK CLI passes to the app, cdk.json and -c values"""
+    return json.loads(os.environ.get('CDK_CONTEXT_JSON') or '{}')
+
+
+def fingerprint(environments: list, context: dict = None, root: str = root_dir) -> str:
+    """Hash of everything the synthesized templates depend on
+
+    Parameters
+    ----------
+    environments : list
+        aip.environments.Environment to synthesize
+    context : dict
+        app context, default is cdk_context()
+    root : str
+        repository root
+
+    Returns
+    -------
+    str
+        sha256 hex digest
+
+    """
+    digest = hashlib.sha256()
+    paths = sorted({
+        path for pattern in input_patterns
+        for path in glob.glob(os.path.join(root, pattern), recursive=True)
+    })
+    for path in paths:
+        digest.update(os.path.relpath(path, root).encode())
+        with open(path, 'rb') as fp:
+            digest.update(hashlib.sha256(fp.read()).digest())
+    digest.update(json.dumps({
+        'context': cdk_context() if context is None else context,
+        'cdk': metadata.version('aws-cdk.core'),
+        'environments': [v.to_dict() for v in environments],
+    }, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class SynthCache:
+    """Cloud assemblies on disk by fingerprint"""
+
+    directory = os.path.join(root_dir, '.cache', 'synth')
+    keep = 5
+
+    def __init__(self, directory: str = None, keep: int = None):
+        """Set up the cache
+
+        Parameters
+        ----------
+        directory : str
+            cache directory
+        keep : int
+            number of assemblies kept, the least recently used are removed
+
+        """
+        self.directory = directory or self.directory
+        self.keep = keep or self.keep
+
+    def restore(self, key: str, outdir: str) -> bool:
+        """Copy the assembly cached for key into outdir
+
+        Parameters
+        ----------
+        key : str
+            fingerprint of the synth inputs
+        outdir : str
+            cloud assembly directory the CDK CLI reads
+
+        Returns
+        -------
+        bool
+            False if nothing is cached for key
+
+        """
+        path = os.path.join(self.directory, key)
+        if not os.path.isfile(os.path.join(path, 'manifest.json')):
+            return False
+        shutil.copytree(path, outdir, dirs_exist_ok=True)
+        os.utime(path)
+        return True
+
+    def store(self, key: str, outdir: str):
+        """Cache the assembly synthesized into outdir for key
+
+        A failed write only loses the cache entry.
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            staging = tempfile.mkdtemp(dir=self.directory)
+        except OSError:
+            return
+        try:
+            shutil.copytree(outdir, staging, dirs_exist_ok=True)
+            os.replace(staging, path)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._prune()
+
+    def _prune(self):
+        """Remove the least recently used assemblies over keep"""
+        entries = sorted(
+            (v for v in os.scandir(self.directory) if v.is_dir()),
+            key=lambda v: v.stat().st_mtime, reverse=True,
+        )
+        for entry in entries[self.keep:]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def template_hash(template: dict) -> str:
+    """Content hash of a CloudFormation template, independent of key order and formatting"""
+    text = json.dumps(template, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def assembly_templates(outdir: str) -> dict:
+    """Templates of the stacks of a cloud assembly
+
+    Returns
+    -------
+    dict
+        {stack_name: (region, template)}
+
+    """
+    with open(os.path.join(outdir, 'manifest.json')) as fp:
+        manifest = json.load(fp)
+    templates = {}
+    for artifact_id, artifact in manifest.get('artifacts', {}).items():
+        if artifact.get('type') != 'aws:cloudformation:stack':
+            continue
+        properties = artifact['properties']
+        with open(os.path.join(outdir, properties['templateFile'])) as fp:
+            template = json.load(fp)
+        region = artifact['environment'].rsplit('/', 1)[-1]
+        templates[properties.get('stackName', artifact_id)] = (region, template)
+    return templates
+
+
+def deployed_template(stack_name: str, region: str = None):
+    """Template of a deployed stack, None if it isn't deployed"""
+    cfn = get_client('cloudformation', boto3.session.Session(region_name=region))
+    try:
+        body = cfn.get_template(StackName=stack_name, TemplateStage='Original')['TemplateBody']
+    except ClientError as ex:
+        if ex.response['Error']['Code'] == 'ValidationError':
+            return None
+        raise
+    return json.loads(body) if isinstance(body, str) else body
+
+
+def changed_stacks(outdir: str) -> list:
+    """Stacks of a cloud assembly whose template differs from the deployed one
+
+    Stacks without resources are never deployed by the CDK CLI, they're
+    left out.
+
+    Parameters
+    ----------
+    outdir : str
+        cloud assembly directory, like cdk.out
+
+    Returns
+    -------
+    list
+        stack names, new stacks included
+
+    """
+    changed = []
+    for stack_name, (region, template) in sorted(assembly_templates(outdir).items()):
+        if not template.get('Resources'):
+            continue
+        deployed = deployed_template(stack_name, region)
+        if deployed is None or template_hash(deployed) != template_hash(template):
+            changed.append(stack_name)
+    return changed
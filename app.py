@@ -1,11 +1,32 @@
 #!/usr/bin/env python3
+"""Synth the stacks of each environment of environments.json
+
+Select environments with the envs context, like
+    cdk synth -c envs=dev,prod
+
+The cloud assembly is reused when none of the synth inputs changed, see
+aip.synth. Skip the cache with -c synth_cache=false.
+
+"""
 
 from aws_cdk import core
-from aip.stacks import InfraStack
+from aip.environments import load_environments
+from aip.synth import SynthCache, fingerprint
 
 app = core.App()
 
 
 if __name__ == '__main__':
-    InfraStack(app, 'Infra')
-    # app.synth()
+    names = app.node.try_get_context('envs')
+    environments = load_environments(app, names and names.split(','))
+    use_cache = str(app.node.try_get_context('synth_cache')).lower() != 'false'
+    cache = SynthCache()
+    key = fingerprint(environments)
+    if not (use_cache and cache.restore(key, app.outdir)):
+        # Stack construction goes through jsii, import only when needed
+        from aip.stacks import Infra
+
+        for environment in environments:
+            Infra(app, environment.stack_name, environment=environment)
+        app.synth()
+        cache.store(key, app.outdir)
@@ -0,0 +1,14 @@
+#!/bin/sh
+# Run the behave features against the deployed stacks, in parallel
+# workers sharing one AWS snapshot, see features/environment.py
+#
+#     sh bin/acceptance.sh [workers]
+
+WORKERS=${1:-4}
+# aip is imported from the working directory, /app in the tooling image
+export PYTHONPATH="$PWD${PYTHONPATH:+:$PYTHONPATH}"
+export AIP_SNAPSHOT=$(mktemp)
+trap 'rm -f "$AIP_SNAPSHOT"' EXIT
+
+python3 features/environment.py "$AIP_SNAPSHOT" || exit 1
+ls features/*.feature | xargs -P "$WORKERS" -n 1 behave --format progress
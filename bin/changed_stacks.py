@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""Print the stacks of a cloud assembly that differ from the deployed ones
+
+    python3 bin/changed_stacks.py [cdk.out]
+
+"""
+
+import sys
+
+from aip.synth import changed_stacks
+
+
+if __name__ == '__main__':
+    outdir = sys.argv[1] if len(sys.argv) > 1 else 'cdk.out'
+    print(' '.join(changed_stacks(outdir)))
@@ -28,4 +28,14 @@ sh ./set_code.sh
 sh ./build.sh
 cd ../..
 
-cdk deploy && python3 ./showdomain.py
+# Synth is cached, only the stacks whose template changed are deployed.
+# aip is imported from the working directory, /app in the tooling image
+export PYTHONPATH="$PWD${PYTHONPATH:+:$PYTHONPATH}"
+cdk synth -c envs=default -q || exit 1
+STACKS=$(python3 bin/changed_stacks.py cdk.out) || exit 1
+if [ -n "$STACKS" ]; then
+    cdk deploy --app cdk.out --exclusively $STACKS || exit 1
+else
+    echo "No stack changed"
+fi
+python3 ./showdomain.py
@@ -1,22 +1,23 @@
 #!/usr/bin/env python3
 
-import boto3
+import os
+
+from aip.cloudfront import DistributionIndex, website_domain
+from aip.outputs import StackOutputs
 
 
 if __name__ == '__main__':
-    sts = boto3.client('sts')
-    cf = boto3.client('cloudfront')
-    region_name = sts.meta.region_name
+    # Run right after a deploy, don't trust the cached outputs
+    outputs = StackOutputs(os.environ.get('AIP_STACK_NAME', 'Infra'))
+    outputs.refresh()
+    domain_name = outputs.get('DistributionDomainName')
 
-    bucket_name = 'eric-devops-demo-web'
-    resp = cf.list_distributions()
-    bucket_domain_name = f"{bucket_name}.s3-website-{region_name}.amazonaws.com"
-    founds = list(filter(
-        lambda v: v['Origins']['Items'][0]['DomainName'] == bucket_domain_name,
-        resp['DistributionList']['Items']
-    ))
-    distribution = founds and founds[0]
-    domain_name = distribution['DomainName'] if 'DomainName' in distribution else None
+    if not domain_name:
+        # Stacks deployed before they had outputs
+        index = DistributionIndex(outputs.session)
+        bucket_name = 'eric-devops-demo-web'
+        distribution = index.by_origin(website_domain(bucket_name, index.session.region_name))
+        domain_name = distribution['DomainName'] if distribution else None
 
     if domain_name:
         print(
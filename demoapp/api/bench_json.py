@@ -0,0 +1,47 @@
+"""Micro-benchmark of task list serialization
+
+Compares FastAPI's default path, jsonable_encoder then JSONResponse,
+with FastJSONResponse returned directly by the route.
+
+Usage:
+    python bench_json.py [task_count] [repeat]
+
+"""
+
+import sys
+import uuid
+import timeit
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from fast_json import FastJSONResponse
+
+
+def make_tasks(count: int):
+    """Task list in the shape of SimpleTodoDB._to_resp"""
+    now = datetime.utcnow().isoformat()
+    return [
+        {'id': str(uuid.uuid4()), 'title': f'Task number {i}', 'is_done': i % 2 == 0, 'created_at': now}
+        for i in range(count)
+    ]
+
+
+def main(count: int = 10000, repeat: int = 20):
+    tasks = make_tasks(count)
+    assert JSONResponse(jsonable_encoder(tasks)).body == JSONResponse(tasks).body
+    cases = {
+        'before: jsonable_encoder + JSONResponse': lambda: JSONResponse(jsonable_encoder(tasks)),
+        'after:  FastJSONResponse': lambda: FastJSONResponse(tasks),
+    }
+    results = {}
+    for name, func in cases.items():
+        results[name] = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f'{name}: {results[name] * 1000:8.2f} ms per {count} tasks')
+    before, after = results.values()
+    print(f'speedup: {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
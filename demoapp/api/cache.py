@@ -0,0 +1,124 @@
+"""In-process cache for SimpleTodoDB reads
+
+Entries expire after ttl seconds, the least recently used entry is evicted
+when the cache is full. An entry can be tagged with a version, it's a miss
+when the version doesn't match the one passed to get.
+
+"""
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Size and TTL bounded LRU cache with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 5.0):
+        """Create an empty cache
+
+        Parameters
+        ----------
+        maxsize: int
+            Max number of entries, 0 disables the cache
+        ttl: float
+            Seconds before an entry expires
+
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, version=None):
+        """Get a cached value
+
+        Parameters
+        ----------
+        key: hashable
+            Cache key
+        version: int
+            Expected version of the entry, None if not versioned
+
+        Returns
+        -------
+        object
+            The cached value, None on miss
+
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            value, entry_version, expires_at = entry
+            if expires_at > time.monotonic() and entry_version == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, value, version=None):
+        """Cache a value
+
+        Parameters
+        ----------
+        key: hashable
+            Cache key
+        value: object
+            Value to cache, must not be None
+        version: int
+            Version of the value, None if not versioned
+
+        """
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, version, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Remove an entry if cached"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries, counters are kept"""
+        self._data.clear()
+
+    def stats(self):
+        """Cache counters
+
+        Returns
+        -------
+        dict
+            {'size', 'maxsize', 'ttl', 'hits', 'misses'}
+
+        """
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def sum_stats(stats: list):
+    """Sum the counters of caches, like the ones of several workers
+
+    Parameters
+    ----------
+    stats: list
+        TTLCache.stats of each cache, not empty
+
+    Returns
+    -------
+    dict
+        {'size', 'maxsize', 'ttl', 'hits', 'misses'}, ttl of the first cache
+
+    """
+    total = dict(stats[0])
+    for value in stats[1:]:
+        for key in ('size', 'maxsize', 'hits', 'misses'):
+            total[key] += value[key]
+    return total
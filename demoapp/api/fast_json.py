@@ -0,0 +1,29 @@
+"""Fast JSON serialization for the hot routes"""
+
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:     # dumps falls back to json
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    """Serialize plain JSON types to compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for payloads made of plain JSON types only
+
+    Routes return it directly, so FastAPI skips jsonable_encoder, and it's
+    rendered by orjson when installed.
+
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
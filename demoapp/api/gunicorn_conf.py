@@ -0,0 +1,72 @@
+"""Gunicorn settings of the API image
+
+Gunicorn supervises uvicorn workers running on uvloop and httptools.
+The number of workers follows the Fargate CPU allocation, passed by the
+task definition in TASK_CPU (1024 units per vCPU), WEB_CONCURRENCY
+overrides it. The other settings come from the "server" section of
+the configurations of AIP_ENV, the one the stack reads to size the task.
+
+"""
+
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+from settings import load_config
+
+
+def worker_count(cpu_units=None, workers_per_cpu=2):
+    """Number of workers of a CPU allocation
+
+    Parameters
+    ----------
+    cpu_units: int
+        Fargate CPU units, 1024 per vCPU. None to count the host CPUs
+    workers_per_cpu: float
+        Workers per vCPU
+
+    Returns
+    -------
+    int
+        Workers, at least 1
+
+    """
+    cpus = cpu_units / 1024 if cpu_units else multiprocessing.cpu_count()
+    return max(1, round(cpus * workers_per_cpu))
+
+
+server = load_config().get('server', {})
+
+bind = '0.0.0.0:80'
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY') or worker_count(
+    int(os.environ.get('TASK_CPU') or server.get('cpu') or 0), server.get('workers_per_cpu', 2)))
+
+# Recycle workers after some requests, jittered so they don't restart together
+max_requests = server.get('max_requests', 10000)
+max_requests_jitter = server.get('max_requests_jitter', 1000)
+timeout = server.get('timeout', 30)
+graceful_timeout = server.get('graceful_timeout', 30)
+
+# Longer than the ALB idle timeout, so the ALB always closes idle connections
+# first and never sends a request on a connection the worker is closing
+keepalive = server.get('alb_idle_timeout', 60) + 5
+
+accesslog = '-'
+
+
+def on_starting(server):
+    """Create the directory the workers share their metrics and cache stats
+    through, so any of them serves the totals of the replica, see
+    metrics.share. Set in the master, before the workers are forked
+    """
+    if not os.environ.get('METRICS_DIR'):
+        os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='api-metrics-')
+        os.environ['METRICS_DIR_OWNED'] = '1'
+
+
+def on_exit(server):
+    """Remove the metrics directory created by on_starting"""
+    if os.environ.pop('METRICS_DIR_OWNED', None):
+        shutil.rmtree(os.environ.pop('METRICS_DIR'), ignore_errors=True)
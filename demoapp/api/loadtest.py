@@ -0,0 +1,314 @@
+"""Load test of the task API against DynamoDB in moto server mode
+
+Boots main.app with uvicorn and a moto DynamoDB server in background
+threads, then drives a weighted mix of list/add/update/delete requests
+at a fixed concurrency for a duration. Latency percentiles, RPS and
+errors per operation and in total are printed as JSON.
+
+Usage:
+    python loadtest.py [--backend async|sync] [--concurrency 32] [--duration 10]
+                       [--mix list=6,add=2,update=1,delete=1] [--seed 100]
+                       [--endpoint-url URL] [--output FILE]
+
+Needs the test requirements (moto server mode). With --endpoint-url the
+API uses that DynamoDB endpoint instead of starting moto.
+
+The API, the load generator and moto run in one process, sharing the
+GIL, so the latencies include their contention and compare runs of this
+script only, not deployed tasks. The report lists them in_process.
+
+"""
+
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+from contextlib import contextmanager
+
+import aiohttp
+import uvicorn
+
+import main
+
+operations = ('list', 'add', 'update', 'delete')
+
+# Operations on an existing task, taken from the added ones
+task_operations = ('update', 'delete')
+
+
+def parse_mix(text: str):
+    """Parse an operation mix
+
+    Parameters
+    ----------
+    text: str
+        Comma separated operation=weight, like 'list=6,add=2'
+
+    Returns
+    -------
+    dict
+        Weight of each operation
+
+    Raises
+    ------
+    ValueError
+        Unknown operation or no positive weight
+
+    """
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in operations:
+            raise ValueError(f'Unknown operation: {name}')
+        mix[name] = float(weight or 1)
+    if not any(v > 0 for v in mix.values()):
+        raise ValueError('No operation has a positive weight')
+    return mix
+
+
+def percentile(values: list, pct: float):
+    """Nearest rank percentile of sorted values, None if empty"""
+    if not values:
+        return None
+    rank = max(1, round(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(latencies: list, errors: int, elapsed: float):
+    """Latency percentiles in ms, RPS and errors of some requests"""
+    values = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1] if values else None),
+    }
+
+
+def free_port():
+    """A free local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def moto_server():
+    """Run a moto DynamoDB server, yield its endpoint url"""
+    from moto.server import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    app = DomainDispatcherApplication(create_backend_app, service='dynamodb2')
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+
+
+@contextmanager
+def api_server(endpoint_url: str, backend: str = 'async'):
+    """Run main.app with uvicorn, yield its base url
+
+    Parameters
+    ----------
+    endpoint_url: str
+        DynamoDB endpoint of the API
+    backend: str
+        db_backend of the API, 'async' or 'sync'
+
+    """
+    main.db = main.get_db(dict(main.config, db_backend=backend, endpoint_url=endpoint_url))
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError('API server failed to start')
+            time.sleep(0.05)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+class LoadTest:
+    """Drive a request mix at a fixed concurrency and record latencies"""
+
+    def __init__(self, base_url: str, mix: dict, concurrency: int = 32, duration: float = 10, seed: int = 100):
+        """Configure a run
+
+        Parameters
+        ----------
+        base_url: str
+            API base url
+        mix: dict
+            Weight of each operation, see parse_mix
+        concurrency: int
+            Number of concurrent clients
+        duration: float
+            Seconds to run
+        seed: int
+            Tasks added before the run, to be listed, updated and deleted
+
+        """
+        self.base_url = base_url
+        self.mix = mix
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.ids = []
+        self.latencies = {name: [] for name in mix}
+        self.errors = {name: 0 for name in mix}
+
+    async def run(self):
+        """Run the load test
+
+        Returns
+        -------
+        dict
+            {'config', 'total', 'operations'}, see summarize
+
+        """
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(self.base_url, connector=connector) as session:
+            await self._wait_ready(session)
+            await self._add_seed(session)
+            started = time.perf_counter()
+            deadline = started + self.duration
+            await asyncio.gather(*[self._client(session, deadline) for _ in range(self.concurrency)])
+            elapsed = time.perf_counter() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed: float):
+        """Summary of the recorded requests"""
+        return {
+            'config': {
+                'mix': self.mix, 'concurrency': self.concurrency,
+                'duration': self.duration, 'seed': self.seed,
+            },
+            'total': summarize(
+                sum(self.latencies.values(), []), sum(self.errors.values()), elapsed),
+            'operations': {
+                name: summarize(self.latencies[name], self.errors[name], elapsed)
+                for name in self.mix
+            },
+        }
+
+    async def _wait_ready(self, session, timeout: float = 30):
+        """Wait for the API to connect its table"""
+        deadline = time.monotonic() + timeout
+        while True:
+            async with session.get('/ready') as resp:
+                if resp.status == 200:
+                    return
+            if time.monotonic() > deadline:
+                raise RuntimeError('API not ready')
+            await asyncio.sleep(0.1)
+
+    async def _add_seed(self, session):
+        """Add the seed tasks with the batch endpoint"""
+        for start in range(0, self.seed, 1000):
+            tasks = [{'title': f'Seed task {i}'} for i in range(start, min(start + 1000, self.seed))]
+            async with session.post('/api/v1/task/batch', json=tasks) as resp:
+                resp.raise_for_status()
+                self.ids += [v['id'] for v in await resp.json() if v['ok']]
+
+    async def _client(self, session, deadline: float):
+        """Send requests of the mix one at a time until deadline"""
+        names = list(self.mix)
+        while time.perf_counter() < deadline:
+            weights = [0 if v in task_operations and not self.ids else self.mix[v] for v in names]
+            if not any(weights):
+                # Nothing to update or delete until another client adds a task
+                await asyncio.sleep(0.01)
+                continue
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = await getattr(self, f'_{name}')(session)
+            except aiohttp.ClientError:
+                ok = False
+            self.latencies[name].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[name] += 1
+
+    async def _list(self, session):
+        async with session.get('/api/v1/task/', params={'limit': 50}) as resp:
+            await resp.read()
+            return resp.status == 200
+
+    async def _add(self, session):
+        async with session.post('/api/v1/task/', json={'title': f'Load test {time.time()}'}) as resp:
+            if resp.status != 201:
+                return False
+            self.ids.append((await resp.json())['id'])
+            return True
+
+    async def _update(self, session):
+        id_ = random.choice(self.ids)
+        async with session.patch(f'/api/v1/task/{id_}/', json={'is_done': True}) as resp:
+            await resp.read()
+            return resp.status == 200
+
+    async def _delete(self, session):
+        # Taken out first, so no other client updates or deletes it again
+        id_ = self.ids.pop(random.randrange(len(self.ids)))
+        async with session.delete(f'/api/v1/task/{id_}/') as resp:
+            return resp.status == 204
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test of the task API')
+    parser.add_argument('--backend', choices=('async', 'sync'), default='async')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('list=6,add=2,update=1,delete=1'))
+    parser.add_argument('--seed', type=int, default=100, help='tasks added before the run')
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, moto server mode if not set')
+    parser.add_argument('--output', help='write the JSON report to this file too')
+    return parser.parse_args(argv)
+
+
+@contextmanager
+def dynamodb_endpoint(endpoint_url=None):
+    """The given DynamoDB endpoint, or one of a new moto server"""
+    if endpoint_url:
+        yield endpoint_url
+    else:
+        with moto_server() as url:
+            yield url
+
+
+def run(args):
+    """Run a load test, return the report"""
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url, \
+            api_server(endpoint_url, args.backend) as base_url:
+        test = LoadTest(base_url, args.mix, args.concurrency, args.duration, args.seed)
+        report = asyncio.run(test.run())
+    report['config']['backend'] = args.backend
+    report['config']['in_process'] = ['api', 'load generator'] + ([] if args.endpoint_url else ['moto'])
+    return report
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    report = json.dumps(run(args), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(report + '\n')
@@ -0,0 +1,161 @@
+"""Structured logging
+
+get_logger installs one handler per logger, writing text or JSON lines,
+optionally from a listener thread so logging calls never block on I/O.
+Fields passed in extra={'fields': {...}} are merged into the JSON lines.
+
+The module only needs the standard library. The API image is built from
+this directory alone, the tooling imports it through aip.helpers.
+
+"""
+
+import sys
+import io
+import copy
+import json
+import queue
+import atexit
+import logging
+import itertools
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JSONFormatter(logging.Formatter):
+    """Format log records as JSON lines
+
+    Fields passed by extra={'fields': {...}} are added to the line.
+    Callable field values are called only when the record is formatted,
+    so costly values of filtered out or sampled out records are never
+    computed, and with a queue they are computed by the listener thread.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in getattr(record, 'fields', {}).items():
+            entry[key] = value() if callable(value) else value
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one of every n records at or below a level"""
+
+    def __init__(self, every: int, level: int = logging.DEBUG):
+        super().__init__()
+        self.every = every
+        self.level = level
+        self._count = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.level or next(self._count) % self.every == 0
+
+
+class _QueueHandler(QueueHandler):
+    """Queue handler leaving the formatting to the listener thread
+
+    The message is merged with its args and the traceback rendered in the
+    caller thread, they may not be valid later. Fields stay as they are.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# Handler and queue listener installed by get_logger, by logger name
+_installed = {}
+
+
+def get_logger(
+    name: str,
+    level: int = logging.INFO,
+    stream: io.TextIOWrapper = sys.stdout,
+    log_format: str = '[{levelname}] [{asctime}.{msecs:.0f}] {name} {message}',
+    date_format: str = '%Y-%m-%d %H:%M:%S',
+    json_format: bool = False,
+    use_queue: bool = False,
+    sample_every: int = 1,
+) -> logging.Logger:
+    """A helper function to get logger for printing logs
+
+    Calling it again for the same name replaces the handler installed by
+    the previous call, so lines are never duplicated.
+
+    Parameters
+    ----------
+    name : str
+        logger name showing in the log
+    level : int
+        log level, logging.DEBUG, INFO, WARN, ERROR, CRITICAL
+    stream : io.TextIOWrapper
+        stream to print out the log
+    log_format : str
+        log_format
+    date_format : str
+        datetime format in the log
+    json_format : bool
+        write JSON lines with JSONFormatter instead of log_format
+    use_queue : bool
+        put records on a queue, written to stream by a listener thread,
+        so logging calls never block on I/O. See stop_loggers
+    sample_every : int
+        keep one of every sample_every DEBUG records
+
+    Returns
+    -------
+    logging.Logger
+
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+    _remove_handler(name)
+
+    if json_format:
+        formatter = JSONFormatter(datefmt=date_format)
+    else:
+        formatter = logging.Formatter(log_format, datefmt=date_format, style='{')
+    ch = logging.StreamHandler(stream)
+    ch.setFormatter(formatter)
+
+    listener = None
+    handler = ch
+    if use_queue:
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, ch)
+        listener.start()
+        handler = _QueueHandler(records)
+    if sample_every > 1:
+        handler.addFilter(SamplingFilter(sample_every))
+    logger.addHandler(handler)
+    _installed[name] = (handler, listener)
+    return logger
+
+
+def _remove_handler(name: str):
+    """Remove the handler get_logger installed, flushing its queue"""
+    handler, listener = _installed.pop(name, (None, None))
+    if handler is not None:
+        logging.getLogger(name).removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+
+
+@atexit.register
+def stop_loggers():
+    """Write out queued records and stop all listener threads"""
+    for name in list(_installed):
+        _remove_handler(name)
@@ -3,29 +3,120 @@ Use DynamoDB as backup database
 
 Endpoints
 ---------
-    GET    /api/v1/task/ list all tasks
+    GET    /ready readiness, 503 until the table is reachable
+    GET    /metrics request and DynamoDB metrics, Prometheus text format
+    GET    /api/v1/task/ list active tasks, paginated by limit/cursor
     POST   /api/v1/task/ add new task
+    GET    /api/v1/task/{id}/ get task
     PATCH  /api/v1/task/{id}/ set task status
     DELETE /api/v1/task/{id}/ archive task
+    GET    /api/v1/task/export stream all tasks as NDJSON, archived included
+    POST   /api/v1/task/batch add tasks in bulk
+    PATCH  /api/v1/task/batch set status of tasks in bulk
     update(PATCH) and delete(DELETE) operations
 
+Backends
+--------
+    async  AsyncSimpleTodoDB, aioboto3 with pooled connections (default)
+    sync   SimpleTodoDB, boto3 calls run in the threadpool
+    Selected by db_backend in config.json
+    Pool size, retry mode and timeouts of the DynamoDB clients are set by
+    the "boto" section of config.json, per AIP_ENV environment.
+    Nothing is connected at import. The table is resolved (or created) in
+    the background after startup, requests wait for it up to a timeout.
+
+DAX
+---
+    With DAX_ENDPOINT set (by the stack when dax is enabled in config.json),
+    items are read and written through the DAX cluster, queries and scans
+    still go to DynamoDB. The DAX client has no asyncio support, the sync
+    backend is used.
+
+Versions
+--------
+    Writes bump a version counter item in the table, in the same
+    transaction as single task writes. The version is the ETag of the task
+    list, so polling with If-None-Match gets 304 until something changes.
+
+Cache
+-----
+    Task lists and tasks are cached in process, see cache.TTLCache.
+    Writes invalidate the cache of the process serving them. In shared
+    cache mode, cached entries are also checked against the version, so
+    writes to other replicas invalidate them too, at the cost of a read
+    per lookup. GET /api/v1/cache/ returns the hit/miss counters of the
+    workers of the replica.
+
+Metrics
+-------
+    Each response has a Server-Timing header with the total time, the time
+    in SimpleTodoDB methods and the DynamoDB calls, capacity and items, see
+    metrics.py. Requests are logged as JSON lines. With METRICS_DIR set,
+    by gunicorn_conf.py, GET /metrics sums the metrics of all the gunicorn
+    workers, see metrics.share.
+
 """
 
+import os
 import json
+import time
+import inspect
+import threading
 import uuid
+import base64
+import binascii
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import AsyncExitStack
 from datetime import datetime
 from typing import Optional
 
 import boto3
-from boto3.dynamodb.conditions import Key, Not
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-from fastapi import FastAPI, Response
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, conlist
+
+import metrics
+from cache import TTLCache, sum_stats
+from fast_json import FastJSONResponse, dumps
+from logs import get_logger
+from settings import get_boto_config, get_boto_settings, load_config
+
+try:
+    import aioboto3
+except ImportError:     # Only needed by the async backend
+    aioboto3 = None
+
+try:
+    import amazondax
+except ImportError:     # Only needed to read through DAX
+    amazondax = None
 
 app = FastAPI()
-session = boto3.session.Session()
-dynamodb = session.resource('dynamodb')
+
+
+def boto_config(config: dict, env: Optional[str] = None) -> Config:
+    """Build the botocore Config of the DynamoDB clients
+
+    Parameters
+    ----------
+    config: dict
+        The API configurations
+    env: str
+        Environment name, default is the AIP_ENV environment variable
+
+    Returns
+    -------
+    botocore.config.Config
+        See settings.get_boto_config
+
+    """
+    return get_boto_config(get_boto_settings(config, env))
 
 
 class Task(BaseModel):
@@ -35,27 +126,166 @@ class Task(BaseModel):
     is_done: Optional[bool] = False
 
 
+class TaskUpdate(BaseModel):
+    """Data model: status change of a task in a batch update
+    """
+    id: str
+    is_done: Optional[bool] = False
+    archived: Optional[bool] = False
+
+    @property
+    def status(self):
+        if self.archived:
+            return 'Archived'
+        return 'Done' if self.is_done else 'Todo'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can not be decoded"""
+
+
+class TaskNotFound(KeyError):
+    """Raised when updating a task that does not exist"""
+
+
 class SimpleTodoDB:
     """DynamoDB wrapper
     Get or create dynamodb table
     """
 
+    # Statuses returned by list, queried in this order via the status index
+    active_statuses = ('Todo', 'Done')
+    # Key attributes of the status index items, the table key and the index key
+    index_keys = ('id', 'task_status', 'created_at')
+
+    # DynamoDB limits of BatchWriteItem and BatchGetItem requests
+    batch_write_size = 25
+    batch_get_size = 100
+    # Retries of unprocessed batch items, waiting batch_backoff * 2^n seconds
+    batch_max_retries = 5
+    batch_backoff = 0.05
+
+    # Key of the item counting table changes, for ETag and shared cache mode
+    version_key = '__version__'
+
     table_name = None
-    table = None
+    status_index = None
 
-    def __init__(self):
-        """Returns a dynamodb table instance in self.table
+    def __init__(self, endpoint_url: Optional[str] = None):
+        """Read configurations only, the table is resolved on first use
+        or by connect()
+
+        Parameters
+        ----------
+        endpoint_url: str
+            DynamoDB endpoint, None for the AWS default
+
+        """
+        self.endpoint_url = endpoint_url
+        self.resource = None
+        self.dax = None
+        self._table = None
+        self._query_table = None
+        self._connect_lock = threading.Lock()
+        self._load_config()
+
+    @property
+    def connected(self):
+        """Whether the table is resolved"""
+        return self._table is not None
+
+    @property
+    def table(self):
+        """The dynamodb table instance, resolved on first use"""
+        if self._table is None:
+            self.connect()
+        return self._table
+
+    @table.setter
+    def table(self, table):
+        self._table = table
+
+    @property
+    def query_table(self):
+        """The table of queries and scans, DynamoDB even when items go through DAX"""
+        return self._query_table or self.table
+
+    @property
+    def item_resource(self):
+        """The resource of batch item requests, DAX if enabled"""
+        return self.dax or self.resource
+
+    def connect(self):
+        """Create the dynamodb resource and get the table
         If no existing table, create a new table.
 
         """
-        with open('config.json') as fp:
-            self.table_name = json.load(fp)['table_name']
-        try:
-            self.table = dynamodb.Table(self.table_name)
-            _ = self.table.table_status
-        except ClientError as ex:
-            if ex.response['Error']['Code'] == 'ResourceNotFoundException':
-                self.table = self._create_table()
+        with self._connect_lock:
+            if self._table is not None:
+                return
+            if self.resource is None:
+                self.resource = boto3.session.Session().resource(
+                    'dynamodb', endpoint_url=self.endpoint_url, config=self.boto_config)
+                metrics.instrument(self.resource.meta.client)
+            table = self.resource.Table(self.table_name)
+            try:
+                _ = table.table_status
+            except ClientError as ex:
+                if ex.response['Error']['Code'] != 'ResourceNotFoundException':
+                    raise
+                table = self._create_table()
+            if self.dax_endpoint:
+                table = self._connect_dax(table)
+            self._table = table
+
+    def _connect_dax(self, table):
+        """Open the DAX resource, items are read and written through it
+
+        Notes
+        -----
+        Queries and scans stay on the DynamoDB table: writes don't update
+        the DAX query cache, and task lists are cached by the version they
+        were read at, so they have to be read fresh. Writing items through
+        DAX keeps its item cache up to date.
+
+        Parameters
+        ----------
+        table: dynamodb.Table
+            The DynamoDB table, used for queries and scans
+
+        Returns
+        -------
+        The DAX table
+
+        """
+        if amazondax is None:
+            raise RuntimeError('amazon-dax-client is required to read through DAX')
+        self.dax = amazondax.AmazonDaxClient.resource(endpoint_url=self.dax_endpoint)
+        self._query_table = table
+        return self.dax.Table(self.table_name)
+
+    def _load_config(self):
+        """Read table settings from config.json
+
+        Returns
+        -------
+        dict
+            The configurations
+
+        """
+        config = load_config()
+        self.table_name = config['table_name']
+        self.status_index = config['status_index']
+        self.table_config = config.get('table', {})
+        self.dax_endpoint = os.environ.get('DAX_ENDPOINT')
+        self.boto_config = boto_config(config)
+
+        cache = config.get('cache', {})
+        self.cache_shared = cache.get('shared', False)
+        self.track_version = config.get('etag', True) or self.cache_shared
+        self.list_cache = TTLCache(cache.get('list_size', 64), cache.get('ttl', 5))
+        self.item_cache = TTLCache(cache.get('item_size', 1024), cache.get('ttl', 5))
+        return config
 
     def _create_table(self):
         """Create a new dynamodb table
@@ -66,7 +296,31 @@ class SimpleTodoDB:
             The Table instance that created.
 
         """
-        table = dynamodb.create_table(
+        table = self.resource.create_table(**self._table_spec())
+        table.wait_until_exists(TableName=self.table_name)
+        return table
+
+    def _table_spec(self):
+        """Arguments of create_table: the id key, the status index and the capacity
+
+        The stack owns the deployed table, see aip.stacks.DataStack, this
+        creates it where there's no stack, like with a local DynamoDB. The
+        billing mode and capacity come from the "table" section of config.json.
+
+        Returns
+        -------
+        dict
+
+        """
+        if self.table_config.get('billing_mode') == 'PAY_PER_REQUEST':
+            capacity = dict(BillingMode='PAY_PER_REQUEST')
+        else:
+            capacity = dict(ProvisionedThroughput={
+                'ReadCapacityUnits': self.table_config.get('read_capacity', 10),
+                'WriteCapacityUnits': self.table_config.get('write_capacity', 10),
+            })
+        index_capacity = {k: v for k, v in capacity.items() if k != 'BillingMode'}
+        return dict(
             TableName=self.table_name,
             KeySchema=[
                 {
@@ -78,19 +332,44 @@ class SimpleTodoDB:
                 {
                     'AttributeName': 'id',
                     'AttributeType': 'S',
+                },
+                {
+                    'AttributeName': 'task_status',
+                    'AttributeType': 'S',
+                },
+                {
+                    'AttributeName': 'created_at',
+                    'AttributeType': 'S',
+                },
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': self.status_index,
+                    'KeySchema': [
+                        {
+                            'AttributeName': 'task_status',
+                            'KeyType': 'HASH',
+                        },
+                        {
+                            'AttributeName': 'created_at',
+                            'KeyType': 'RANGE',
+                        },
+                    ],
+                    'Projection': {
+                        'ProjectionType': 'ALL',
+                    },
+                    **index_capacity,
                 }
             ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 10,
-                'WriteCapacityUnits': 10,
-            }
+            **capacity
         )
-        table.wait_until_exists(TableName=self.table_name)
-        return table
 
     def _to_resp(self, item: dict):
         """Convert table item to task response
 
+        The response is the final wire shape, made of str and bool only,
+        so it can be rendered without jsonable_encoder.
+
         Parameters
         ----------
         item: dict
@@ -109,22 +388,103 @@ class SimpleTodoDB:
             'created_at': item['created_at'],
         }
 
-    def list(self):
-        """List task items
+    def _encode_cursor(self, status_pos: int, start_key: Optional[dict]):
+        """Encode the position of the next page into an opaque cursor
+
+        Parameters
+        ----------
+        status_pos: int
+            Index in self.active_statuses of the status to continue with
+        start_key: dict
+            LastEvaluatedKey of the previous query, None to start the status
 
         Returns
         -------
-        list
-            The tasks list
+        str
+            The url-safe cursor
+
+        """
+        data = json.dumps({'s': status_pos, 'k': start_key}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def _decode_cursor(self, cursor: str):
+        """Decode a cursor made by _encode_cursor
+
+        Parameters
+        ----------
+        cursor: str
+            The cursor returned with the previous page
+
+        Returns
+        -------
+        tuple
+            (status_pos, start_key)
 
+        Raises
+        ------
+        InvalidCursor
+            If the cursor is malformed
+
+        """
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            status_pos, start_key = int(data['s']), data['k']
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as ex:
+            raise InvalidCursor(cursor) from ex
+        if not 0 <= status_pos < len(self.active_statuses):
+            raise InvalidCursor(cursor)
+        if start_key is not None and not self._valid_start_key(start_key, self.active_statuses[status_pos]):
+            raise InvalidCursor(cursor)
+        return status_pos, start_key
+
+    def _valid_start_key(self, start_key, status: str):
+        """Whether a start key is a key of the status index for status
+
+        DynamoDB rejects other keys with a ValidationException, a tampered
+        cursor would be a server error instead of a bad request.
         """
-        resp = self.table.scan(
-            FilterExpression=Not(Key('task_status').eq('Archived'))
+        return (
+            isinstance(start_key, dict)
+            and set(start_key) == set(self.index_keys)
+            and all(isinstance(v, str) for v in start_key.values())
+            and start_key['task_status'] == status
         )
-        return [self._to_resp(v) for v in resp['Items']]
 
-    def add(self, title: str):
-        """Add new task item
+    def _query_kwargs(self, status_pos: int, start_key: Optional[dict], limit: Optional[int]):
+        """Arguments of the status index query for one status
+
+        Parameters
+        ----------
+        status_pos: int
+            Index in self.active_statuses of the status to query
+        start_key: dict
+            ExclusiveStartKey, None to start from the beginning
+        limit: int
+            Max number of items, None for no limit
+
+        Returns
+        -------
+        dict
+
+        """
+        kwargs = dict(
+            IndexName=self.status_index,
+            KeyConditionExpression=Key('task_status').eq(self.active_statuses[status_pos]),
+        )
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        if limit:
+            kwargs['Limit'] = limit
+        return kwargs
+
+    def _next_cursor(self, status_pos: int, start_key: Optional[dict]):
+        """Cursor of the next page, None if all statuses are exhausted"""
+        if status_pos < len(self.active_statuses):
+            return self._encode_cursor(status_pos, start_key)
+        return None
+
+    def _new_item(self, title: str):
+        """Build a new task item
 
         Parameters
         ----------
@@ -134,26 +494,26 @@ class SimpleTodoDB:
         Returns
         -------
         dict
-            The created task
+            The table item
 
         """
-        id_ = str(uuid.uuid4())
-        self.table.put_item(
-            Item={
-                'id': id_,
-                'title': title,
-                'task_status': 'Todo',
-                'created_at': datetime.utcnow().isoformat()
-            }
-        )
-        return self._to_resp(db.table.get_item(Key={'id': id_})['Item'])
+        return {
+            'id': str(uuid.uuid4()),
+            'title': title,
+            'task_status': 'Todo',
+            'created_at': datetime.utcnow().isoformat()
+        }
 
-    def update(self, id_: int, status: str):
-        """Update item status
+    def _is_active(self, item: Optional[dict]):
+        """Whether a table item is a task not archived, the version counter isn't a task"""
+        return item is not None and item.get('task_status') in self.active_statuses
+
+    def _update_kwargs(self, id_: str, status: str):
+        """Arguments of update_item that sets status of an existing task
 
         Parameters
         ----------
-        id_: int
+        id_: str
             Table key
         status: str
             The status has 3 values: Todo, Done, Archived
@@ -161,114 +521,1329 @@ class SimpleTodoDB:
         Returns
         -------
         dict
-            The updated task
 
         """
-        item = self.table.update_item(
+        return dict(
             Key={'id': id_},
             UpdateExpression='set task_status=:s',
+            ConditionExpression='attribute_exists(task_status)',
             ExpressionAttributeValues={
                 ':s': status
             },
-            ReturnValues='UPDATED_NEW'
+            ReturnValues='ALL_NEW'
         )
-        return self._to_resp(db.table.get_item(Key={'id': id_})['Item'])
 
+    def _update_error(self, ex: ClientError, id_: str):
+        """Map update error to TaskNotFound if the task doesn't exist
 
-db = SimpleTodoDB()
+        Parameters
+        ----------
+        ex: ClientError
+            The error raised by update_item
+        id_: str
+            Table key
 
+        Returns
+        -------
+        Exception
+            The exception to raise
 
-@app.get('/')
-def version():
-    """Returns version
+        """
+        if ex.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return TaskNotFound(id_)
+        if 'ConditionalCheckFailed' in self._cancel_reasons(ex):
+            return TaskNotFound(id_)
+        return ex
 
-    Read VERSION file content and return
+    def _cancel_reasons(self, ex: ClientError):
+        """Reason codes of a cancelled transaction, one per item, empty for other errors"""
+        if ex.response['Error']['Code'] != 'TransactionCanceledException':
+            return []
+        reasons = ex.response.get('CancellationReasons')
+        if reasons:
+            return [v.get('Code') for v in reasons]
+        # The message lists them too: "... reasons [ConditionalCheckFailed, None]"
+        return ex.response['Error']['Message'].rpartition('[')[2].rstrip(']').split(', ')
 
-    Returns
-    -------
-    dict
-        {"version": <VERSION>}
+    def _version_kwargs(self):
+        """Arguments of update_item that bumps the version counter"""
+        return dict(
+            Key={'id': self.version_key},
+            UpdateExpression='ADD #v :one',
+            ExpressionAttributeNames={'#v': 'version'},
+            ExpressionAttributeValues={':one': 1},
+            ReturnValues='UPDATED_NEW',
+        )
 
-    """
-    try:
-        with open('version.txt') as fp:
-            return {'version': fp.read().strip()}
-    except (IOError, FileNotFoundError):
-        pass
+    def _transact_kwargs(self, action: str, kwargs: dict):
+        """Arguments of transact_write_items that writes a task and bumps the version counter
 
-    return {'version': '_UNKNOWN_'}
+        Parameters
+        ----------
+        action: str
+            Put or Update
+        kwargs: dict
+            Arguments of put_item or update_item, transactions return no values
 
+        Returns
+        -------
+        dict
 
-@app.get('/api/v1/task/')
-def list_tasks():
-    """GET method: list all tasks
+        """
+        write = {k: v for k, v in kwargs.items() if k != 'ReturnValues'}
+        bump = {k: v for k, v in self._version_kwargs().items() if k != 'ReturnValues'}
+        return dict(TransactItems=[
+            {action: dict(write, TableName=self.table_name)},
+            {'Update': dict(bump, TableName=self.table_name)},
+        ])
 
-    Notes
-    -----
-    The status has 3 values: Todo, Done, Archived
+    def _cache_changed(self, tasks: list, archived: list, version: Optional[int]):
+        """Invalidate cached lists and cache the written tasks
 
-    Returns
-    -------
-    list
-        The tasks list
+        Parameters
+        ----------
+        tasks: list
+            Active tasks written
+        archived: list
+            Ids of tasks archived
+        version: int
+            Table version after the write, None if not tracked or unknown.
+            In shared cache mode the written tasks are only cached with a
+            version, they are dropped otherwise.
 
-    """
-    return db.list()
+        """
+        if not self.cache_shared:
+            version = None
+        elif version is None:
+            tasks, archived = [], archived + [v['id'] for v in tasks]
+        self.list_cache.clear()
+        for task in tasks:
+            self.item_cache.set(task['id'], task, version)
+        for id_ in archived:
+            self.item_cache.pop(id_)
 
+    def _split_archived(self, tasks: list, statuses: dict):
+        """Split written tasks into active tasks and archived ids
 
-@app.post('/api/v1/task/', status_code=201)
-def add_task(task: Task):
-    """POST method: add new task
+        Parameters
+        ----------
+        tasks: list
+            Tasks written
+        statuses: dict
+            Status written by task id
 
-    Parameters
-    ----------
-    task: Task
-        New task values, must have title, status will always be 'Todo'
+        Returns
+        -------
+        tuple
+            (active tasks, archived ids)
 
-    Returns
-    -------
-    dict
-        The created task
+        """
+        active = [v for v in tasks if statuses[v['id']] != 'Archived']
+        archived = [v['id'] for v in tasks if statuses[v['id']] == 'Archived']
+        return active, archived
 
-    """
-    return db.add(task.title)
+    def cache_stats(self):
+        """Hit/miss counters of the caches
 
+        Returns
+        -------
+        dict
+            {'list': TTLCache.stats, 'item': TTLCache.stats, 'shared': bool}
 
-@app.patch('/api/v1/task/{id_:str}/')
-def update_task(id_: str, task: Task):
-    """PATCH method: update task status
+        """
+        return {
+            'list': self.list_cache.stats(),
+            'item': self.item_cache.stats(),
+            'shared': self.cache_shared,
+        }
 
-    Parameters
-    ----------
-    id_ : int
-        Key in task table
-    task: Task
-        Only take is_done filed
-        if task.is_done is True, set status to 'Done', otherwise, 'Todo'
+    def _to_export(self, item: dict):
+        """Convert table item to the export record, with the raw status
 
-    Returns
-    -------
-    dict
-        The updated task
+        Parameters
+        ----------
+        item: dict
+            Task item
 
-    """
-    return db.update(id_, 'Done' if task.is_done else 'Todo')
+        Returns
+        -------
+        dict
+            {'id', 'title', 'status', 'created_at'}
 
+        """
+        return {
+            'id': item['id'],
+            'title': item['title'],
+            'status': item['task_status'],
+            'created_at': item['created_at'],
+        }
 
-@app.delete('/api/v1/task/{id_:str}/', status_code=204)
-def delete_task(id_: str):
-    """DELETE method: archive the task
-    Not actually delete the item, just update status to: 2 - archived
+    def _scan_kwargs(self, segment: int, segments: int, start_key: Optional[dict]):
+        """Arguments of one page of a (parallel) table scan
 
-    Parameters
-    ----------
-    id_ : int
-        Task table key
+        Parameters
+        ----------
+        segment: int
+            Segment to scan, from 0 to segments - 1
+        segments: int
+            Total segments, 1 for a sequential scan
+        start_key: dict
+            ExclusiveStartKey, None to start the segment
 
-    Returns
-    -------
-    None
+        Returns
+        -------
+        dict
 
-    """
-    db.update(id_, 'Archived')
+        """
+        kwargs = {}
+        if segments > 1:
+            kwargs.update(Segment=segment, TotalSegments=segments)
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        return kwargs
+
+    def _chunks(self, values: list, size: int):
+        """Split values into lists of at most size elements"""
+        return [values[i:i + size] for i in range(0, len(values), size)]
+
+    def _backoff(self, attempt: int):
+        """Seconds to wait before the attempt-th retry of unprocessed items"""
+        return self.batch_backoff * 2 ** (attempt - 1)
+
+    def _batch_results(self, ids: list, items: dict, failed: set):
+        """Build the per-item results of a batch operation
+
+        Parameters
+        ----------
+        ids: list
+            Task ids in request order
+        items: dict
+            Written items by id, ids not in it weren't found
+        failed: set
+            Ids of items still unprocessed after all retries
+
+        Returns
+        -------
+        list
+            {'id', 'ok', 'task'} or {'id', 'ok', 'error'} for each id
+
+        """
+        results = []
+        for id_ in ids:
+            if id_ not in items:
+                results.append({'id': id_, 'ok': False, 'error': 'Task not found'})
+            elif id_ in failed:
+                results.append({'id': id_, 'ok': False, 'error': 'Unprocessed'})
+            else:
+                results.append({'id': id_, 'ok': True, 'task': self._to_resp(items[id_])})
+        return results
+
+    def version(self):
+        """Current table version, increased by every write
+
+        A single consistent read of the version counter item, cheap enough
+        to validate caches and answer conditional requests.
+
+        Returns
+        -------
+        int
+            The version, None if versions aren't tracked
+
+        """
+        if not self.track_version:
+            return None
+        resp = self.table.get_item(Key={'id': self.version_key}, ConsistentRead=True)
+        return int(resp.get('Item', {}).get('version', 0))
+
+    def _bump_version(self):
+        """Increase the table version after a batch write
+
+        Notes
+        -----
+        Single tasks are written in a transaction with the bump, see
+        _write_task. Batches bump once after all their chunks, a
+        transaction can't hold them: if the process dies in between, the
+        written tasks are served under the old ETag until the next write.
+        Bumping first instead would let a list read in between be cached
+        under the new version, stale even without a crash.
+
+        Returns
+        -------
+        int
+            The new version, None if versions aren't tracked
+
+        """
+        if not self.track_version:
+            return None
+        return int(self.table.update_item(**self._version_kwargs())['Attributes']['version'])
+
+    def _write_task(self, action: str, kwargs: dict):
+        """Write a task and bump the version counter atomically
+
+        Notes
+        -----
+        With versions tracked, the write and the bump are one
+        TransactWriteItems: a failed write doesn't change the ETag, and
+        a write is never served under a stale one. It's a round trip
+        instead of two, but transactions consume twice the write capacity
+        of the two items, and those on the counter conflict when they
+        overlap, they are retried like unprocessed batch items. The
+        counter is a single key, its write throughput caps that of the
+        table, disable etag and cache.shared for write-heavy loads.
+
+        Parameters
+        ----------
+        action: str
+            Put or Update
+        kwargs: dict
+            Arguments of put_item or update_item
+
+        Returns
+        -------
+        dict
+            The response, no Attributes from a transaction
+
+        Raises
+        ------
+        ClientError
+            If the write fails, TransactionCanceledException with the
+            reasons if the transaction was cancelled
+
+        """
+        if not self.track_version:
+            return getattr(self.table, f'{action.lower()}_item')(**kwargs)
+        request = self._transact_kwargs(action, kwargs)
+        for attempt in range(self.batch_max_retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt))
+            try:
+                return self.table.meta.client.transact_write_items(**request)
+            except ClientError as ex:
+                if attempt == self.batch_max_retries or 'TransactionConflict' not in self._cancel_reasons(ex):
+                    raise
+
+    def list_page(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None, version: Optional[int] = None,
+    ):
+        """List one page of active task items, cached
+
+        Parameters
+        ----------
+        limit: int
+            Max number of tasks in the page, None for no limit
+        cursor: str
+            The cursor returned with the previous page, None for the first page
+        version: int
+            Table version the caller already read, for the ETag. Pages are
+            cached by it, so a page cached before a write of another
+            replica isn't served under the new version
+
+        Returns
+        -------
+        tuple
+            (tasks, next_cursor), next_cursor is None on the last page
+
+        """
+        if version is None and self.cache_shared:
+            version = self.version()
+        page = self.list_cache.get((limit, cursor), version)
+        if page is None:
+            page = self._query_page(limit, cursor)
+            self.list_cache.set((limit, cursor), page, version)
+        return page
+
+    def _query_page(self, limit: Optional[int] = None, cursor: Optional[str] = None):
+        """List one page of active task items from the table
+
+        Query the status index once per active status instead of scanning
+        the whole table, so archived items are never read.
+
+        Parameters
+        ----------
+        limit: int
+            Max number of tasks in the page, None for no limit
+        cursor: str
+            The cursor returned with the previous page, None for the first page
+
+        Returns
+        -------
+        tuple
+            (tasks, next_cursor), next_cursor is None on the last page
+
+        """
+        status_pos, start_key = self._decode_cursor(cursor) if cursor else (0, None)
+        items = []
+        while status_pos < len(self.active_statuses):
+            resp = self.query_table.query(**self._query_kwargs(
+                status_pos, start_key, limit and limit - len(items)))
+            items += resp['Items']
+            start_key = resp.get('LastEvaluatedKey')
+            if start_key is None:
+                status_pos += 1
+            if limit and len(items) >= limit:
+                break
+        return [self._to_resp(v) for v in items], self._next_cursor(status_pos, start_key)
+
+    def list(self):
+        """List all active task items
+
+        Returns
+        -------
+        list
+            The tasks list
+
+        """
+        tasks, _ = self.list_page()
+        return tasks
+
+    def get(self, id_: str):
+        """Get an active task item, cached
+
+        Parameters
+        ----------
+        id_: str
+            Table key
+
+        Returns
+        -------
+        dict
+            The task
+
+        Raises
+        ------
+        TaskNotFound
+            If there is no task with the id or it is archived
+
+        """
+        version = self.version() if self.cache_shared else None
+        task = self.item_cache.get(id_, version)
+        if task is None:
+            item = self.table.get_item(Key={'id': id_}).get('Item')
+            if not self._is_active(item):
+                raise TaskNotFound(id_)
+            task = self._to_resp(item)
+            self.item_cache.set(id_, task, version)
+        return task
+
+    def add(self, title: str):
+        """Add new task item
+
+        Parameters
+        ----------
+        title: str
+            New task title
+
+        Returns
+        -------
+        dict
+            The created task
+
+        """
+        item = self._new_item(title)
+        self._write_task('Put', dict(Item=item))
+        task = self._to_resp(item)
+        self._cache_changed([task], [], None)
+        return task
+
+    def update(self, id_: str, status: str):
+        """Update item status
+
+        Parameters
+        ----------
+        id_: str
+            Table key
+        status: str
+            The status has 3 values: Todo, Done, Archived
+
+        Returns
+        -------
+        dict
+            The updated task
+
+        Raises
+        ------
+        TaskNotFound
+            If there is no task with the id
+
+        """
+        try:
+            item = self._write_task('Update', self._update_kwargs(id_, status)).get('Attributes')
+        except ClientError as ex:
+            raise self._update_error(ex, id_) from ex
+        if item is None:
+            item = self.table.get_item(Key={'id': id_}, ConsistentRead=True).get('Item')
+            if item is None:
+                raise TaskNotFound(id_)
+        task = self._to_resp(item)
+        self._cache_changed(*self._split_archived([task], {id_: status}), None)
+        return task
+
+    def _batch_put(self, items: list):
+        """Write items with BatchWriteItem
+
+        Parameters
+        ----------
+        items: list
+            Table items with unique ids
+
+        Returns
+        -------
+        set
+            Ids of the items still unprocessed after all retries
+
+        """
+        if not self.connected:
+            self.connect()
+        failed = set()
+        for chunk in self._chunks(items, self.batch_write_size):
+            requests = [{'PutRequest': {'Item': v}} for v in chunk]
+            for attempt in range(self.batch_max_retries + 1):
+                if attempt:
+                    time.sleep(self._backoff(attempt))
+                resp = self.item_resource.batch_write_item(RequestItems={self.table_name: requests})
+                requests = resp.get('UnprocessedItems', {}).get(self.table_name)
+                if not requests:
+                    break
+            failed.update(v['PutRequest']['Item']['id'] for v in requests or [])
+        return failed
+
+    def _batch_get(self, ids: list):
+        """Read items with BatchGetItem, strongly consistent
+
+        Consistent reads cost twice the read capacity, and go past the DAX
+        item cache, but the items are written back by update_many: an
+        eventually consistent read could undo a write just acknowledged.
+
+        Parameters
+        ----------
+        ids: list
+            Unique task ids
+
+        Returns
+        -------
+        dict
+            Found items by id
+
+        """
+        if not self.connected:
+            self.connect()
+        items = {}
+        for chunk in self._chunks(ids, self.batch_get_size):
+            request = {'Keys': [{'id': v} for v in chunk], 'ConsistentRead': True}
+            for attempt in range(self.batch_max_retries + 1):
+                if attempt:
+                    time.sleep(self._backoff(attempt))
+                resp = self.item_resource.batch_get_item(RequestItems={self.table_name: request})
+                items.update((v['id'], v) for v in resp['Responses'].get(self.table_name, []))
+                request = resp.get('UnprocessedKeys', {}).get(self.table_name)
+                if not request:
+                    break
+        return items
+
+    def add_many(self, titles: list):
+        """Add new task items in batches
+
+        Parameters
+        ----------
+        titles: list
+            New task titles
+
+        Returns
+        -------
+        list
+            The result of each task, see _batch_results
+
+        """
+        items = {v['id']: v for v in map(self._new_item, titles)}
+        failed = self._batch_put(list(items.values()))
+        results = self._batch_results(list(items), items, failed)
+        self._cache_changed([v['task'] for v in results if v['ok']], [], self._bump_version())
+        return results
+
+    def update_many(self, updates: list):
+        """Update status of task items in batches
+
+        Notes
+        -----
+        BatchWriteItem can't update conditionally, so existing items are read
+        with BatchGetItem first and written back whole with the new status.
+        The write is last-writer-wins: a task written by another request
+        between the read and the write gets its read state back, other
+        than the status, and a task removed from the table in between is
+        put back. Use update for a conditional write of a single task.
+
+        Parameters
+        ----------
+        updates: list
+            (id, status) pairs, the last status wins for duplicated ids
+
+        Returns
+        -------
+        list
+            The result of each distinct id, see _batch_results
+
+        """
+        statuses = dict(updates)
+        items = self._batch_get(list(statuses))
+        items = {k: v for k, v in items.items() if 'task_status' in v}
+        for id_, item in items.items():
+            item['task_status'] = statuses[id_]
+        failed = self._batch_put(list(items.values()))
+        results = self._batch_results(list(statuses), items, failed)
+        tasks = [v['task'] for v in results if v['ok']]
+        self._cache_changed(*self._split_archived(tasks, statuses), self._bump_version())
+        return results
+
+    def _scan_page(self, segment: int, segments: int, start_key: Optional[dict]):
+        """Scan one page of a segment
+
+        Returns
+        -------
+        tuple
+            (export records, LastEvaluatedKey or None)
+
+        """
+        resp = self.query_table.scan(**self._scan_kwargs(segment, segments, start_key))
+        records = [self._to_export(v) for v in resp['Items'] if 'task_status' in v]
+        return records, resp.get('LastEvaluatedKey')
+
+    def export(self, segments: int = 1):
+        """Yield all task items, archived included
+
+        Walk the table page by page, with at most one page in flight per
+        segment, so memory stays flat whatever the table size.
+
+        Parameters
+        ----------
+        segments: int
+            Number of parallel scan segments
+
+        Yields
+        ------
+        dict
+            Export record of each task, see _to_export
+
+        """
+        with ThreadPoolExecutor(segments) as pool:
+            pending = {pool.submit(self._scan_page, v, segments, None): v for v in range(segments)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    segment = pending.pop(future)
+                    records, start_key = future.result()
+                    if start_key:
+                        pending[pool.submit(self._scan_page, segment, segments, start_key)] = segment
+                    yield from records
+
+
+class AsyncSimpleTodoDB(SimpleTodoDB):
+    """Async DynamoDB wrapper based on aioboto3
+
+    Same interface as SimpleTodoDB with coroutine methods, so requests
+    don't hold a threadpool worker while waiting for DynamoDB.
+    HTTP connections are pooled by the underlying aiohttp session.
+
+    Notes
+    -----
+    Await connect() in the event loop before use and close() when done.
+
+    """
+
+    def __init__(self, endpoint_url: Optional[str] = None):
+        """Read configurations only, the table is resolved in connect()
+
+        Parameters
+        ----------
+        endpoint_url: str
+            DynamoDB endpoint, None for the AWS default
+
+        """
+        super().__init__(endpoint_url)
+        self._exit_stack = None
+
+    @property
+    def table(self):
+        """The dynamodb table instance, None until connected"""
+        return self._table
+
+    @table.setter
+    def table(self, table):
+        self._table = table
+
+    def _load_config(self):
+        """Read table and client settings from config.json
+
+        The adaptive retry mode is replaced by standard, the botocore rate
+        limiter it relies on sleeps in the event loop.
+
+        """
+        config = super()._load_config()
+        retries = self.boto_config.retries or {}
+        if retries.get('mode') == 'adaptive':
+            self.boto_config = self.boto_config.merge(Config(retries=dict(retries, mode='standard')))
+        return config
+
+    async def connect(self):
+        """Open the dynamodb resource and get or create the table"""
+        if self.connected:
+            return
+        if aioboto3 is None:
+            raise RuntimeError('aioboto3 is required by the async backend')
+        await self.close()
+        self._exit_stack = AsyncExitStack()
+        self.resource = await self._exit_stack.enter_async_context(aioboto3.Session().resource(
+            'dynamodb',
+            endpoint_url=self.endpoint_url,
+            config=self.boto_config,
+        ))
+        metrics.instrument(self.resource.meta.client)
+        table = await self.resource.Table(self.table_name)
+        try:
+            _ = await table.table_status
+        except ClientError as ex:
+            if ex.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            table = await self._create_table()
+        self.table = table
+
+    async def close(self):
+        """Release the pooled connections"""
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            self._exit_stack = self.resource = self.table = None
+
+    async def _create_table(self):
+        """Create a new dynamodb table
+
+        Returns
+        -------
+        dynamodb.Table
+            The Table instance that created.
+
+        """
+        table = await self.resource.create_table(**self._table_spec())
+        waiter = self.resource.meta.client.get_waiter('table_exists')
+        await waiter.wait(TableName=self.table_name)
+        return table
+
+    async def version(self):
+        """Current table version, see SimpleTodoDB.version"""
+        if not self.track_version:
+            return None
+        resp = await self.table.get_item(Key={'id': self.version_key}, ConsistentRead=True)
+        return int(resp.get('Item', {}).get('version', 0))
+
+    async def _bump_version(self):
+        """Increase the table version after a batch write, see SimpleTodoDB._bump_version"""
+        if not self.track_version:
+            return None
+        resp = await self.table.update_item(**self._version_kwargs())
+        return int(resp['Attributes']['version'])
+
+    async def _write_task(self, action: str, kwargs: dict):
+        """Write a task and bump the version counter atomically, see SimpleTodoDB._write_task"""
+        if not self.track_version:
+            return await getattr(self.table, f'{action.lower()}_item')(**kwargs)
+        request = self._transact_kwargs(action, kwargs)
+        for attempt in range(self.batch_max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt))
+            try:
+                return await self.table.meta.client.transact_write_items(**request)
+            except ClientError as ex:
+                if attempt == self.batch_max_retries or 'TransactionConflict' not in self._cancel_reasons(ex):
+                    raise
+
+    async def list_page(
+        self, limit: Optional[int] = None, cursor: Optional[str] = None, version: Optional[int] = None,
+    ):
+        """List one page of active task items, cached, see SimpleTodoDB.list_page"""
+        if version is None and self.cache_shared:
+            version = await self.version()
+        page = self.list_cache.get((limit, cursor), version)
+        if page is None:
+            page = await self._query_page(limit, cursor)
+            self.list_cache.set((limit, cursor), page, version)
+        return page
+
+    async def _query_page(self, limit: Optional[int] = None, cursor: Optional[str] = None):
+        """List one page of active task items from the table, see SimpleTodoDB._query_page"""
+        status_pos, start_key = self._decode_cursor(cursor) if cursor else (0, None)
+        items = []
+        while status_pos < len(self.active_statuses):
+            resp = await self.table.query(**self._query_kwargs(
+                status_pos, start_key, limit and limit - len(items)))
+            items += resp['Items']
+            start_key = resp.get('LastEvaluatedKey')
+            if start_key is None:
+                status_pos += 1
+            if limit and len(items) >= limit:
+                break
+        return [self._to_resp(v) for v in items], self._next_cursor(status_pos, start_key)
+
+    async def list(self):
+        """List all active task items"""
+        tasks, _ = await self.list_page()
+        return tasks
+
+    async def get(self, id_: str):
+        """Get an active task item, cached, see SimpleTodoDB.get"""
+        version = await self.version() if self.cache_shared else None
+        task = self.item_cache.get(id_, version)
+        if task is None:
+            item = (await self.table.get_item(Key={'id': id_})).get('Item')
+            if not self._is_active(item):
+                raise TaskNotFound(id_)
+            task = self._to_resp(item)
+            self.item_cache.set(id_, task, version)
+        return task
+
+    async def add(self, title: str):
+        """Add new task item, see SimpleTodoDB.add"""
+        item = self._new_item(title)
+        await self._write_task('Put', dict(Item=item))
+        task = self._to_resp(item)
+        self._cache_changed([task], [], None)
+        return task
+
+    async def update(self, id_: str, status: str):
+        """Update item status, see SimpleTodoDB.update"""
+        try:
+            item = (await self._write_task('Update', self._update_kwargs(id_, status))).get('Attributes')
+        except ClientError as ex:
+            raise self._update_error(ex, id_) from ex
+        if item is None:
+            item = (await self.table.get_item(Key={'id': id_}, ConsistentRead=True)).get('Item')
+            if item is None:
+                raise TaskNotFound(id_)
+        task = self._to_resp(item)
+        self._cache_changed(*self._split_archived([task], {id_: status}), None)
+        return task
+
+    async def _batch_put(self, items: list):
+        """Write items with BatchWriteItem, see SimpleTodoDB._batch_put"""
+        failed = set()
+        for chunk in self._chunks(items, self.batch_write_size):
+            requests = [{'PutRequest': {'Item': v}} for v in chunk]
+            for attempt in range(self.batch_max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(self._backoff(attempt))
+                resp = await self.resource.batch_write_item(RequestItems={self.table_name: requests})
+                requests = resp.get('UnprocessedItems', {}).get(self.table_name)
+                if not requests:
+                    break
+            failed.update(v['PutRequest']['Item']['id'] for v in requests or [])
+        return failed
+
+    async def _batch_get(self, ids: list):
+        """Read items with BatchGetItem, see SimpleTodoDB._batch_get"""
+        items = {}
+        for chunk in self._chunks(ids, self.batch_get_size):
+            request = {'Keys': [{'id': v} for v in chunk], 'ConsistentRead': True}
+            for attempt in range(self.batch_max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(self._backoff(attempt))
+                resp = await self.resource.batch_get_item(RequestItems={self.table_name: request})
+                items.update((v['id'], v) for v in resp['Responses'].get(self.table_name, []))
+                request = resp.get('UnprocessedKeys', {}).get(self.table_name)
+                if not request:
+                    break
+        return items
+
+    async def add_many(self, titles: list):
+        """Add new task items in batches, see SimpleTodoDB.add_many"""
+        items = {v['id']: v for v in map(self._new_item, titles)}
+        failed = await self._batch_put(list(items.values()))
+        results = self._batch_results(list(items), items, failed)
+        self._cache_changed([v['task'] for v in results if v['ok']], [], await self._bump_version())
+        return results
+
+    async def update_many(self, updates: list):
+        """Update status of task items in batches, see SimpleTodoDB.update_many"""
+        statuses = dict(updates)
+        items = await self._batch_get(list(statuses))
+        items = {k: v for k, v in items.items() if 'task_status' in v}
+        for id_, item in items.items():
+            item['task_status'] = statuses[id_]
+        failed = await self._batch_put(list(items.values()))
+        results = self._batch_results(list(statuses), items, failed)
+        tasks = [v['task'] for v in results if v['ok']]
+        self._cache_changed(*self._split_archived(tasks, statuses), await self._bump_version())
+        return results
+
+    async def _scan_page(self, segment: int, segments: int, start_key: Optional[dict]):
+        """Scan one page of a segment, see SimpleTodoDB._scan_page"""
+        resp = await self.table.scan(**self._scan_kwargs(segment, segments, start_key))
+        records = [self._to_export(v) for v in resp['Items'] if 'task_status' in v]
+        return records, resp.get('LastEvaluatedKey')
+
+    async def export(self, segments: int = 1):
+        """Yield all task items, archived included, see SimpleTodoDB.export"""
+        pending = {
+            asyncio.ensure_future(self._scan_page(v, segments, None)): v for v in range(segments)
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    segment = pending.pop(future)
+                    records, start_key = future.result()
+                    if start_key:
+                        pending[asyncio.ensure_future(self._scan_page(segment, segments, start_key))] = segment
+                    for record in records:
+                        yield record
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def get_db(config: dict):
+    """Create the database backend selected by config
+
+    Parameters
+    ----------
+    config: dict
+        API configurations, db_backend is 'async' (default) or 'sync'.
+        The sync backend is used with DAX, its client has no asyncio support
+
+    Returns
+    -------
+    SimpleTodoDB or AsyncSimpleTodoDB
+
+    """
+    backend = config.get('db_backend', 'async')
+    if backend == 'async' and os.environ.get('DAX_ENDPOINT'):
+        backend = 'sync'
+    if backend == 'async':
+        return AsyncSimpleTodoDB(config.get('endpoint_url'))
+    if backend == 'sync':
+        return SimpleTodoDB(config.get('endpoint_url'))
+    raise ValueError(f'Unknown db_backend: {backend}')
+
+
+class DBConnector:
+    """Connect the database backend in the background
+
+    Started by the app startup event, so the server binds its port and
+    answers health checks right away instead of blocking on the table.
+    Requests wait for the connection up to wait_timeout seconds.
+    A failed connection is retried by the next request or readiness check.
+
+    """
+
+    wait_timeout = 10
+
+    def __init__(self):
+        self.task = None
+
+    def start(self):
+        """Start connecting db unless it's connected or connecting"""
+        if db.connected or (self.task is not None and not self.task.done()):
+            return
+        if asyncio.iscoroutinefunction(db.connect):
+            self.task = asyncio.ensure_future(db.connect())
+        else:
+            self.task = asyncio.ensure_future(run_in_threadpool(db.connect))
+
+    @property
+    def error(self):
+        """The error of the last failed connection, None otherwise"""
+        if self.task is None or not self.task.done() or self.task.cancelled():
+            return None
+        return self.task.exception()
+
+    async def wait(self):
+        """Wait until db is connected
+
+        Raises
+        ------
+        HTTPException
+            503 if the table isn't reachable within wait_timeout
+
+        """
+        if db.connected:
+            return
+        self.start()
+        try:
+            await asyncio.wait_for(asyncio.shield(self.task), self.wait_timeout)
+        except Exception:
+            raise HTTPException(status_code=503, detail='Database unavailable')
+
+
+connector = DBConnector()
+
+
+async def call_db(method, *args):
+    """Call a database method without blocking the event loop
+
+    Wait for the database connection first. Coroutine methods of the
+    async backend are awaited, blocking methods of the sync backend run
+    in the threadpool.
+
+    """
+    await connector.wait()
+    with metrics.db_timer(method.__name__):
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args)
+        return await run_in_threadpool(method, *args)
+
+
+def fast_response(content, response: Response, status_code: int = 200):
+    """Return content of a hot route as FastJSONResponse if fast_json is enabled
+
+    Parameters
+    ----------
+    content: list or dict
+        Route result made of plain JSON types only
+    response: Response
+        The route response, headers set on it are kept
+    status_code: int
+        Status code of the route
+
+    Returns
+    -------
+    FastJSONResponse or content as is
+
+    """
+    if not config.get('fast_json'):
+        return content
+    return FastJSONResponse(content, status_code=status_code, headers=dict(response.headers))
+
+
+config = load_config()
+db = get_db(config)
+
+if config.get('metrics', {}).get('enabled', True):
+    app.add_middleware(
+        metrics.MetricsMiddleware,
+        logger=(get_logger('api', json_format=True, use_queue=True)
+                if config['metrics'].get('log_requests', True) else None),
+    )
+
+
+@app.on_event('startup')
+async def connect_db():
+    """Connect the backend in the background of the serving event loop"""
+    connector.start()
+
+
+@app.on_event('startup')
+def share_metrics():
+    """Share the metrics and cache stats with the other gunicorn workers"""
+    if os.environ.get('METRICS_DIR'):
+        metrics.share(os.environ['METRICS_DIR'], cache=lambda: db.cache_stats())
+
+
+@app.on_event('shutdown')
+async def close_db():
+    """Stop connecting and close the async backend connections"""
+    if connector.task is not None and not connector.task.done():
+        connector.task.cancel()
+    if isinstance(db, AsyncSimpleTodoDB):
+        await db.close()
+
+
+@app.get('/')
+def version():
+    """Returns version
+
+    Read VERSION file content and return
+
+    Returns
+    -------
+    dict
+        {"version": <VERSION>}
+
+    """
+    try:
+        with open('version.txt') as fp:
+            return {'version': fp.read().strip()}
+    except (IOError, FileNotFoundError):
+        pass
+
+    return {'version': '_UNKNOWN_'}
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]):
+    """Whether If-None-Match header matches the ETag, using weak comparison
+
+    Parameters
+    ----------
+    etag: str
+        Current ETag of the resource
+    if_none_match: str
+        If-None-Match header value, comma separated ETags or *
+
+    Returns
+    -------
+    bool
+
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    weak = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == weak:
+            return True
+    return False
+
+
+@app.get('/ready')
+async def readiness(response: Response):
+    """Readiness check: whether the task table is reachable
+
+    Notes
+    -----
+    Not connected yet, or the last connection failed, is reported with
+    503 and a new connection attempt is started in the background.
+
+    Returns
+    -------
+    dict
+        {"ready": bool, "table": <table name>, "error": <last error>}
+
+    """
+    if db.connected:
+        return {'ready': True, 'table': db.table_name}
+    error = connector.error
+    connector.start()
+    response.status_code = 503
+    return {'ready': False, 'table': db.table_name, 'error': error and str(error)}
+
+
+@app.get('/api/v1/task/')
+async def list_tasks(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """GET method: list active tasks
+
+    Notes
+    -----
+    The status has 3 values: Todo, Done, Archived. Archived tasks are not listed.
+    When there are more tasks, the cursor of the next page is returned in the
+    X-Next-Cursor header.
+    The ETag is the table version, any write changes it. A request with
+    a matching If-None-Match gets 304 without querying the tasks.
+
+    Parameters
+    ----------
+    limit: int
+        Max number of tasks to return, all active tasks if not set
+    cursor: str
+        X-Next-Cursor header value of the previous page
+
+    Returns
+    -------
+    list
+        The tasks list
+
+    """
+    version = await call_db(db.version)
+    if version is not None:
+        etag = f'W/"{version}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    try:
+        tasks, next_cursor = await call_db(db.list_page, limit, cursor, version)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return fast_response(tasks, response)
+
+
+@app.post('/api/v1/task/', status_code=201)
+async def add_task(task: Task):
+    """POST method: add new task
+
+    Parameters
+    ----------
+    task: Task
+        New task values, must have title, status will always be 'Todo'
+
+    Returns
+    -------
+    dict
+        The created task
+
+    """
+    return await call_db(db.add, task.title)
+
+
+@app.get('/api/v1/task/export')
+async def export_tasks(segments: int = Query(1, ge=1, le=16)):
+    """GET method: stream all tasks as newline-delimited JSON
+
+    Archived tasks are included, the first lines are sent as soon as
+    the first scan page is read.
+
+    Parameters
+    ----------
+    segments: int
+        Number of DynamoDB parallel scan segments
+
+    Returns
+    -------
+    StreamingResponse
+        {"id", "title", "status", "created_at"} line by line
+
+    """
+    await connector.wait()
+    if inspect.isasyncgenfunction(db.export):
+        async def lines():
+            async for record in db.export(segments):
+                yield dumps(record) + b'\n'
+    else:
+        def lines():
+            for record in db.export(segments):
+                yield dumps(record) + b'\n'
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+
+@app.get('/api/v1/task/{id_:str}/')
+async def get_task(id_: str, response: Response):
+    """GET method: get an active task
+
+    Parameters
+    ----------
+    id_ : str
+        Key in task table
+
+    Returns
+    -------
+    dict
+        The task
+
+    """
+    try:
+        return fast_response(await call_db(db.get, id_), response)
+    except TaskNotFound:
+        raise HTTPException(status_code=404, detail='Task not found')
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics_text():
+    """Request and DynamoDB metrics of the workers of this replica
+
+    Returns
+    -------
+    str
+        Prometheus text exposition format
+
+    """
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+@app.get('/api/v1/cache/')
+def cache_stats():
+    """GET method: cache hit/miss counters of the running workers of this replica
+
+    Returns
+    -------
+    dict
+        The cache stats summed over the workers, see SimpleTodoDB.cache_stats,
+        and the number of workers
+
+    """
+    if metrics.shared is None:
+        return dict(db.cache_stats(), workers=1)
+    stats = [v['cache'] for v in metrics.shared.read(running=True)]
+    return {
+        'list': sum_stats([v['list'] for v in stats]),
+        'item': sum_stats([v['item'] for v in stats]),
+        'shared': db.cache_shared,
+        'workers': len(stats),
+    }
+
+
+@app.post('/api/v1/task/batch', status_code=201)
+async def add_tasks(tasks: conlist(Task, min_items=1, max_items=1000), response: Response):
+    """POST method: add new tasks in bulk
+
+    Parameters
+    ----------
+    tasks: List[Task]
+        New task values, each must have title
+
+    Returns
+    -------
+    list
+        {'id', 'ok', 'task'} for each created task,
+        {'id', 'ok', 'error'} if the task couldn't be written
+
+    """
+    return fast_response(await call_db(db.add_many, [v.title for v in tasks]), response, 201)
+
+
+@app.patch('/api/v1/task/batch')
+async def update_tasks(updates: conlist(TaskUpdate, min_items=1, max_items=1000), response: Response):
+    """PATCH method: update status of tasks in bulk
+
+    Parameters
+    ----------
+    updates: List[TaskUpdate]
+        Task id with is_done and archived flags, archived wins over is_done
+
+    Returns
+    -------
+    list
+        {'id', 'ok', 'task'} for each updated task,
+        {'id', 'ok', 'error'} if the task isn't found or couldn't be written
+
+    """
+    return fast_response(await call_db(db.update_many, [(v.id, v.status) for v in updates]), response)
+
+
+@app.patch('/api/v1/task/{id_:str}/')
+async def update_task(id_: str, task: Task):
+    """PATCH method: update task status
+
+    Parameters
+    ----------
+    id_ : int
+        Key in task table
+    task: Task
+        Only take is_done filed
+        if task.is_done is True, set status to 'Done', otherwise, 'Todo'
+
+    Returns
+    -------
+    dict
+        The updated task
+
+    """
+    try:
+        return await call_db(db.update, id_, 'Done' if task.is_done else 'Todo')
+    except TaskNotFound:
+        raise HTTPException(status_code=404, detail='Task not found')
+
+
+@app.delete('/api/v1/task/{id_:str}/', status_code=204)
+async def delete_task(id_: str):
+    """DELETE method: archive the task
+    Not actually delete the item, just update status to: 2 - archived
+
+    Parameters
+    ----------
+    id_ : int
+        Task table key
+
+    Returns
+    -------
+    None
+
+    """
+    try:
+        await call_db(db.update, id_, 'Archived')
+    except TaskNotFound:
+        raise HTTPException(status_code=404, detail='Task not found')
     return Response(status_code=204)
@@ -0,0 +1,461 @@
+"""Request and DynamoDB instrumentation of the API
+
+MetricsMiddleware times each request and collects, through a context
+variable, the time spent in each SimpleTodoDB method and the DynamoDB
+calls made for it. DynamoDB calls are seen by botocore event hooks
+installed with instrument(): they ask for ReturnConsumedCapacity and
+count calls, consumed capacity and items scanned vs returned.
+
+Per request numbers are sent in the Server-Timing header and in a
+structured log line. Totals are kept in a Registry, rendered in the
+Prometheus text format by GET /metrics.
+
+Gunicorn runs several worker processes, each with its own Registry.
+With share(), the workers write snapshots of their registry to a shared
+directory every few seconds, and the worker serving GET /metrics renders
+the sum of all of them. Snapshots of exited workers are kept, so the
+counters don't go back when a worker is recycled.
+
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Operations accepting ReturnConsumedCapacity
+capacity_operations = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem',
+    'Query', 'Scan', 'BatchGetItem', 'BatchWriteItem', 'TransactWriteItems',
+}
+
+# Upper bounds in seconds of the request duration histogram
+duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def format_value(value):
+    """Exact text of a sample value, counters never lose digits
+
+    Parameters
+    ----------
+    value: int or float
+
+    Returns
+    -------
+    str
+        Like '1234567', '2.5'
+
+    """
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class RequestMetrics:
+    """Numbers of a single request"""
+
+    __slots__ = ('started', 'db_time', 'calls', 'capacity', 'scanned', 'returned')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = defaultdict(float)
+        self.calls = 0
+        self.capacity = 0.0
+        self.scanned = 0
+        self.returned = 0
+
+    def elapsed(self):
+        """Seconds since the request started"""
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value, durations in ms
+
+        Returns
+        -------
+        str
+            Like 'total;dur=3.1, db;dur=2.5;desc="list_page", dynamodb;desc="calls=1 ..."'
+
+        """
+        entries = [f'total;dur={self.elapsed() * 1000:.2f}']
+        entries += [
+            f'db;dur={seconds * 1000:.2f};desc="{method}"'
+            for method, seconds in self.db_time.items()
+        ]
+        if self.calls:
+            entries.append(
+                f'dynamodb;desc="calls={self.calls} capacity={format_value(self.capacity)} '
+                f'scanned={self.scanned} returned={self.returned}"')
+        return ', '.join(entries)
+
+    def fields(self):
+        """Log fields"""
+        return {
+            'duration_ms': round(self.elapsed() * 1000, 2),
+            'db_ms': {k: round(v * 1000, 2) for k, v in self.db_time.items()},
+            'dynamodb_calls': self.calls,
+            'consumed_capacity': self.capacity,
+            'items_scanned': self.scanned,
+            'items_returned': self.returned,
+        }
+
+
+current = ContextVar('request_metrics', default=None)
+
+
+class Registry:
+    """Counters and histograms of all requests, thread safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Reset all metrics"""
+        with self._lock:
+            self.requests = defaultdict(int)          # (route, status)
+            self.durations = defaultdict(lambda: [0] * (len(duration_buckets) + 1))    # route
+            self.duration_sum = defaultdict(float)    # route
+            self.db_time = defaultdict(float)         # method
+            self.db_calls = defaultdict(int)          # method
+            self.calls = defaultdict(int)             # operation
+            self.capacity = defaultdict(float)        # operation
+            self.scanned = defaultdict(int)           # operation
+            self.returned = defaultdict(int)          # operation
+
+    def snapshot(self):
+        """Metrics as a json serializable dict, see merge"""
+        with self._lock:
+            return {
+                'requests': [[route, status, count] for (route, status), count in self.requests.items()],
+                'durations': dict(self.durations),
+                'duration_sum': dict(self.duration_sum),
+                'db_time': dict(self.db_time),
+                'db_calls': dict(self.db_calls),
+                'calls': dict(self.calls),
+                'capacity': dict(self.capacity),
+                'scanned': dict(self.scanned),
+                'returned': dict(self.returned),
+            }
+
+    def merge(self, snapshot: dict):
+        """Add the metrics of a snapshot, like the one of another worker"""
+        with self._lock:
+            for route, status, count in snapshot['requests']:
+                self.requests[(route, status)] += count
+            for route, counts in snapshot['durations'].items():
+                self.durations[route] = [a + b for a, b in zip(self.durations[route], counts)]
+            for name in ('duration_sum', 'db_time', 'db_calls', 'calls', 'capacity', 'scanned', 'returned'):
+                values = getattr(self, name)
+                for key, value in snapshot[name].items():
+                    values[key] += value
+
+    def observe_request(self, route: str, status: int, seconds: float):
+        """Count a request and its duration"""
+        with self._lock:
+            self.requests[(route, str(status))] += 1
+            counts = self.durations[route]
+            for i, bound in enumerate(duration_buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.duration_sum[route] += seconds
+
+    def observe_db(self, method: str, seconds: float):
+        """Count a SimpleTodoDB method call and its duration"""
+        with self._lock:
+            self.db_calls[method] += 1
+            self.db_time[method] += seconds
+
+    def observe_call(self, operation: str, capacity: float, scanned: int, returned: int):
+        """Count a DynamoDB call"""
+        with self._lock:
+            self.calls[operation] += 1
+            self.capacity[operation] += capacity
+            self.scanned[operation] += scanned
+            self.returned[operation] += returned
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format
+
+        Returns
+        -------
+        str
+
+        """
+        lines = []
+
+        def sample(name, labels, value):
+            label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f'{name}{{{label_text}}} {format_value(value)}')
+
+        def family(name, kind, help_, samples=()):
+            lines.extend([f'# HELP {name} {help_}', f'# TYPE {name} {kind}'])
+            for labels, value in samples:
+                sample(name, labels, value)
+
+        with self._lock:
+            family('api_requests_total', 'counter', 'Requests by route and status', [
+                ({'route': route, 'status': status}, count)
+                for (route, status), count in sorted(self.requests.items())
+            ])
+            family('api_request_duration_seconds', 'histogram', 'Request duration by route')
+            for route, counts in sorted(self.durations.items()):
+                total = 0
+                for bound, count in zip(duration_buckets + ('+Inf',), counts):
+                    total += count
+                    sample('api_request_duration_seconds_bucket', {'route': route, 'le': bound}, total)
+                sample('api_request_duration_seconds_sum', {'route': route}, self.duration_sum[route])
+                sample('api_request_duration_seconds_count', {'route': route}, total)
+            family('api_db_seconds_total', 'counter', 'Time spent in SimpleTodoDB methods', [
+                ({'method': method}, seconds) for method, seconds in sorted(self.db_time.items())
+            ])
+            family('api_db_calls_total', 'counter', 'SimpleTodoDB method calls', [
+                ({'method': method}, count) for method, count in sorted(self.db_calls.items())
+            ])
+            for name, values, help_ in (
+                ('dynamodb_calls_total', self.calls, 'DynamoDB calls by operation'),
+                ('dynamodb_consumed_capacity_total', self.capacity, 'Consumed capacity units by operation'),
+                ('dynamodb_items_scanned_total', self.scanned, 'Items read by Query and Scan'),
+                ('dynamodb_items_returned_total', self.returned, 'Items returned'),
+            ):
+                family(name, 'counter', help_, [
+                    ({'operation': operation}, value) for operation, value in sorted(values.items())
+                ])
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class WorkerSnapshots:
+    """Snapshots of the worker processes in a shared directory
+
+    Each worker writes {'pid', 'metrics', **extra} to <pid>.json every
+    interval seconds and when it exits, so snapshots of the other workers
+    are up to interval seconds old.
+
+    """
+
+    def __init__(self, directory: str, interval: float = 5, **extra):
+        """Set up the snapshots of this worker
+
+        Parameters
+        ----------
+        directory: str
+            Directory shared by the workers
+        interval: float
+            Seconds between the writes
+        extra:
+            Callables returning other json serializable values to share,
+            like cache=db.cache_stats
+
+        """
+        self.directory = directory
+        self.interval = interval
+        self.extra = extra
+        self.path = os.path.join(directory, f'{os.getpid()}.json')
+        self._stop = threading.Event()
+
+    def start(self):
+        """Write the snapshots from a daemon thread, and at exit"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.write()
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the thread and write a last snapshot"""
+        atexit.unregister(self.stop)
+        self._stop.set()
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        """Write the snapshot of this worker atomically, a failed write keeps the previous one"""
+        snapshot = {'pid': os.getpid(), 'metrics': registry.snapshot()}
+        snapshot.update({name: value() for name, value in self.extra.items()})
+        try:
+            fd, path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(snapshot, fp)
+            os.replace(path, self.path)
+        except OSError:
+            pass
+
+    def read(self, running: bool = False):
+        """Snapshots of all the workers, this one written first
+
+        Parameters
+        ----------
+        running: bool
+            Only the snapshots of the running workers
+
+        Returns
+        -------
+        list
+
+        """
+        self.write()
+        snapshots = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as fp:
+                    snapshot = json.load(fp)
+            except (OSError, ValueError):
+                continue        # Removed or replaced meanwhile
+            if not running or _running(snapshot['pid']):
+                snapshots.append(snapshot)
+        return snapshots
+
+
+def _running(pid: int):
+    """Whether a process is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Snapshots of the workers, set by share()
+shared = None
+
+
+def share(directory: str, interval: float = 5, **extra):
+    """Share the metrics of this worker with the others, see WorkerSnapshots
+
+    Returns
+    -------
+    WorkerSnapshots
+
+    """
+    global shared
+    shared = WorkerSnapshots(directory, interval, **extra)
+    shared.start()
+    return shared
+
+
+def render():
+    """Metrics of all the workers in the Prometheus text format, of this one if not shared"""
+    if shared is None:
+        return registry.render()
+    total = Registry()
+    for snapshot in shared.read():
+        total.merge(snapshot['metrics'])
+    return total.render()
+
+
+@contextmanager
+def db_timer(method: str):
+    """Time a SimpleTodoDB method call for the current request and the registry"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        registry.observe_db(method, seconds)
+        request = current.get()
+        if request is not None:
+            request.db_time[method] += seconds
+
+
+def _add_capacity_param(params, model, **kwargs):
+    """provide-client-params hook: ask DynamoDB for the consumed capacity"""
+    if model.name in capacity_operations:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _record_call(parsed, model, **kwargs):
+    """after-call hook: count the call, its capacity and items"""
+    consumed = parsed.get('ConsumedCapacity') or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    capacity = sum(v.get('CapacityUnits', 0) for v in consumed)
+    if 'Count' in parsed:
+        scanned, returned = parsed.get('ScannedCount', parsed['Count']), parsed['Count']
+    elif 'Responses' in parsed:
+        returned = sum(len(v) for v in parsed['Responses'].values())
+        scanned = returned
+    else:
+        scanned = returned = int('Item' in parsed)
+    registry.observe_call(model.name, capacity, scanned, returned)
+    request = current.get()
+    if request is not None:
+        request.calls += 1
+        request.capacity += capacity
+        request.scanned += scanned
+        request.returned += returned
+
+
+def instrument(client):
+    """Install the metric hooks on a DynamoDB client
+
+    Parameters
+    ----------
+    client: botocore.client.BaseClient
+        boto3 or aiobotocore client, like resource.meta.client
+
+    """
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _add_capacity_param, unique_id='metrics-capacity')
+    events.register('after-call.dynamodb', _record_call, unique_id='metrics-call')
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics
+
+    Adds the Server-Timing header when the response starts and logs a
+    line per request when it's done. Streamed responses are timed until
+    their headers are sent.
+
+    """
+
+    def __init__(self, app, logger: logging.Logger = None):
+        self.app = app
+        self.logger = logger
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics()
+        token = current.set(request)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', request.server_timing().encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            endpoint = scope.get('endpoint')
+            route = getattr(endpoint, '__name__', 'unmatched')
+            registry.observe_request(route, status, request.elapsed())
+            if self.logger is not None:
+                self.logger.info('request', extra={'fields': dict(
+                    request.fields(), route=route, method=scope['method'], path=scope['path'], status=status,
+                )})
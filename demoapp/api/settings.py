@@ -0,0 +1,265 @@
+"""Configurations of the API
+
+config.json has the settings of every environment, config.<env>.json
+those of the AIP_ENV environment, merged over it. The files are parsed
+once and cached until they change.
+
+Settings are checked against api_settings when loaded, a misspelt or
+mistyped key fails instead of being ignored. get_boto_config builds the
+botocore Config of the "boto" section, for the API and the tooling.
+
+Only needs the standard library, gunicorn_conf.py reads the server
+settings with it before the app is imported. The tooling loads it too,
+see aip.config.load_api_module, the stack settings (table, dax) are
+validated there.
+
+"""
+
+import os
+import copy
+import json
+from typing import Optional
+
+
+class ConfigError(ValueError):
+    """Invalid or incomplete configuration"""
+
+
+# botocore client defaults, overridden by the "boto" section of config.json
+boto_defaults = dict(
+    max_pool_connections=10,
+    retry_mode='legacy',
+    max_attempts=5,
+    connect_timeout=60,
+    read_timeout=60,
+    tcp_keepalive=False,
+)
+
+# Settings of the boto section entries, see get_boto_settings
+boto_settings = {
+    'max_pool_connections': int,
+    'retry_mode': str,
+    'max_attempts': int,
+    'connect_timeout': float,
+    'read_timeout': float,
+    'tcp_keepalive': bool,
+}
+
+# Settings of config.json by name: a type, or the settings of a section
+api_settings = {
+    'source_repo': str,
+    'ecr_repo': str,
+    'table_name': str,
+    'status_index': str,
+    # Validated by the stack, see aip.config.TableConfig and DaxConfig
+    'table': dict,
+    'dax': dict,
+    'db_backend': str,
+    'etag': bool,
+    'fast_json': bool,
+    'cache': {
+        'ttl': float,
+        'list_size': int,
+        'item_size': int,
+        'shared': bool,
+    },
+    # Entries by environment name
+    'boto': dict,
+    'metrics': {
+        'enabled': bool,
+        'log_requests': bool,
+    },
+    'server': {
+        'cpu': int,
+        'memory': int,
+        'workers_per_cpu': float,
+        'max_requests': int,
+        'max_requests_jitter': int,
+        'timeout': int,
+        'graceful_timeout': int,
+        'alb_idle_timeout': int,
+        'desired_count': int,
+    },
+}
+
+
+# Parsed json files by path: ((mtime_ns, size), data)
+_json_cache = {}
+
+
+def read_json(path: str) -> dict:
+    """Parse a json file, cached until its modification time or size change
+
+    Parameters
+    ----------
+    path : str
+        json file path
+
+    Returns
+    -------
+    dict
+        A copy of the parsed content, free to modify
+
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _json_cache.get(path)
+    if cached is None or cached[0] != version:
+        with open(path) as fp:
+            cached = _json_cache[path] = (version, json.load(fp))
+    return copy.deepcopy(cached[1])
+
+
+def merge(base: dict, override: dict) -> dict:
+    """Deep merge override into a copy of base, nested dicts are merged too"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = merge(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+def check_settings(values: dict, settings: dict, name: str):
+    """Check the keys and types of settings
+
+    Parameters
+    ----------
+    values : dict
+        settings to check
+    settings : dict
+        type of each setting, or the settings of a section
+    name : str
+        name of the settings in errors, like 'config.json cache'
+
+    Raises
+    ------
+    ConfigError
+        Unknown key or value of another type
+
+    """
+    if not isinstance(values, dict):
+        raise ConfigError(f'{name} should be dict, got {values!r}')
+    unknown = set(values) - set(settings)
+    if unknown:
+        raise ConfigError(f'Unknown {name} settings: {", ".join(sorted(unknown))}')
+    for key, value in values.items():
+        expected = settings[key]
+        if isinstance(expected, dict):
+            check_settings(value, expected, f'{name} {key}')
+            continue
+        types = (int, float) if expected is float else expected
+        if isinstance(value, bool) and expected is not bool or not isinstance(value, types):
+            raise ConfigError(f'{name} {key} should be {expected.__name__}, got {value!r}')
+
+
+def validate(config: dict, name: str = 'config.json'):
+    """Check the settings of an API config, see api_settings
+
+    Raises
+    ------
+    ConfigError
+        Unknown key or value of another type
+
+    """
+    check_settings(config, api_settings, name)
+    for env, entry in config.get('boto', {}).items():
+        check_settings(entry, boto_settings, f'{name} boto {env}')
+
+
+def load_config(env: Optional[str] = None, directory: str = '.'):
+    """Load API configurations from config.json
+
+    Parameters
+    ----------
+    env: str
+        Environment name, default is the AIP_ENV environment variable
+    directory: str
+        Directory of the config files
+
+    Returns
+    -------
+    dict
+        The configurations, a copy free to modify
+
+    Raises
+    ------
+    ConfigError
+        Unknown setting or value of another type
+
+    """
+    env = env or os.environ.get('AIP_ENV')
+    config = read_json(os.path.join(directory, 'config.json'))
+    override = os.path.join(directory, f'config.{env}.json')
+    if env and os.path.exists(override):
+        config = merge(config, read_json(override))
+    validate(config)
+    return config
+
+
+def get_boto_settings(config: dict, env: Optional[str] = None) -> dict:
+    """Get boto3 client settings of an environment
+
+    The "boto" section of config.json has a "default" entry and optional
+    entries per environment overriding it:
+      "boto": {
+        "default": {"retry_mode": "adaptive", "read_timeout": 5},
+        "dev": {"read_timeout": 30}
+      }
+
+    Parameters
+    ----------
+    config : dict
+        configurations with the "boto" section
+    env : str
+        environment name, default is the AIP_ENV environment variable
+
+    Returns
+    -------
+    dict
+        boto_defaults updated by the default and the env settings
+
+    """
+    env = env or os.environ.get('AIP_ENV', 'default')
+    boto = config.get('boto', {})
+    settings = dict(boto_defaults)
+    settings.update(boto.get('default', {}))
+    settings.update(boto.get(env, {}))
+    return settings
+
+
+def get_boto_config(settings: dict, **overrides) -> 'botocore.config.Config':
+    """Build the botocore Config of boto3 clients
+
+    Parameters
+    ----------
+    settings : dict
+        client settings, see get_boto_settings
+    overrides :
+        settings to override, like max_pool_connections=50
+
+    Returns
+    -------
+    botocore.config.Config
+        Pool size, retry mode, timeouts and TCP keepalive of the clients
+
+    Notes
+    -----
+    tcp_keepalive is ignored by botocore versions not supporting it.
+    botocore is imported here, gunicorn_conf.py and the tooling setup
+    read the settings without it.
+
+    """
+    from botocore.config import Config
+
+    settings = dict(settings, **overrides)
+    options = dict(
+        max_pool_connections=settings['max_pool_connections'],
+        connect_timeout=settings['connect_timeout'],
+        read_timeout=settings['read_timeout'],
+        retries={'mode': settings['retry_mode'], 'max_attempts': settings['max_attempts']},
+    )
+    if 'tcp_keepalive' in Config.OPTION_DEFAULTS:
+        options['tcp_keepalive'] = settings['tcp_keepalive']
+    return Config(**options)
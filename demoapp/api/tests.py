@@ -1,9 +1,38 @@
+import io
+import os
+import json
+import time
+import asyncio
 import unittest
+import importlib
+import tempfile
+import threading
+from unittest import mock
+
 import boto3
 from moto import mock_dynamodb2
+from moto.dynamodb2 import dynamodb_backends2
+from moto.server import DomainDispatcherApplication, create_backend_app
+from werkzeug.serving import make_server
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+import logs
+import fast_json
+import metrics
+import settings
+from cache import TTLCache
+
+
+def start_patch(test: unittest.TestCase, patcher):
+    """Start a patcher, stopped at the end of the test
+
+    TestCase.enterContext needs Python 3.11, the CodeBuild image runs an older one.
+    """
+    patched = patcher.start()
+    test.addCleanup(patcher.stop)
+    return patched
+
 
 class TaskAPITest(unittest.TestCase):
     @mock_dynamodb2
@@ -24,18 +53,270 @@ class TaskAPITest(unittest.TestCase):
         db = main.SimpleTodoDB()
         t1, t2 = db.add('title 1'), db.add('title 2')
 
-        db.update(t1['id'], 'Done')
+        self.assertEqual(db.update(t1['id'], 'Done'), dict(t1, is_done=True))
         db.update(t2['id'], 'Archived')
         self.assertEqual(db.list(), [
             {'id': t1['id'], 'title': 'title 1', 'is_done': True, 'created_at': t1['created_at']},
         ])
 
+    @mock_dynamodb2
+    def test_update_missing(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        with self.assertRaises(main.TaskNotFound):
+            db.update('missing-id', 'Done')
+        self.assertEqual(db.table.scan()['Items'], [])
+
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        resp = client.patch('/api/v1/task/missing-id/', json={'is_done': True})
+        self.assertEqual(resp.status_code, 404)
+        resp = client.delete('/api/v1/task/missing-id/')
+        self.assertEqual(resp.status_code, 404)
+
+    @mock_dynamodb2
+    def test_version_transaction(self):
+        import main
+        from botocore.exceptions import ClientError
+
+        db = main.SimpleTodoDB()
+        t1 = db.add('title 1')
+        self.assertEqual(db.version(), 1)
+        with self.assertRaises(main.TaskNotFound):
+            db.update('missing-id', 'Done')
+        self.assertEqual(db.version(), 1)
+
+        db.batch_backoff = 0
+        transact_write_items = db.table.meta.client.transact_write_items
+        conflict = ClientError({'Error': {
+            'Code': 'TransactionCanceledException',
+            'Message': 'Transaction cancelled, please refer cancellation reasons for specific reasons '
+                       '[None, TransactionConflict]',
+        }}, 'TransactWriteItems')
+        errors = [conflict]
+
+        def conflict_once(**kwargs):
+            if errors:
+                raise errors.pop()
+            return transact_write_items(**kwargs)
+
+        with mock.patch.object(db.table.meta.client, 'transact_write_items', side_effect=conflict_once) as transact:
+            self.assertEqual(db.update(t1['id'], 'Done'), dict(t1, is_done=True))
+        self.assertEqual(transact.call_count, 2)
+        self.assertEqual(db.version(), 2)
+
+    @mock_dynamodb2
+    def test_list_pagination(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        tasks = [db.add(f'title {i}') for i in range(5)]
+        db.update(tasks[1]['id'], 'Done')
+        db.update(tasks[2]['id'], 'Archived')
+
+        ids, cursor = [], None
+        while True:
+            page, cursor = db.list_page(limit=2, cursor=cursor)
+            self.assertLessEqual(len(page), 2)
+            ids += [v['id'] for v in page]
+            if cursor is None:
+                break
+        self.assertEqual(ids, [tasks[i]['id'] for i in (0, 3, 4, 1)])
+
+        with self.assertRaises(main.InvalidCursor):
+            db.list_page(cursor='not-a-cursor')
+
+    @mock_dynamodb2
+    def test_tampered_cursor(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        for i in range(3):
+            db.add(f'title {i}')
+        _, cursor = db.list_page(limit=1)
+        status_pos, start_key = db._decode_cursor(cursor)
+        self.assertEqual(set(start_key), set(db.index_keys))
+
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        for key in (
+                {'id': 1},
+                dict(start_key, id=1),
+                dict(start_key, title='extra'),
+                {k: v for k, v in start_key.items() if k != 'created_at'},
+                dict(start_key, task_status='Archived'),
+                ['not', 'a', 'key'],
+        ):
+            resp = client.get('/api/v1/task/', params={'cursor': db._encode_cursor(status_pos, key)})
+            self.assertEqual(resp.status_code, 400, key)
+        resp = client.get('/api/v1/task/', params={'cursor': db._encode_cursor(status_pos, start_key)})
+        self.assertEqual(resp.status_code, 200)
+
+    @mock_dynamodb2
+    def test_request_pagination(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        for i in range(3):
+            db.add(f'title {i}')
+
+        resp = client.get('/api/v1/task/', params={'limit': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 2)
+        cursor = resp.headers['X-Next-Cursor']
+
+        resp = client.get('/api/v1/task/', params={'limit': 2, 'cursor': cursor})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 1)
+        self.assertNotIn('X-Next-Cursor', resp.headers)
+
+        resp = client.get('/api/v1/task/', params={'cursor': 'bad'})
+        self.assertEqual(resp.status_code, 400)
+
+    @mock_dynamodb2
+    def test_add_and_update_many(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        results = db.add_many([f'title {i}' for i in range(30)])
+        self.assertEqual(len(results), 30)
+        self.assertTrue(all(v['ok'] for v in results))
+        self.assertEqual(len(db.list()), 30)
+
+        ids = [v['id'] for v in results]
+        with mock.patch.object(db.resource, 'batch_get_item', wraps=db.resource.batch_get_item) as batch_get_item:
+            results = db.update_many([(ids[0], 'Done'), (ids[1], 'Archived'), ('missing-id', 'Done')])
+        self.assertTrue(batch_get_item.call_args[1]['RequestItems'][db.table_name]['ConsistentRead'])
+        self.assertEqual(results, [
+            {'id': ids[0], 'ok': True, 'task': dict(results[0]['task'], is_done=True)},
+            {'id': ids[1], 'ok': True, 'task': dict(results[1]['task'], is_done=False)},
+            {'id': 'missing-id', 'ok': False, 'error': 'Task not found'},
+        ])
+        self.assertEqual(len(db.list()), 29)
+        self.assertEqual(db.table.get_item(Key={'id': ids[1]})['Item']['task_status'], 'Archived')
+
+    @mock_dynamodb2
+    def test_add_many_unprocessed(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        db.connect()
+        db.batch_max_retries, db.batch_backoff = 1, 0
+        batch_write_item = db.resource.batch_write_item
+
+        def unprocessed_once(RequestItems):
+            requests = RequestItems[db.table_name]
+            batch_write_item(RequestItems={db.table_name: requests[:1]})
+            return {'UnprocessedItems': {db.table_name: requests[1:]}}
+
+        with mock.patch.object(db.resource, 'batch_write_item', side_effect=unprocessed_once):
+            results = db.add_many(['title 1', 'title 2', 'title 3'])
+        self.assertEqual([v['ok'] for v in results], [True, True, False])
+        self.assertEqual(results[2]['error'], 'Unprocessed')
+        self.assertEqual(len(db.list()), 2)
+
+    @mock_dynamodb2
+    def test_request_batch(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+
+        resp = client.post('/api/v1/task/batch', json=[{'title': 'title 1'}, {'title': 'title 2'}])
+        self.assertEqual(resp.status_code, 201)
+        ids = [v['id'] for v in resp.json()]
+
+        resp = client.patch('/api/v1/task/batch', json=[
+            {'id': ids[0], 'is_done': True}, {'id': ids[1], 'archived': True},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(all(v['ok'] for v in resp.json()))
+        self.assertEqual([v['id'] for v in db.list()], ids[:1])
+
+        resp = client.post('/api/v1/task/batch', json=[])
+        self.assertEqual(resp.status_code, 422)
+
+    @mock_dynamodb2
+    def test_request_etag(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+
+        resp = client.get('/api/v1/task/')
+        etag = resp.headers['ETag']
+        self.assertEqual(resp.headers['Cache-Control'], 'no-cache')
+
+        with mock.patch.object(db, '_query_page') as query_page:
+            resp = client.get('/api/v1/task/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.headers['ETag'], etag)
+        self.assertEqual(resp.content, b'')
+        query_page.assert_not_called()
+
+        db.add('title 1')
+        resp = client.get('/api/v1/task/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+        self.assertEqual(len(resp.json()), 1)
+
+    def test_etag_matches(self):
+        import main
+
+        self.assertTrue(main.etag_matches('W/"3"', '"3"'))
+        self.assertTrue(main.etag_matches('W/"3"', 'W/"2", W/"3"'))
+        self.assertTrue(main.etag_matches('W/"3"', '*'))
+        self.assertFalse(main.etag_matches('W/"3"', 'W/"4"'))
+        self.assertFalse(main.etag_matches('W/"3"', None))
+
+    @mock_dynamodb2
+    def test_export(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        tasks = [db.add(f'title {i}') for i in range(10)]
+        db.update(tasks[0]['id'], 'Archived')
+        db.update(tasks[1]['id'], 'Done')
+        statuses = dict.fromkeys([v['id'] for v in tasks], 'Todo')
+        statuses.update({tasks[0]['id']: 'Archived', tasks[1]['id']: 'Done'})
+
+        records = list(db.export())
+        self.assertEqual(len(records), 10)
+        self.assertEqual({v['id']: v['status'] for v in records}, statuses)
+
+        # moto ignores Segment/TotalSegments, split the items by id instead
+        scan = db.table.scan
+
+        def segment_scan(Segment, TotalSegments, **kwargs):
+            resp = scan(Limit=2, **kwargs)
+            resp['Items'] = [v for v in resp['Items'] if sum(map(ord, v['id'])) % TotalSegments == Segment]
+            return resp
+
+        with mock.patch.object(db.table, 'scan', side_effect=segment_scan):
+            records = list(db.export(segments=3))
+        self.assertEqual(len(records), 10)
+        self.assertEqual({v['id']: v['status'] for v in records}, statuses)
+
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        resp = client.get('/api/v1/task/export')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(v) for v in resp.text.splitlines()]
+        self.assertEqual({v['id']: v['status'] for v in records}, statuses)
+
     @mock_dynamodb2
     def test_request_status(self):
         import main
 
         db = main.SimpleTodoDB()
         client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
         resp = client.get('/api/v1/task/')
         self.assertEqual(resp.status_code, 200)
 
@@ -53,3 +334,605 @@ class TaskAPITest(unittest.TestCase):
         self.assertEqual(resp.status_code, 204)
 
         self.assertEqual(db.list(), [])
+
+    @mock_dynamodb2
+    def test_lazy_connect(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        self.assertFalse(db.connected)
+        self.assertEqual(boto3.client('dynamodb').list_tables()['TableNames'], [])
+
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        start_patch(self, mock.patch.object(main, 'connector', main.DBConnector()))
+        # the first connection fails, the one retried by /ready succeeds
+        start_patch(self, mock.patch.object(
+            db, 'connect', side_effect=[RuntimeError('unreachable'), mock.DEFAULT], wraps=db.connect))
+        resp = client.get('/api/v1/task/')
+        self.assertEqual(resp.status_code, 503)
+        resp = client.get('/ready')
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json()['error'], 'unreachable')
+
+        resp = client.get('/api/v1/task/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(db.connected)
+        resp = client.get('/ready')
+        self.assertEqual(resp.json(), {'ready': True, 'table': db.table_name})
+
+    @mock_dynamodb2
+    def test_table_capacity(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        db.table_config = {'billing_mode': 'PROVISIONED', 'read_capacity': 20, 'write_capacity': 5}
+        spec = db._table_spec()
+        self.assertEqual(spec['ProvisionedThroughput'], {'ReadCapacityUnits': 20, 'WriteCapacityUnits': 5})
+        self.assertEqual(spec['GlobalSecondaryIndexes'][0]['ProvisionedThroughput'], spec['ProvisionedThroughput'])
+
+        db.table_config = {'billing_mode': 'PAY_PER_REQUEST'}
+        spec = db._table_spec()
+        self.assertEqual(spec['BillingMode'], 'PAY_PER_REQUEST')
+        self.assertNotIn('ProvisionedThroughput', spec)
+        self.assertNotIn('ProvisionedThroughput', spec['GlobalSecondaryIndexes'][0])
+        db.add('title 1')
+        self.assertEqual(len(db.list()), 1)
+
+    @mock_dynamodb2
+    def test_dax(self):
+        import main
+
+        # DAX answers like DynamoDB, through another resource
+        dax = boto3.resource('dynamodb')
+        amazondax = mock.Mock()
+        amazondax.AmazonDaxClient.resource.return_value = dax
+        start_patch(self, mock.patch.object(main, 'amazondax', amazondax))
+        start_patch(self, mock.patch.dict('os.environ', {'DAX_ENDPOINT': 'dax://cluster.dax.example.com:8111'}))
+
+        self.assertIsInstance(main.get_db({'db_backend': 'async'}), main.SimpleTodoDB)
+        db = main.SimpleTodoDB()
+        t1 = db.add('title 1')
+        amazondax.AmazonDaxClient.resource.assert_called_once_with(endpoint_url='dax://cluster.dax.example.com:8111')
+        self.assertIs(db.item_resource, dax)
+        self.assertIs(db.table.meta.client, dax.meta.client)
+        self.assertIs(db.query_table.meta.client, db.resource.meta.client)
+        self.assertEqual(db.get(t1['id']), t1)
+        self.assertEqual(db.list(), [t1])
+
+        start_patch(self, mock.patch.object(main, 'amazondax', None))
+        with self.assertRaises(RuntimeError):
+            main.SimpleTodoDB().connect()
+
+
+class LoadConfigTest(unittest.TestCase):
+
+    def test_cached_and_layered(self):
+        import main
+
+        with mock.patch('builtins.open', wraps=open) as open_:
+            config = settings.load_config()
+            config['table_name'] = 'changed'
+            self.assertEqual(settings.load_config()['table_name'], main.config['table_name'])
+        self.assertLessEqual(open_.call_count, 1)
+
+        override = {'cache': {'ttl': 60}, 'table_name': 'dev-tasks'}
+        real_exists = settings.os.path.exists
+        with mock.patch.object(settings.os.path, 'exists', lambda v: v.endswith('config.dev.json') or real_exists(v)), \
+                mock.patch.object(settings, 'read_json', side_effect=[main.config, override]):
+            config = settings.load_config('dev')
+        self.assertEqual(config['table_name'], 'dev-tasks')
+        self.assertEqual(config['cache'], dict(main.config['cache'], ttl=60))
+
+    def test_validation(self):
+        import main
+
+        for override, error in (
+                ({'cache': {'tll': 60}}, 'Unknown config.json cache settings: tll'),
+                ({'metrics': {'enabled': 'yes'}}, 'config.json metrics enabled should be bool'),
+                ({'server': {'timeout': True}}, 'config.json server timeout should be int'),
+                ({'boto': {'dev': {'read_timout': 5}}}, 'Unknown config.json boto dev settings: read_timout'),
+                ({'etag': 1}, 'config.json etag should be bool'),
+                ({'cach': {}}, 'Unknown config.json settings: cach'),
+        ):
+            with self.assertRaisesRegex(settings.ConfigError, error):
+                settings.validate(settings.merge(main.config, override))
+        # ints are floats
+        settings.validate(settings.merge(main.config, {'cache': {'ttl': 5}, 'boto': {'dev': {'read_timeout': 2.5}}}))
+
+
+class BotoConfigTest(unittest.TestCase):
+    boto = {
+        'default': {'retry_mode': 'adaptive', 'read_timeout': 5, 'max_pool_connections': 50},
+        'dev': {'retry_mode': 'standard', 'read_timeout': 30},
+    }
+
+    def test_boto_config(self):
+        import main
+
+        config = main.boto_config({'boto': self.boto}, 'default')
+        self.assertEqual(config.retries, {'mode': 'adaptive', 'max_attempts': 5})
+        self.assertEqual((config.read_timeout, config.connect_timeout), (5, 60))
+        self.assertEqual(config.max_pool_connections, 50)
+
+        with mock.patch.dict('os.environ', AIP_ENV='dev'):
+            config = main.boto_config({'boto': self.boto})
+        self.assertEqual(config.retries['mode'], 'standard')
+        self.assertEqual(config.read_timeout, 30)
+        self.assertEqual(config.max_pool_connections, 50)
+
+    def test_async_retry_mode(self):
+        import main
+
+        with mock.patch.object(main, 'load_config', return_value=dict(main.config, boto=self.boto)):
+            self.assertEqual(main.SimpleTodoDB().boto_config.retries['mode'], 'adaptive')
+            self.assertEqual(main.AsyncSimpleTodoDB().boto_config.retries['mode'], 'standard')
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        metrics.registry.clear()
+
+    def test_record_call(self):
+        model = mock.Mock()
+        model.name = 'Query'
+        params = {}
+        metrics._add_capacity_param(params, model)
+        self.assertEqual(params, {'ReturnConsumedCapacity': 'TOTAL'})
+
+        request = metrics.RequestMetrics()
+        token = metrics.current.set(request)
+        self.addCleanup(metrics.current.reset, token)
+        parsed = {'Count': 2, 'ScannedCount': 5, 'ConsumedCapacity': {'CapacityUnits': 1.5}}
+        metrics._record_call(parsed, model)
+        model.name = 'BatchGetItem'
+        parsed = {'Responses': {'t': [{}, {}, {}]}, 'ConsumedCapacity': [{'CapacityUnits': 1}, {'CapacityUnits': 2}]}
+        metrics._record_call(parsed, model)
+        with metrics.db_timer('list_page'):
+            pass
+
+        self.assertEqual((request.calls, request.capacity, request.scanned, request.returned), (2, 4.5, 8, 5))
+        self.assertRegex(request.server_timing(), (
+            r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="list_page", '
+            r'dynamodb;desc="calls=2 capacity=4.5 scanned=8 returned=5"$'
+        ))
+        text = metrics.registry.render()
+        self.assertIn('dynamodb_items_scanned_total{operation="Query"} 5\n', text)
+        self.assertIn('dynamodb_consumed_capacity_total{operation="BatchGetItem"} 3\n', text)
+        self.assertIn('api_db_calls_total{method="list_page"} 1\n', text)
+
+    def test_histogram(self):
+        metrics.registry.observe_request('list_tasks', 200, 0.02)
+        metrics.registry.observe_request('list_tasks', 200, 20)
+        text = metrics.registry.render()
+        self.assertIn('# TYPE api_request_duration_seconds histogram\n', text)
+        self.assertIn('api_request_duration_seconds_bucket{route="list_tasks",le="0.01"} 0\n', text)
+        self.assertIn('api_request_duration_seconds_bucket{route="list_tasks",le="0.025"} 1\n', text)
+        self.assertIn('api_request_duration_seconds_bucket{route="list_tasks",le="+Inf"} 2\n', text)
+        self.assertIn('api_request_duration_seconds_count{route="list_tasks"} 2\n', text)
+        self.assertIn('api_requests_total{route="list_tasks",status="200"} 2\n', text)
+
+    @mock_dynamodb2
+    def test_request_metrics(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        db.add('title 1')
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        with self.assertLogs('api') as cm:
+            resp = client.get('/api/v1/task/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('db;dur=', resp.headers['Server-Timing'])
+        self.assertIn('desc="list_page"', resp.headers['Server-Timing'])
+        self.assertIn('dynamodb;desc="calls=', resp.headers['Server-Timing'])
+
+        fields = json.loads(logs.JSONFormatter().format(cm.records[-1]))
+        self.assertEqual((fields['message'], fields['route'], fields['status']), ('request', 'list_tasks', 200))
+        self.assertGreater(fields['dynamodb_calls'], 0)
+        self.assertIn('list_page', fields['db_ms'])
+
+        text = client.get('/metrics').text
+        self.assertIn('api_requests_total{route="list_tasks",status="200"} 1\n', text)
+        self.assertIn('dynamodb_calls_total{operation="Query"}', text)
+
+    def test_exact_values(self):
+        self.assertEqual(metrics.format_value(1234567), '1234567')
+        self.assertEqual(metrics.format_value(1234567.0), '1234567')
+        self.assertEqual(metrics.format_value(1234567.125), '1234567.125')
+        metrics.registry.observe_request('list_tasks', 200, 12345.678901)
+        metrics.registry.requests[('list_tasks', '200')] = 1234567
+        text = metrics.registry.render()
+        self.assertIn('api_requests_total{route="list_tasks",status="200"} 1234567\n', text)
+        self.assertIn('api_request_duration_seconds_sum{route="list_tasks"} 12345.678901\n', text)
+
+    def test_merge(self):
+        metrics.registry.observe_request('list_tasks', 200, 0.02)
+        metrics.registry.observe_call('Query', 1, 5, 2)
+        snapshot = json.loads(json.dumps(metrics.registry.snapshot()))
+        total = metrics.Registry()
+        total.merge(snapshot)
+        total.merge(snapshot)
+        text = total.render()
+        self.assertIn('api_requests_total{route="list_tasks",status="200"} 2\n', text)
+        self.assertIn('api_request_duration_seconds_bucket{route="list_tasks",le="0.025"} 2\n', text)
+        self.assertIn('dynamodb_items_scanned_total{operation="Query"} 10\n', text)
+
+    def test_share(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        start_patch(self, mock.patch.object(metrics, 'shared'))
+        shared = metrics.share(directory.name, interval=0.01, cache=dict)
+        metrics.registry.observe_request('list_tasks', 200, 0.02)
+        time.sleep(0.1)
+        shared.stop()
+        with open(shared.path) as fp:
+            snapshot = json.load(fp)
+        self.assertEqual(snapshot['metrics']['requests'], [['list_tasks', '200', 1]])
+        self.assertEqual(snapshot['cache'], {})
+        self.assertIs(metrics.shared, shared)
+
+    @mock_dynamodb2
+    def test_workers(self):
+        import main
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db = main.SimpleTodoDB()
+        start_patch(self, mock.patch.object(main, 'db', db))
+        start_patch(self, mock.patch.object(
+            metrics, 'shared', metrics.WorkerSnapshots(directory.name, cache=lambda: main.db.cache_stats())))
+
+        # another running worker, and an exited one, its pid above pid_max
+        other = metrics.Registry()
+        for _ in range(3):
+            other.observe_request('list_tasks', 200, 0.02)
+        stats = {'size': 1, 'maxsize': 64, 'ttl': 5, 'hits': 4, 'misses': 1}
+        for pid in (os.getppid(), 2 ** 22 + 1):
+            with open(os.path.join(directory.name, f'{pid}.json'), 'w') as fp:
+                json.dump({'pid': pid, 'metrics': other.snapshot(), 'cache': {'list': stats, 'item': stats}}, fp)
+
+        client = TestClient(main.app)
+        client.get('/api/v1/task/')
+        text = client.get('/metrics').text
+        self.assertIn('api_requests_total{route="list_tasks",status="200"} 7\n', text)
+
+        resp = client.get('/api/v1/cache/').json()
+        self.assertEqual(resp['workers'], 2)
+        self.assertEqual(resp['list']['hits'], db.cache_stats()['list']['hits'] + 4)
+        self.assertEqual(resp['list']['maxsize'], db.cache_stats()['list']['maxsize'] + 64)
+
+
+class LogsTest(unittest.TestCase):
+
+    def test_queued_json_lines(self):
+        stream = io.StringIO()
+        logs.get_logger('test_logs', stream=stream, json_format=True, use_queue=True)
+        logger = logs.get_logger('test_logs', stream=stream, json_format=True, use_queue=True)
+        logger.info('request', extra={'fields': {'route': 'list_tasks', 'db_ms': lambda: 1.5}})
+        logs.stop_loggers()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        entry = json.loads(lines[0])
+        self.assertEqual((entry['message'], entry['route'], entry['db_ms']), ('request', 'list_tasks', 1.5))
+
+
+class ServerConfigTest(unittest.TestCase):
+
+    def test_metrics_dir(self):
+        import gunicorn_conf
+
+        with mock.patch.dict('os.environ'):
+            os.environ.pop('METRICS_DIR', None)
+            importlib.reload(gunicorn_conf)
+            self.assertNotIn('METRICS_DIR', os.environ)
+            gunicorn_conf.on_starting(None)
+            directory = os.environ['METRICS_DIR']
+            self.assertTrue(os.path.isdir(directory))
+            gunicorn_conf.on_exit(None)
+            self.assertFalse(os.path.exists(directory))
+            self.assertNotIn('METRICS_DIR', os.environ)
+
+            # set by the task, kept
+            os.environ['METRICS_DIR'] = directory
+            gunicorn_conf.on_starting(None)
+            gunicorn_conf.on_exit(None)
+            self.assertEqual(os.environ['METRICS_DIR'], directory)
+
+    def test_worker_count(self):
+        import gunicorn_conf
+
+        self.assertEqual(gunicorn_conf.worker_count(256), 1)
+        self.assertEqual(gunicorn_conf.worker_count(1024), 2)
+        self.assertEqual(gunicorn_conf.worker_count(4096), 8)
+        self.assertEqual(gunicorn_conf.worker_count(2048, workers_per_cpu=1), 2)
+        with mock.patch('multiprocessing.cpu_count', return_value=3):
+            self.assertEqual(gunicorn_conf.worker_count(), 6)
+
+    def test_keepalive(self):
+        import gunicorn_conf
+
+        self.assertGreater(gunicorn_conf.keepalive, gunicorn_conf.server['alb_idle_timeout'])
+        self.assertEqual(gunicorn_conf.worker_class, 'uvicorn.workers.UvicornWorker')
+
+    def test_env_config(self):
+        import gunicorn_conf
+
+        base = settings.load_config()
+        override = {'server': {'timeout': 90}}
+        with mock.patch.dict('os.environ', AIP_ENV='prod'), \
+                mock.patch.object(settings, 'read_json', side_effect=[base, override]):
+            importlib.reload(gunicorn_conf)
+        self.addCleanup(importlib.reload, gunicorn_conf)
+        self.assertEqual(gunicorn_conf.timeout, 90)
+        self.assertEqual(gunicorn_conf.max_requests, base['server']['max_requests'])
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_lru_and_version(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2, version=1)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b', version=1))
+        self.assertEqual(cache.get('c'), 3)
+
+        cache.set('b', 2, version=1)
+        self.assertIsNone(cache.get('b', version=2))
+        self.assertEqual(cache.stats(), {'size': 1, 'maxsize': 2, 'ttl': 60, 'hits': 2, 'misses': 2})
+
+    def test_ttl(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        with mock.patch('cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class FastJSONResponseTest(unittest.TestCase):
+
+    def test_render(self):
+        tasks = [{'id': 'a', 'title': 'Tâche 1', 'is_done': True, 'created_at': '2021-01-01T00:00:00'}]
+        body = fast_json.FastJSONResponse(tasks).body
+        with mock.patch.object(fast_json, 'orjson', None):
+            self.assertEqual(fast_json.FastJSONResponse(tasks).body, body)
+        self.assertEqual(json.loads(body), tasks)
+
+    @mock_dynamodb2
+    def test_fast_json_disabled(self):
+        import main
+
+        db = main.SimpleTodoDB()
+        task = db.add('title 1')
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db))
+        for fast in (True, False):
+            with mock.patch.dict(main.config, fast_json=fast):
+                resp = client.get('/api/v1/task/')
+            self.assertEqual(resp.json(), [task])
+            self.assertIn('ETag', resp.headers)
+
+
+class TaskCacheTest(unittest.TestCase):
+
+    def _db(self, shared):
+        import main
+
+        config = dict(main.load_config(), cache={'ttl': 60, 'shared': shared})
+        with mock.patch.object(main, 'load_config', return_value=config):
+            return main.SimpleTodoDB()
+
+    @mock_dynamodb2
+    def test_local_cache(self):
+        import main
+
+        db = self._db(shared=False)
+        t1 = db.add('title 1')
+        self.assertEqual(db.list(), [t1])
+        self.assertEqual(db.list(), [t1])
+        self.assertEqual(db.get(t1['id']), t1)
+        self.assertEqual(db.cache_stats()['list']['hits'], 1)
+        self.assertEqual(db.cache_stats()['item']['hits'], 1)
+
+        t2 = db.add('title 2')
+        self.assertEqual(db.list(), [t1, t2])
+        db.update(t1['id'], 'Archived')
+        self.assertEqual(db.list(), [t2])
+        with self.assertRaises(main.TaskNotFound):
+            db.get(t1['id'])
+
+    @mock_dynamodb2
+    def test_shared_cache(self):
+        import main
+
+        db1, db2 = self._db(shared=True), self._db(shared=True)
+        t1 = db1.add('title 1')
+        self.assertEqual(db1.list(), [t1])
+        self.assertEqual(db1.list(), [t1])
+        self.assertEqual(db1.cache_stats()['list']['hits'], 1)
+
+        t2 = db2.add('title 2')
+        self.assertEqual(db1.list(), [t1, t2])
+        db2.update(t2['id'], 'Done')
+        self.assertTrue(db1.get(t2['id'])['is_done'])
+
+        client = TestClient(main.app)
+        with mock.patch.object(main, 'db', db1):
+            resp = client.get('/api/v1/cache/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['shared'])
+
+    @mock_dynamodb2
+    def test_local_cache_etag(self):
+        import main
+
+        # two replicas, the list cache of each is local
+        db1, db2 = self._db(shared=False), self._db(shared=False)
+        client = TestClient(main.app)
+        start_patch(self, mock.patch.object(main, 'db', db1))
+        t1 = db1.add('title 1')
+        resp = client.get('/api/v1/task/')
+        etag = resp.headers['ETag']
+        self.assertEqual(resp.json(), [t1])
+
+        # written by the other replica, the cached list is stale
+        t2 = db2.add('title 2')
+        resp = client.get('/api/v1/task/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+        self.assertEqual(resp.json(), [t1, t2])
+
+        # cached for the version it was read at
+        resp = client.get('/api/v1/task/')
+        self.assertEqual(resp.json(), [t1, t2])
+        self.assertEqual(db1.cache_stats()['list']['hits'], 1)
+
+
+class MotoServerMixin:
+    """Run moto in server mode for the async backend
+
+    aiobotocore sends requests through aiohttp, which mock_dynamodb2 can't intercept.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        app = DomainDispatcherApplication(create_backend_app, service='dynamodb2')
+        cls.server = make_server('127.0.0.1', 0, app, threaded=True)
+        cls.endpoint_url = f'http://127.0.0.1:{cls.server.server_port}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        # The server shares moto backends with the mock_dynamodb2 tests
+        for backend in dynamodb_backends2.values():
+            backend.reset()
+
+
+class AsyncTaskDBTest(MotoServerMixin, unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        import main
+
+        self.db = main.AsyncSimpleTodoDB(self.endpoint_url)
+        await self.db.connect()
+
+    async def asyncTearDown(self):
+        await self.db.table.delete()
+        await self.db.close()
+
+    async def test_create_update_and_list(self):
+        import main
+
+        t1, t2, t3 = [await self.db.add(f'title {i}') for i in range(3)]
+        self.assertEqual(await self.db.update(t2['id'], 'Done'), dict(t2, is_done=True))
+        await self.db.update(t3['id'], 'Archived')
+        self.assertEqual(await self.db.list(), [t1, dict(t2, is_done=True)])
+
+        page, cursor = await self.db.list_page(limit=1)
+        self.assertEqual(page, [t1])
+        page, cursor = await self.db.list_page(limit=1, cursor=cursor)
+        self.assertEqual(page, [dict(t2, is_done=True)])
+
+        with self.assertRaises(main.TaskNotFound):
+            await self.db.update('missing-id', 'Done')
+
+    async def test_add_and_update_many(self):
+        results = await self.db.add_many([f'title {i}' for i in range(30)])
+        self.assertTrue(all(v['ok'] for v in results))
+        ids = [v['id'] for v in results]
+
+        results = await self.db.update_many([(ids[0], 'Archived'), ('missing-id', 'Done')])
+        self.assertEqual([v['ok'] for v in results], [True, False])
+        self.assertEqual(len(await self.db.list()), 29)
+
+        records = [v async for v in self.db.export()]
+        self.assertEqual(len(records), 30)
+        self.assertEqual([v['status'] for v in records].count('Archived'), 1)
+
+
+class AsyncTaskAPITest(MotoServerMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # TestClient runs the app in the current event loop of the thread
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.addCleanup(loop.close)
+
+    def test_request_status(self):
+        import main
+
+        db = main.AsyncSimpleTodoDB(self.endpoint_url)
+        with mock.patch.object(main, 'db', db), TestClient(main.app) as client:
+            resp = client.post('/api/v1/task/', json={'title': 'title 1'})
+            self.assertEqual(resp.status_code, 201)
+            id_ = resp.json()['id']
+
+            resp = client.patch(f'/api/v1/task/{id_}/', json={'is_done': True})
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.json()['is_done'])
+
+            resp = client.get('/api/v1/task/')
+            self.assertEqual([v['id'] for v in resp.json()], [id_])
+
+            resp = client.delete(f'/api/v1/task/{id_}/')
+            self.assertEqual(resp.status_code, 204)
+
+            resp = client.delete('/api/v1/task/missing-id/')
+            self.assertEqual(resp.status_code, 404)
+
+            resp = client.get('/api/v1/task/export')
+            self.assertEqual([json.loads(v)['status'] for v in resp.text.splitlines()], ['Archived'])
+        self.assertIsNone(db.table)
+
+
+class LoadTestTest(MotoServerMixin, unittest.TestCase):
+
+    def test_helpers(self):
+        import loadtest
+
+        self.assertEqual(loadtest.parse_mix('list=3, add=1,delete'), {'list': 3, 'add': 1, 'delete': 1})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('list=1,get=1')
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('list=0')
+
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(loadtest.percentile(values, 50), 0.05)
+        self.assertEqual(loadtest.percentile(values, 99), 0.099)
+        self.assertIsNone(loadtest.percentile([], 50))
+        self.assertEqual(loadtest.summarize(values, 2, 2)['p95_ms'], 95)
+
+    def test_run(self):
+        import main
+        import loadtest
+
+        args = loadtest.parse_args([
+            '--duration', '0.5', '--concurrency', '2', '--seed', '5',
+            '--endpoint-url', self.endpoint_url,
+        ])
+        with mock.patch.object(main, 'db'), mock.patch.object(main, 'connector', main.DBConnector()):
+            report = loadtest.run(args)
+        self.assertEqual(report['config']['backend'], 'async')
+        self.assertEqual(report['config']['in_process'], ['api', 'load generator'])
+        self.assertGreater(report['total']['requests'], 0)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertEqual(set(report['operations']), {'list', 'add', 'update', 'delete'})
+        self.assertIsNotNone(report['total']['p99_ms'])
+
+    def test_no_tasks(self):
+        import loadtest
+
+        # update and delete only, no task to pick: clients wait instead of spinning
+        test = loadtest.LoadTest('http://127.0.0.1', {'update': 1, 'delete': 1}, concurrency=1, duration=0.1)
+        with mock.patch.object(loadtest.asyncio, 'sleep', wraps=asyncio.sleep) as sleep:
+            asyncio.run(test._client(None, time.perf_counter() + 0.1))
+        self.assertLess(sleep.call_count, 50)
+        self.assertGreater(sleep.call_count, 0)
+        self.assertEqual(test.latencies, {'update': [], 'delete': []})
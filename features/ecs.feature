@@ -6,7 +6,7 @@ Feature: Check ecs, fargate service and cloudftont
 
         Examples: cluster
             | cluster_name | status |
-            | Infra-Cluster | ACTIVE |
+            | EricDemoCluster | ACTIVE |
 
     Scenario Outline: Checking service
         Given I get the cluster by searching <cluster_name>
@@ -15,7 +15,7 @@ Feature: Check ecs, fargate service and cloudftont
 
         Examples: service
             | cluster_name | service_name  | container_name |
-            | Infra-Cluster | Infra-FargateService | eric-devops-demo-api |
+            | EricDemoCluster | Infra-Compute-FargateService | eric-devops-demo-api |
 
 
     Scenario Outline: Checking task definition
@@ -29,7 +29,7 @@ Feature: Check ecs, fargate service and cloudftont
 
         Examples: task_def
             | cluster_name | service_name  | container_name | container_port | cpu | memory |
-            | Infra-Clust | Infra-FargateService | eric-devops-demo-api | 80 | 256 | 512 |
+            | EricDemoCluster | Infra-Compute-FargateService | eric-devops-demo-api | 80 | 256 | 512 |
 
 
     Scenario Outline: Checking task role policies
@@ -41,4 +41,4 @@ Feature: Check ecs, fargate service and cloudftont
 
         Examples: task_role
             | cluster_name | service_name  | sid |
-            | Infra-Clust | Infra-FargateService | AllowFargateAccessDynamoDB |
+            | EricDemoCluster | Infra-Compute-FargateService | AllowFargateAccessDynamoDB |
@@ -1,8 +1,284 @@
+"""Behave hooks and the AWS snapshot of a run
+
+Steps look resources up in ctx.snapshot instead of calling AWS. Each
+inventory (clusters, services, task definitions, VPCs, subnets, IAM
+roles, pipelines) is fetched once per run, paginated, and the
+inventories are fetched concurrently in before_all. Lookups are answered
+from in-memory indexes. CloudFront distributions are looked up in
+ctx.distributions, see aip.cloudfront.
+
+The stack outputs (see aip.outputs) name the resources of the stacks
+under test, AIP_STACK_NAME or Infra. Inventories they name are fetched
+by name instead of listing the whole account, the others are listed.
+
+Feature files can run in parallel workers sharing one snapshot: dump it
+once and point the workers at it with AIP_SNAPSHOT, see
+bin/acceptance.sh:
+
+    python3 features/environment.py /tmp/snapshot.json
+    AIP_SNAPSHOT=/tmp/snapshot.json behave features/ecs.feature
+
+"""
+
+import os
+import sys
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from aip.cloudfront import DistributionIndex
+from aip.helpers import get_client
+from aip.outputs import StackOutputs
+
+
+def tag_value(item: dict, key: str):
+    """Value of a tag of an EC2 resource"""
+    for tag in item.get('Tags', []):
+        if tag['Key'] == key:
+            return tag['Value']
+    return None
+
+
+def chunks(items: list, size: int):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class Snapshot:
+    """AWS inventory of a test run, fetched once and indexed"""
+
+    # Inventories fetched by prefetch(), by method name
+    inventories = ('clusters', 'services', 'task_definitions', 'vpcs', 'subnets', 'roles', 'pipelines')
+
+    def __init__(
+        self, session: boto3.session.Session = None, data: dict = None, max_workers: int = 8,
+        outputs: StackOutputs = None,
+    ):
+        """Set up an empty or loaded snapshot
+
+        Parameters
+        ----------
+        session : boto3.session.Session
+            session of the AWS clients
+        data : dict
+            inventories fetched before, see dump
+        max_workers : int
+            threads fetching inventories and details
+        outputs : aip.outputs.StackOutputs
+            outputs of the stacks under test, inventories are listed if not given
+
+        """
+        self.session = session or boto3.session.Session()
+        self.outputs = outputs
+        self.max_workers = max_workers
+        self._data = dict(data or {})
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._locks = defaultdict(threading.Lock)
+
+    def client(self, service: str):
+        """Shared client of a service, botocore clients are thread safe"""
+        with self._lock:
+            if service not in self._clients:
+                self._clients[service] = get_client(service, self.session)
+            return self._clients[service]
+
+    def _cached(self, key: str, fetch):
+        """Value of key, fetched once even when asked from several threads"""
+        if key in self._data:
+            return self._data[key]
+        with self._lock:
+            lock = self._locks[key]
+        with lock:
+            if key not in self._data:
+                self._data[key] = fetch()
+        return self._data[key]
+
+    def _map(self, func, items):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def _named(self, *keys) -> list:
+        """Values of the stack outputs, empty if any of them is unknown"""
+        values = [self.outputs.get(v) for v in keys] if self.outputs else []
+        return values if values and all(values) else []
+
+    def _paginate(self, service: str, operation: str, key: str, **kwargs):
+        paginator = self.client(service).get_paginator(operation)
+        return [item for page in paginator.paginate(**kwargs) for item in page[key]]
+
+    def prefetch(self, names: tuple = None):
+        """Fetch inventories concurrently
+
+        Parameters
+        ----------
+        names : tuple
+            inventory names, default is all of them
+
+        """
+        if self.outputs is not None:
+            # Described once, before the threads read them
+            self.outputs.stacks
+        self._map(lambda name: getattr(self, name)(), names or self.inventories)
+
+    def dump(self, path: str):
+        """Write the fetched inventories to a json file"""
+        with open(path, 'w') as fp:
+            json.dump(self._data, fp, default=str)
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        """Snapshot of the inventories dumped to a json file"""
+        with open(path) as fp:
+            return cls(data=json.load(fp), **kwargs)
+
+    @property
+    def stack_name(self) -> str:
+        """Stack name prefix of the environment under test, like Infra or Infra-dev"""
+        return self.outputs.stack_name if self.outputs else os.environ.get('AIP_STACK_NAME', 'Infra')
+
+    # Inventories
+
+    def clusters(self) -> dict:
+        """ECS clusters by ARN"""
+        def fetch():
+            ecs = self.client('ecs')
+            arns = self._named('ClusterArn') or self._paginate('ecs', 'list_clusters', 'clusterArns')
+            described = self._map(lambda v: ecs.describe_clusters(clusters=v)['clusters'], chunks(arns, 100))
+            return {v['clusterArn']: v for batch in described for v in batch}
+        return self._cached('clusters', fetch)
+
+    def services(self) -> dict:
+        """ECS services by cluster ARN"""
+        def fetch_cluster(cluster_arn):
+            ecs = self.client('ecs')
+            if [cluster_arn] == self._named('ClusterArn') and self._named('ServiceName'):
+                return ecs.describe_services(cluster=cluster_arn, services=self._named('ServiceName'))['services']
+            arns = self._paginate('ecs', 'list_services', 'serviceArns', cluster=cluster_arn)
+            return [
+                service for batch in chunks(arns, 10)
+                for service in ecs.describe_services(cluster=cluster_arn, services=batch)['services']
+            ]
+
+        def fetch():
+            arns = list(self.clusters())
+            return dict(zip(arns, self._map(fetch_cluster, arns)))
+        return self._cached('services', fetch)
+
+    def task_definitions(self) -> dict:
+        """Task definitions of the ECS services by ARN"""
+        def fetch():
+            ecs = self.client('ecs')
+            arns = sorted({v['taskDefinition'] for services in self.services().values() for v in services})
+            described = self._map(lambda v: ecs.describe_task_definition(taskDefinition=v)['taskDefinition'], arns)
+            return dict(zip(arns, described))
+        return self._cached('task_definitions', fetch)
+
+    def vpcs(self) -> dict:
+        """VPCs by Name tag"""
+        def fetch():
+            vpc_ids = self._named('VpcId')
+            kwargs = {'VpcIds': vpc_ids} if vpc_ids else {}
+            return {tag_value(v, 'Name'): v for v in self._paginate('ec2', 'describe_vpcs', 'Vpcs', **kwargs)}
+        return self._cached('vpcs', fetch)
+
+    def subnets(self) -> dict:
+        """Subnets by VPC id"""
+        def fetch():
+            subnets = defaultdict(list)
+            vpc_ids = self._named('VpcId')
+            kwargs = {'Filters': [{'Name': 'vpc-id', 'Values': vpc_ids}]} if vpc_ids else {}
+            for subnet in self._paginate('ec2', 'describe_subnets', 'Subnets', **kwargs):
+                subnets[subnet['VpcId']].append(subnet)
+            return dict(subnets)
+        return self._cached('subnets', fetch)
+
+    def roles(self) -> dict:
+        """IAM roles by name"""
+        def fetch():
+            names = self._named('TaskRoleName', 'ApiBuildRoleName', 'WebBuildRoleName')
+            if names:
+                iam = self.client('iam')
+                return dict(zip(names, self._map(lambda v: iam.get_role(RoleName=v)['Role'], names)))
+            return {v['RoleName']: v for v in self._paginate('iam', 'list_roles', 'Roles')}
+        return self._cached('roles', fetch)
+
+    def pipelines(self) -> dict:
+        """CodePipeline pipelines by name"""
+        def fetch():
+            codepipeline = self.client('codepipeline')
+            names = self._named('ApiPipelineName', 'WebPipelineName') or [
+                v['name'] for v in self._paginate('codepipeline', 'list_pipelines', 'pipelines')
+            ]
+            return dict(zip(names, self._map(lambda v: codepipeline.get_pipeline(name=v)['pipeline'], names)))
+        return self._cached('pipelines', fetch)
+
+    def role_policies(self, role_name: str) -> list:
+        """Inline policies of a role, fetched on first use"""
+        def fetch():
+            iam = self.client('iam')
+            names = self._paginate('iam', 'list_role_policies', 'PolicyNames', RoleName=role_name)
+            return self._map(lambda v: iam.get_role_policy(RoleName=role_name, PolicyName=v), names)
+        return self._cached(f'role_policies:{role_name}', fetch)
+
+    # Lookups
+
+    def find_cluster(self, text: str) -> dict:
+        """First cluster whose ARN contains text"""
+        return next((v for arn, v in sorted(self.clusters().items()) if text in arn), None)
+
+    def find_service(self, cluster_arn: str, text: str) -> dict:
+        """First service of a cluster whose ARN contains text"""
+        return next((v for v in self.services().get(cluster_arn, []) if text in v['serviceArn']), None)
+
+    def task_definition(self, arn: str) -> dict:
+        return self.task_definitions()[arn]
+
+    def vpc(self, name: str) -> dict:
+        return self.vpcs().get(name)
+
+    def vpc_subnets(self, vpc_id: str) -> list:
+        return self.subnets().get(vpc_id, [])
+
+    def roles_with_prefix(self, prefix: str) -> list:
+        return [v for name, v in sorted(self.roles().items()) if name.startswith(prefix)]
+
+    def stack_role(self, output_key: str, name: str) -> dict:
+        """Role of a stack under test, named by a stack output or by prefix
+
+        Parameters
+        ----------
+        output_key : str
+            output of the role name, like ApiBuildRoleName
+        name : str
+            role name prefix after the stack name, like Pipelines-ApiBuild
+
+        """
+        role_names = self._named(output_key)
+        if role_names:
+            return self.roles().get(role_names[0])
+        founds = self.roles_with_prefix(f'{self.stack_name}-{name}')
+        return founds[0] if founds else None
+
+    def pipeline(self, name: str) -> dict:
+        return self.pipelines()[name]
+
+
 def before_all(ctx):
-    pass
+    # Cached on disk, shared by the workers of a run
+    ctx.outputs = StackOutputs(os.environ.get('AIP_STACK_NAME', 'Infra'))
+    ctx.distributions = DistributionIndex(ctx.outputs.session)
+    path = os.environ.get('AIP_SNAPSHOT')
+    if path and os.path.exists(path):
+        ctx.snapshot = Snapshot.load(path, session=ctx.outputs.session, outputs=ctx.outputs)
+    else:
+        ctx.snapshot = Snapshot(ctx.outputs.session, outputs=ctx.outputs)
+        ctx.snapshot.prefetch()
 
 
-def alfter_all(ctx):
+def after_all(ctx):
     pass
 
 
@@ -10,5 +286,15 @@ def before_step(ctx, step):
     pass
 
 
-def after_steop(ctx, step):
+def after_step(ctx, step):
     pass
+
+
+if __name__ == '__main__':
+    # Right after a deploy the cached outputs may be stale
+    outputs = StackOutputs(os.environ.get('AIP_STACK_NAME', 'Infra'))
+    outputs.refresh()
+    snapshot = Snapshot(outputs.session, outputs=outputs)
+    snapshot.prefetch()
+    snapshot.dump(sys.argv[1])
+    DistributionIndex(snapshot.session).refresh()
@@ -27,4 +27,4 @@ Feature: Check piplines, including API and Web frontend
         Examples: deploy_stage
             | pipeline_name | action_type | provider_name |
             | EricDemoWebPipeline | S3 | eric-devops-demo-web |
-            | EricDemoApiPipeline | ECS | Infra-Cluster |
+            | EricDemoApiPipeline | ECS | EricDemoCluster |
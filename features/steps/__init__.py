@@ -1,4 +0,0 @@
-import boto3
-
-
-session = boto3.session.Session()
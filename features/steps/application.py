@@ -1,6 +1,6 @@
 import time
 from behave import *
-import boto3
+from aip.cloudfront import website_domain
 import requests
 
 session = requests.session()
@@ -8,16 +8,14 @@ session = requests.session()
 
 @given('I am ready to go')
 def step_impl(ctx):
-    sts = boto3.client('sts')
-    cf = boto3.client('cloudfront')
-    region_name = sts.meta.region_name
-
-    bucket_name = 'eric-devops-demo-web'
-    resp = cf.list_distributions()
-    ctx.default_domain_name = f"{bucket_name}.s3-website-{region_name}.amazonaws.com"
-    founds = list(filter(lambda v: v['Origins']['Items'][0]['DomainName'] == ctx.default_domain_name, resp['DistributionList']['Items']))
-    distribution = founds and founds[0]
-    ctx.domain_name = distribution['DomainName']
+    ctx.domain_name = ctx.outputs.get('DistributionDomainName')
+    if not ctx.domain_name:
+        # Stacks deployed before they had outputs
+        bucket_name = 'eric-devops-demo-web'
+        ctx.default_domain_name = website_domain(bucket_name, ctx.distributions.session.region_name)
+        distribution = ctx.distributions.by_origin(ctx.default_domain_name)
+        assert distribution
+        ctx.domain_name = distribution['DomainName']
 
 
 @when('I get the task list')
@@ -1,18 +1,12 @@
 from behave import *
-from __init__ import session
+from aip.cloudfront import website_domain
 
 
 @given('I get the distribution by bucket {bucket_name}')
 def step_impl(ctx, bucket_name):
-    sts = session.client('sts')
-    cf = session.client('cloudfront')
-    # account = sts.get_caller_identity()['Account']
-    region_name = sts.meta.region_name
-
-    resp = cf.list_distributions()
-    ctx.default_domain_name = f"{bucket_name}.s3-website-{region_name}.amazonaws.com"
-    founds = list(filter(lambda v: v['Origins']['Items'][0]['DomainName'] == ctx.default_domain_name, resp['DistributionList']['Items']))
-    ctx.distribution = founds and founds[0]
+    ctx.default_domain_name = website_domain(bucket_name, ctx.distributions.session.region_name)
+    ctx.distribution = ctx.distributions.by_origin(ctx.default_domain_name)
+    assert ctx.distribution
     ctx.origins = {
         item['Id']: item
         for item in ctx.distribution['Origins']['Items']
@@ -1,16 +1,10 @@
 from behave import *
-from __init__ import session
 
 
 @given('I get the cluster by searching {cluster_name}')
 def step_impl(ctx, cluster_name):
-    ecs = session.client('ecs')
-    resp = ecs.list_clusters()
-    arns = list(filter(lambda v: v.find(cluster_name) >= 0, resp['clusterArns']))
-    arn = arns[0] if arns else None
-
-    resp = ecs.describe_clusters(clusters=[arn])
-    ctx.cluster = resp['clusters'][0]
+    ctx.cluster = ctx.snapshot.find_cluster(cluster_name)
+    assert ctx.cluster
 
 
 @then('I expect the cluster status is {status}')
@@ -20,16 +14,8 @@ def step_impl(ctx, status):
 
 @given('I get the service by searching {service_name}')
 def step_impl(ctx, service_name):
-    ecs = session.client('ecs')
-    resp = ecs.list_services(cluster=ctx.cluster['clusterArn'])
-    arns = list(filter(lambda v: v.find(service_name) >= 0, resp['serviceArns']))
-    service_arn = arns[0] if arns else None
-
-    resp = ecs.describe_services(
-        cluster=ctx.cluster['clusterName'],
-        services=[service_arn.split('/')[-1]]
-    )
-    ctx.service = resp['services'][0]
+    ctx.service = ctx.snapshot.find_service(ctx.cluster['clusterArn'], service_name)
+    assert ctx.service
 
 
 @then('I expect the continaer name in LB is {container_name}')
@@ -39,11 +25,9 @@ def step_impl(ctx, container_name):
 
 @when('I get the task definition from service')
 def step_impl(ctx):
-    ecs = session.client('ecs')
     task_def_name = ctx.service['taskDefinition']
     assert len(list(filter(lambda v: v['taskDefinition'] == task_def_name, ctx.service['deployments']))) > 0
-    resp = ecs.describe_task_definition(taskDefinition=task_def_name)
-    ctx.task_def = resp['taskDefinition']
+    ctx.task_def = ctx.snapshot.task_definition(task_def_name)
 
 
 @then('I expect the continaer cpu is {cpu}')
@@ -70,14 +54,9 @@ def step_impl(ctx, container_name):
 
 @then('I expect to see the task role arn and the policy {sid}')
 def step_impl(ctx, sid):
-    iam = session.client('iam')
     assert 'taskRoleArn' in ctx.task_def
     role_name = ctx.task_def['taskRoleArn'].split('/')[-1]
-    resp = iam.list_role_policies(RoleName=role_name)
-    policy_name = resp['PolicyNames'][0]
-
-    policy = iam.get_role_policy(RoleName=role_name, PolicyName=policy_name)
-    ctx.policy = policy
+    ctx.policy = ctx.snapshot.role_policies(role_name)[0]
     assert ctx.policy['PolicyDocument']['Statement'][0]['Sid'] == sid
 
 
@@ -1,12 +1,9 @@
 from behave import *
-from __init__ import session
 
 
 @given('I get the pipeline by name {pipeline_name}')
 def step_impl(ctx, pipeline_name):
-    pipeline = session.client('codepipeline')
-    resp = pipeline.get_pipeline(name=pipeline_name)
-    ctx.pipeline = resp['pipeline']
+    ctx.pipeline = ctx.snapshot.pipeline(pipeline_name)
     assert ctx.pipeline['name'] == pipeline_name
 
 
@@ -29,15 +26,9 @@ def step_impl(ctx):
 
 @then('I expect it has ECR permissions to push image')
 def step_impl(ctx):
-    iam = session.client('iam')
-    resp = iam.list_roles()
-    founds = list(filter(lambda v: v['RoleName'].startswith('Infra-ApiBuild'), resp['Roles']))
-    role_name = founds and founds[0]['RoleName']
-
-    resp = iam.list_role_policies(RoleName=role_name)
-    policy_name = resp['PolicyNames'][0]
-
-    ctx.policy = iam.get_role_policy(RoleName=role_name, PolicyName=policy_name)
+    role = ctx.snapshot.stack_role('ApiBuildRoleName', 'Pipelines-ApiBuild')
+    assert role
+    ctx.policy = ctx.snapshot.role_policies(role['RoleName'])[0]
     action = None
     for stat in ctx.policy['PolicyDocument']['Statement']:
         _action = stat['Action']
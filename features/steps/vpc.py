@@ -1,5 +1,4 @@
 from behave import *
-from __init__ import session
 
 
 def tag_value(item, key):
@@ -11,11 +10,7 @@ def tag_value(item, key):
 
 @given('I am in the Vpc {vpc_name}')
 def step_impl(ctx, vpc_name):
-    ec2 = session.client('ec2')
-    for vpc in ec2.describe_vpcs()['Vpcs']:
-        if tag_value(vpc, 'Name') == vpc_name:
-            ctx.vpc = vpc
-            break
+    ctx.vpc = ctx.snapshot.vpc(vpc_name)
     assert ctx.vpc
 
 
@@ -26,12 +21,8 @@ def step_impl(ctx, cidr):
 
 @then('I expect the subnets count is {subnet_count}')
 def step_impl(ctx, subnet_count):
-    ec2 = session.client('ec2')
-    resp = ec2.describe_subnets(
-        Filters=[{'Name': 'vpc-id', 'Values': [ctx.vpc['VpcId']]}]
-    )
-    ctx.subnets = resp['Subnets']
-    assert len(resp['Subnets']) == int(subnet_count)
+    ctx.subnets = ctx.snapshot.vpc_subnets(ctx.vpc['VpcId'])
+    assert len(ctx.subnets) == int(subnet_count)
 
 
 @then('I expect the availability zones count is {az_count}')
@@ -47,13 +38,10 @@ def step_impl(ctx, subnet_type):
 
 @then('I expect the subnet cidr is {cidr1} and {cidr2}')
 def step_impl(ctx, cidr1, cidr2):
-    ec2 = session.client('ec2')
-    resp = ec2.describe_subnets(
-        Filters=[
-            {'Name': 'vpc-id', 'Values': [ctx.vpc['VpcId']]},
-        ]
-    )
-    subnets = list(filter(lambda v: tag_value(v, 'aws-cdk:subnet-type') == ctx.subnet_type, resp['Subnets']))
+    subnets = list(filter(
+        lambda v: tag_value(v, 'aws-cdk:subnet-type') == ctx.subnet_type,
+        ctx.snapshot.vpc_subnets(ctx.vpc['VpcId'])
+    ))
     ctx.subnets = subnets
     assert sorted([v['CidrBlock'] for v in subnets]) == [cidr1, cidr2]
 
@@ -8,7 +8,7 @@ Feature: Check Vpc and subnets states
 
         Examples: vpc
             | vpc_name | cidr | subnet_count | az_count |
-            | Infra/Vpc | 10.20.0.0/16 | 4 | 2 |
+            | Infra-Network/Vpc | 10.20.0.0/16 | 4 | 2 |
 
     Scenario Outline: Checking subnets
         Given I am in the Vpc <vpc_name>
@@ -18,5 +18,5 @@ Feature: Check Vpc and subnets states
 
         Examples: subnet
             | vpc_name | subnet_type | cidr1 | cidr2 |
-            | Infra/Vpc | public | 10.20.0.0/24 | 10.20.1.0/24 |
-            | Infra/Vpc | private | 10.20.2.0/24 | 10.20.3.0/24 |
+            | Infra-Network/Vpc | public | 10.20.0.0/24 | 10.20.1.0/24 |
+            | Infra-Network/Vpc | private | 10.20.2.0/24 | 10.20.3.0/24 |
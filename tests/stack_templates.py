@@ -0,0 +1,163 @@
+"""Synthesized CloudFormation templates of the test stacks
+
+The stacks of the default environment are synthesized once per test
+session, with the account and region given as context so nothing asks
+STS. Their templates are written to .cache/test-templates, keyed by the
+fingerprint of the synth inputs (see aip.synth.fingerprint), so later
+runs and other test processes load plain JSON without starting jsii.
+Writes are atomic, test processes running in parallel share the cache.
+
+Tests assert against plain dicts through Template lookups:
+
+    compute = template('Compute')
+    service = compute.one('AWS::ECS::Service')
+    compute.get(service, 'Properties.DesiredCount')
+
+"""
+
+import os
+import json
+import bisect
+import hashlib
+import tempfile
+import functools
+from collections import defaultdict
+
+from aip.config import root_dir
+from aip.synth import fingerprint
+
+context = {'account': '123456789012', 'region': 'us-east-1'}
+construct_id = 'AipTestStack'
+cache_dir = os.path.join(root_dir, '.cache', 'test-templates')
+
+_missing = object()
+
+
+class Template:
+    """CloudFormation template with indexed resource lookups"""
+
+    def __init__(self, stack_name: str, template: dict, dependencies: list = ()):
+        self.stack_name = stack_name
+        self.template = template
+        self.dependencies = sorted(dependencies)
+        self.resources = template.get('Resources', {})
+        self.outputs = template.get('Outputs', {})
+        self._ids = sorted(self.resources)
+        self._by_type = defaultdict(dict)
+        for logical_id in self._ids:
+            resource = self.resources[logical_id]
+            self._by_type[resource['Type']][logical_id] = resource
+        self._by_value = {}
+
+    def of_type(self, resource_type: str) -> dict:
+        """Resources of a type, by logical id"""
+        return self._by_type.get(resource_type, {})
+
+    def one(self, resource_type: str) -> dict:
+        """The only resource of a type, AssertionError if there are none or several"""
+        resources = list(self.of_type(resource_type).values())
+        assert len(resources) == 1, f'{len(resources)} {resource_type} in {self.stack_name}'
+        return resources[0]
+
+    def logical_id(self, resource_type: str) -> str:
+        """Logical id of the only resource of a type"""
+        resource = self.one(resource_type)
+        return next(k for k, v in self.of_type(resource_type).items() if v is resource)
+
+    def with_prefix(self, prefix: str) -> dict:
+        """Resources whose logical id starts with prefix, by logical id"""
+        start = bisect.bisect_left(self._ids, prefix)
+        end = bisect.bisect_left(self._ids, prefix + '\uffff')
+        return {logical_id: self.resources[logical_id] for logical_id in self._ids[start:end]}
+
+    @staticmethod
+    def get(value, path: str, default=_missing):
+        """Value at a dotted path, list items by index, like 'Properties.Stages.0.Name'
+
+        Raises
+        ------
+        KeyError
+            The path doesn't exist and no default is given
+        """
+        for key in path.split('.') if path else ():
+            try:
+                value = value[int(key)] if isinstance(value, list) else value[key]
+            except (KeyError, IndexError, ValueError, TypeError):
+                if default is _missing:
+                    raise KeyError(path) from None
+                return default
+        return value
+
+    def where(self, resource_type: str, path: str, value) -> dict:
+        """Resources of a type having value at path, by logical id
+
+        The index of a (type, path) pair is built on its first lookup.
+        """
+        index = self._by_value.get((resource_type, path))
+        if index is None:
+            index = self._by_value[(resource_type, path)] = defaultdict(dict)
+            for logical_id, resource in self.of_type(resource_type).items():
+                found = self.get(resource, path, None)
+                index[json.dumps(found, sort_keys=True)][logical_id] = resource
+        return dict(index.get(json.dumps(value, sort_keys=True), {}))
+
+
+def synth(construct_id: str = construct_id, context: dict = context) -> dict:
+    """Synthesize the stacks of the default environment
+
+    Returns
+    -------
+    dict
+        {stack_name: {'template': dict, 'dependencies': list}}
+
+    """
+    # jsii starts only on a cache miss
+    from aws_cdk import core
+    from aip.stacks import Infra
+
+    app = core.App(context=context)
+    infra = Infra(app, construct_id)
+    assembly = app.synth()
+    stacks = {}
+    for stack in infra.stacks:
+        artifact = assembly.get_stack_by_name(stack.stack_name)
+        stacks[stack.stack_name] = {
+            'template': artifact.template,
+            'dependencies': [v.id for v in artifact.dependencies],
+        }
+    return stacks
+
+
+@functools.lru_cache(maxsize=None)
+def templates() -> dict:
+    """Templates of the test stacks, synthesized once and cached on disk
+
+    Returns
+    -------
+    dict
+        Template by stack name suffix, like 'Network'
+
+    """
+    with open(__file__, 'rb') as fp:
+        harness = hashlib.sha256(fp.read()).hexdigest()
+    key = fingerprint([], dict(context, construct_id=construct_id, harness=harness))
+    path = os.path.join(cache_dir, f'{key}.json')
+    try:
+        with open(path) as fp:
+            stacks = json.load(fp)
+    except (OSError, ValueError):
+        stacks = synth()
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(stacks, fp)
+        os.replace(tmp, path)
+    return {
+        name[len(construct_id) + 1:]: Template(name, stack['template'], stack['dependencies'])
+        for name, stack in stacks.items()
+    }
+
+
+def template(name: str) -> Template:
+    """Template of a test stack by name suffix, like 'Compute'"""
+    return templates()[name]
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aws_cdk import core
+
+from aip.account import AccountResolver
+
+
+class TestAccountResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.cache_file = os.path.join(self.cache_dir.name, 'aip', 'account.json')
+        env = {k: v for k, v in os.environ.items() if not k.startswith(('AWS_', 'CDK_'))}
+        patcher = mock.patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sts = mock.Mock()
+        self.sts.get_caller_identity.return_value = {'Account': '210987654321'}
+        self.sts.meta.region_name = 'eu-west-1'
+        patcher = mock.patch('aip.account.get_client', return_value=self.sts)
+        self.get_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def resolver(self, scope=None, **kwargs):
+        return AccountResolver(scope, cache_file=self.cache_file, **kwargs)
+
+    def test_context(self):
+        app = core.App(context={'account': '123456789012', 'region': 'us-east-1'})
+        self.assertEqual(self.resolver(app).resolve(), ('123456789012', 'us-east-1'))
+        self.get_client.assert_not_called()
+
+    def test_env(self):
+        os.environ.update(CDK_DEFAULT_ACCOUNT='123456789012', AWS_REGION='ap-southeast-2')
+        self.assertEqual(self.resolver().resolve(), ('123456789012', 'ap-southeast-2'))
+        self.get_client.assert_not_called()
+
+        # context wins over env, per value
+        app = core.App(context={'region': 'us-east-1'})
+        self.assertEqual(self.resolver(app).resolve(), ('123456789012', 'us-east-1'))
+
+    def test_sts_then_cache(self):
+        self.assertEqual(self.resolver().resolve(), ('210987654321', 'eu-west-1'))
+        self.assertEqual(self.resolver().resolve(), ('210987654321', 'eu-west-1'))
+        self.assertEqual(self.sts.get_caller_identity.call_count, 1)
+
+    def test_unresolved(self):
+        resolver = self.resolver(sources=[lambda: {'region': 'us-east-1'}])
+        with self.assertRaisesRegex(RuntimeError, 'account'):
+            resolver.resolve()
@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from aip.cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_file = os.path.join(cache_dir.name, 'aip', 'lookup.json')
+        env = {k: v for k, v in os.environ.items() if not k.startswith('AWS_')}
+        patcher = mock.patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self, *scope, ttl=300):
+        return DiskCache(self.cache_file, ttl, *scope)
+
+    def test_read_write(self):
+        self.assertIsNone(self.cache().read())
+        entry = self.cache().write({'value': 1})
+        self.assertEqual(entry['value'], 1)
+        # another cache, like another process, reads the file
+        self.assertEqual(self.cache().read(), entry)
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_file)), ['lookup.json'])
+
+    def test_keys(self):
+        self.cache().write({'value': 1})
+        self.cache('us-east-1', 'Infra').write({'value': 2})
+        self.assertEqual(self.cache().read()['value'], 1)
+        self.assertEqual(self.cache('us-east-1', 'Infra').read()['value'], 2)
+        self.assertIsNone(self.cache('us-east-1', 'Other').read())
+
+        # other credentials don't share the cache
+        with mock.patch.dict(os.environ, AWS_PROFILE='other'):
+            self.assertIsNone(self.cache().read())
+        with mock.patch.dict(os.environ, AWS_ACCESS_KEY_ID='AKIAOTHER'):
+            self.assertIsNone(self.cache().read())
+
+    def test_expired(self):
+        self.cache().write({'value': 1})
+        with mock.patch('aip.cache.time.time', return_value=time.time() + 301):
+            self.assertIsNone(self.cache().read())
+
+    def test_disabled(self):
+        self.assertEqual(self.cache(ttl=0).write({'value': 1})['value'], 1)
+        self.assertFalse(os.path.exists(self.cache_file))
+        self.cache().write({'value': 1})
+        self.assertIsNone(self.cache(ttl=0).read())
+
+    def test_unreadable(self):
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, 'w') as fp:
+            fp.write('{')
+        self.assertIsNone(self.cache().read())
+        self.cache().write({'value': 1})
+        with open(self.cache_file) as fp:
+            self.assertEqual(len(json.load(fp)), 1)
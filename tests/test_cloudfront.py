@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aip.cloudfront import DistributionIndex, website_domain
+
+
+def distribution(distribution_id, *domains):
+    return {
+        'Id': distribution_id,
+        'ARN': f'arn:aws:cloudfront::123456789012:distribution/{distribution_id}',
+        'DomainName': f'{distribution_id.lower()}.cloudfront.net',
+        'Origins': {'Quantity': len(domains), 'Items': [{'Id': v, 'DomainName': v} for v in domains]},
+    }
+
+
+class TestDistributionIndex(unittest.TestCase):
+    web = website_domain('web-bucket', 'us-east-1')
+    pages = [
+        {'DistributionList': {'Items': [
+            distribution('D1', 'other-bucket.s3.amazonaws.com'),
+            # the website isn't the first origin
+            distribution('D2', 'api-123.us-east-1.elb.amazonaws.com', web),
+        ]}},
+        {'DistributionList': {'Items': [distribution('D3', 'third.example.com')]}},
+        {'DistributionList': {}},
+    ]
+    tags = {
+        'D1': [],
+        'D2': [{'Key': 'app', 'Value': 'EricDemo'}],
+        'D3': [{'Key': 'app', 'Value': 'EricDemo'}],
+    }
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_file = os.path.join(cache_dir.name, 'aip', 'cloudfront.json')
+        self.client = mock.Mock()
+        self.client.get_paginator.return_value.paginate.return_value = self.pages
+        self.client.list_tags_for_resource.side_effect = lambda Resource: {
+            'Tags': {'Items': self.tags[Resource.rsplit('/', 1)[-1]]}}
+        patcher = mock.patch('aip.cloudfront.get_client', return_value=self.client)
+        self.get_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def index(self, **kwargs):
+        return DistributionIndex(mock.Mock(region_name='us-east-1'), cache_file=self.cache_file, **kwargs)
+
+    def test_lookup(self):
+        index = self.index()
+        self.assertEqual(index.by_origin(self.web)['Id'], 'D2')
+        self.assertEqual(index.by_origin('third.example.com')['Id'], 'D3')
+        self.assertIsNone(index.by_origin('missing.example.com'))
+        self.assertEqual([v['Id'] for v in index.by_tag('app', 'EricDemo')], ['D2', 'D3'])
+        self.assertEqual(index.by_tag('app', 'Other'), [])
+        self.client.get_paginator.assert_called_once_with('list_distributions')
+        self.assertEqual(self.client.list_tags_for_resource.call_count, 3)
+
+    def test_cached(self):
+        self.assertEqual(self.index().by_origin(self.web)['Id'], 'D2')
+        # another index, like another process, reads the disk cache
+        self.assertEqual(self.index().by_origin(self.web)['Id'], 'D2')
+        self.assertEqual(self.client.get_paginator.call_count, 1)
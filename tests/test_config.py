@@ -0,0 +1,158 @@
+import os
+import json
+import dataclasses
+import tempfile
+import unittest
+from unittest import mock
+
+from aip.config import (
+    ApiConfig,
+    ConfigError,
+    DaxConfig,
+    ServerConfig,
+    TableConfig,
+    WebConfig,
+    load_api_module,
+    load_app_configs,
+    read_json,
+)
+
+
+class TestConfig(unittest.TestCase):
+    web = dict(
+        source_repo='web-repo',
+        build_output='WebBuildOutput',
+        pipeline='WebPipeline',
+        bucket_name='web-bucket',
+    )
+
+    def test_read_api(self):
+        config = WebConfig(**self.web)
+        self.assertEqual(config.bucket_name, 'web-bucket')
+        self.assertEqual(config['bucket_name'], 'web-bucket')
+        self.assertEqual(config.get('bucket_name'), 'web-bucket')
+        self.assertIsNone(config.get('bucket'))
+        self.assertNotIn('bucket', config)
+        self.assertEqual(dict(config.items()), self.web)
+        self.assertEqual(config.to_dict(), self.web)
+        with self.assertRaises(AttributeError):
+            config.bucket
+        with self.assertRaises(KeyError):
+            config['bucket']
+
+    def test_immutable(self):
+        config = WebConfig(**self.web)
+        with self.assertRaises(AttributeError):
+            config.bucket_name = 'other'
+        other = config.replace(bucket_name='other')
+        self.assertEqual((config.bucket_name, other.bucket_name), ('web-bucket', 'other'))
+        with self.assertRaises(ConfigError):
+            config.replace(bucket_name='')
+
+    def test_validation(self):
+        with self.assertRaises(ConfigError):
+            WebConfig(**dict(self.web, bucket_name=None))
+        with self.assertRaises(ConfigError):
+            WebConfig.from_dict(dict(self.web, bucket='typo'))
+        with self.assertRaises(ConfigError):
+            WebConfig.from_dict({'source_repo': 'web-repo'})
+        with self.assertRaises(ConfigError):
+            ApiConfig(
+                source_repo='a', build_output='b', pipeline='c', ecr_repo='d',
+                table_name='e', status_index='f', server={'cpu': 256},
+            )
+
+    def test_server(self):
+        self.assertEqual(ServerConfig.from_dict({}).cpu, 256)
+        self.assertEqual(ServerConfig.from_dict({'cpu': 1024, 'memory': 2048, 'workers_per_cpu': 1}).workers_per_cpu, 1)
+        with self.assertRaises(ConfigError):
+            ServerConfig.from_dict({'cpu': 300})
+        with self.assertRaises(ConfigError):
+            ServerConfig.from_dict({'cpu': 256, 'memory': 4096})
+        with self.assertRaises(ConfigError):
+            ServerConfig.from_dict({'cpu': '256'})
+        with self.assertRaises(ConfigError):
+            ServerConfig.from_dict({'timeout': True})
+
+    def test_table(self):
+        self.assertTrue(TableConfig.from_dict({}).provisioned)
+        self.assertFalse(TableConfig.from_dict({'billing_mode': 'PAY_PER_REQUEST'}).provisioned)
+        self.assertEqual(TableConfig.from_dict({'max_read_capacity': 100}).max_read_capacity, 100)
+        with self.assertRaises(ConfigError):
+            TableConfig.from_dict({'billing_mode': 'ON_DEMAND'})
+        with self.assertRaises(ConfigError):
+            TableConfig.from_dict({'read_capacity': 0})
+        with self.assertRaises(ConfigError):
+            TableConfig.from_dict({'write_capacity': 20, 'max_write_capacity': 10})
+        with self.assertRaises(ConfigError):
+            TableConfig.from_dict({'target_utilization': 95})
+
+    def test_dax(self):
+        self.assertFalse(DaxConfig.from_dict({}).enabled)
+        with self.assertRaises(ConfigError):
+            DaxConfig.from_dict({'replication_factor': 0})
+        with self.assertRaises(ConfigError):
+            DaxConfig.from_dict({'node_type': 'cache.t3.small'})
+        with self.assertRaises(ConfigError):
+            DaxConfig.from_dict({'enabled': 'yes'})
+
+
+class TestLoadAppConfigs(unittest.TestCase):
+    configs = {
+        'api': {
+            'source_repo': 'api-repo', 'ecr_repo': 'api-repo', 'table_name': 'tasks',
+            'status_index': 'status-index', 'cache': {'ttl': 5, 'shared': True},
+        },
+        'web': {'source_repo': 'web-repo', 'bucket_name': 'web-bucket'},
+    }
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        for name, config in self.configs.items():
+            self.write(name, 'config.json', config)
+
+    def write(self, name, filename, content):
+        path = os.path.join(self.root, 'demoapp', name, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            json.dump(content, fp)
+        return path
+
+    def test_load(self):
+        self.assertEqual(load_app_configs(root=self.root), self.configs)
+
+    def test_env_override(self):
+        self.write('api', 'config.dev.json', {'table_name': 'dev-tasks', 'cache': {'ttl': 60}})
+        api = load_app_configs('dev', root=self.root)['api']
+        self.assertEqual(api['table_name'], 'dev-tasks')
+        self.assertEqual(api['cache'], {'ttl': 60, 'shared': True})
+        self.assertEqual(load_app_configs('prod', root=self.root), self.configs)
+
+    def test_cached_until_changed(self):
+        path = os.path.join(self.root, 'demoapp', 'web', 'config.json')
+        with mock.patch('builtins.open', wraps=open) as open_:
+            read_json(path)['bucket_name'] = 'changed'
+            self.assertEqual(read_json(path)['bucket_name'], 'web-bucket')
+        self.assertEqual(open_.call_count, 1)
+
+        self.write('web', 'config.json', dict(self.configs['web'], bucket_name='new-bucket'))
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(read_json(path)['bucket_name'], 'new-bucket')
+
+    def test_missing_key(self):
+        self.write('web', 'config.json', {'source_repo': 'web-repo'})
+        with self.assertRaisesRegex(ConfigError, 'bucket_name'):
+            load_app_configs(root=self.root)
+
+    def test_api_settings(self):
+        # checked like the API does, see demoapp/api/settings.py
+        self.write('api', 'config.dev.json', {'cache': {'tll': 60}})
+        with self.assertRaisesRegex(ConfigError, 'Unknown demoapp/api/config.json cache settings: tll'):
+            load_app_configs('dev', root=self.root)
+
+    def test_server_settings(self):
+        # the API reads the server settings the stack sizes the task with
+        settings = load_api_module('settings').api_settings['server']
+        self.assertEqual(settings, {v.name: v.type for v in dataclasses.fields(ServerConfig)})
@@ -0,0 +1,114 @@
+import os
+import json
+import tempfile
+import unittest
+
+from aws_cdk import core
+from aip.config import ConfigError
+from aip.environments import allocate_cidrs, load_environments
+from aip.outputs import stack_suffixes
+from aip.stacks import Infra
+
+
+class TestAllocateCidrs(unittest.TestCase):
+
+    def test_allocate(self):
+        entries = [{'name': 'a'}, {'name': 'b', 'vpc_cidr': '10.20.0.0/16'}, {'name': 'c'}]
+        self.assertEqual(
+            allocate_cidrs(entries, '10.20.0.0/14'),
+            ['10.21.0.0/16', '10.20.0.0/16', '10.22.0.0/16'],
+        )
+
+    def test_overlap(self):
+        entries = [{'name': 'a', 'vpc_cidr': '10.20.0.0/16'}, {'name': 'b', 'vpc_cidr': '10.20.128.0/17'}]
+        with self.assertRaises(ConfigError):
+            allocate_cidrs(entries, '10.20.0.0/14')
+
+    def test_pool_exhausted(self):
+        entries = [{'name': 'a'}, {'name': 'b'}]
+        with self.assertRaisesRegex(ConfigError, 'b'):
+            allocate_cidrs(entries, '10.20.0.0/16')
+
+
+class TestLoadEnvironments(unittest.TestCase):
+    matrix = {
+        'app': 'Demo',
+        'cidr_pool': '10.20.0.0/14',
+        'environments': [
+            {'name': 'default', 'stack_name': 'Infra', 'vpc_cidr': '10.20.0.0/16'},
+            {'name': 'dev'},
+            {'name': 'prod', 'region': 'eu-west-1', 'server': {'cpu': 1024, 'memory': 2048}},
+        ],
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'environments.json')
+        self.write(self.matrix)
+        self.app = core.App(context={'account': '123456789012', 'region': 'us-east-1'})
+
+    def write(self, matrix):
+        with open(self.path, 'w') as fp:
+            json.dump(matrix, fp)
+
+    def test_load(self):
+        default, dev, prod = load_environments(self.app, path=self.path)
+        self.assertEqual([v.stack_name for v in (default, dev, prod)], ['Infra', 'Infra-dev', 'Infra-prod'])
+        self.assertEqual([v.prefix for v in (default, dev, prod)], ['Demo', 'DemoDev', 'DemoProd'])
+        self.assertEqual([v.vpc_cidr for v in (default, dev, prod)], ['10.20.0.0/16', '10.21.0.0/16', '10.22.0.0/16'])
+        self.assertEqual([v.region for v in (default, dev, prod)], ['us-east-1', 'us-east-1', 'eu-west-1'])
+        self.assertEqual(prod.account, '123456789012')
+        self.assertEqual(prod.app_configs['api']['server']['cpu'], 1024)
+        self.assertEqual(dev.app_configs['api']['table_name'], 'eric-devops-demo-tasks-dev')
+
+    def test_select(self):
+        environments = load_environments(self.app, ['prod'], path=self.path)
+        self.assertEqual([v.name for v in environments], ['prod'])
+        # allocated on the whole matrix
+        self.assertEqual(environments[0].vpc_cidr, '10.22.0.0/16')
+
+    def test_unknown_name(self):
+        with self.assertRaisesRegex(ConfigError, 'qa'):
+            load_environments(self.app, ['dev', 'qa'], path=self.path)
+
+    def test_duplicate_name(self):
+        self.write(dict(self.matrix, environments=self.matrix['environments'] + [{'name': 'dev'}]))
+        with self.assertRaises(ConfigError):
+            load_environments(self.app, path=self.path)
+
+
+class TestEnvironmentStacks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = core.App(context={'account': '123456789012', 'region': 'us-east-1'})
+        cls.infras = [
+            Infra(cls.app, v.stack_name, environment=v)
+            for v in load_environments(cls.app, ['default', 'prod'])
+        ]
+
+    def test_stacks(self):
+        default, prod = self.infras
+        self.assertEqual(default.network.stack_name, 'Infra-Network')
+        self.assertEqual(prod.network.stack_name, 'Infra-prod-Network')
+        self.assertEqual(default.network.vpc.node.default_child.cidr_block, '10.20.0.0/16')
+        self.assertNotEqual(prod.network.vpc.node.default_child.cidr_block, '10.20.0.0/16')
+        self.assertEqual(prod.config.cluster_name, 'EricDemoProdCluster')
+        self.assertEqual(prod.config.api.table_name, 'eric-devops-demo-tasks-prod')
+        self.assertEqual(prod.compute.service.desired_count, 3)
+        self.assertEqual(default.compute.service.desired_count, 2)
+        # on-demand prod table with backups, read through DAX
+        table = prod.data.table.node.default_child
+        self.assertEqual(table.billing_mode, 'PAY_PER_REQUEST')
+        self.assertTrue(table.point_in_time_recovery_specification.point_in_time_recovery_enabled)
+        self.assertEqual(prod.data.dax.node_type, 'dax.r5.large')
+        self.assertIsNone(default.data.dax)
+        self.assertIsNone(default.data.dax_endpoint)
+        task_definition = prod.compute.service.task_definition.node.default_child
+        environment = prod.compute.resolve(task_definition.container_definitions)[0]['environment']
+        self.assertEqual([v['name'] for v in environment], ['TASK_CPU', 'AIP_ENV', 'DAX_ENDPOINT'])
+        # the stacks aip.outputs reads
+        self.assertEqual([v.stack_name for v in prod.stacks], [f'Infra-prod-{v}' for v in stack_suffixes])
+        # environments don't depend on each other
+        self.assertFalse({v.stack_name for v in prod.compute.dependencies} & {v.stack_name for v in default.stacks})
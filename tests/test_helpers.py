@@ -1,13 +1,20 @@
 import os
 import sys
 import re
+import json
+import logging
+import subprocess
 from io import StringIO
 import tempfile
 import unittest
+from unittest import mock
 
 from aip.helpers import (
     get_logger,
+    stop_loggers,
     get_install_requires,
+    get_boto_settings,
+    get_boto_config,
 )
 
 
@@ -75,6 +82,14 @@ class TestInstallRequires(unittest.TestCase):
             'XYZ==20.9999',
         ]
 
+    def test_without_boto3(self):
+        # setup.py reads the requirements before boto3 is installed
+        code = (
+            "import sys; sys.modules.update(boto3=None, botocore=None); "
+            "from aip.helpers import get_install_requires; get_install_requires('base', sys.argv[1])"
+        )
+        subprocess.run([sys.executable, '-c', code, self.base_dir], check=True)
+
 
 class TestGetLogger(unittest.TestCase):
 
@@ -93,3 +108,69 @@ class TestGetLogger(unittest.TestCase):
         self.assertIsNotNone(m)
         self.assertEqual(m.group(1), name)
         self.assertEqual(m.group(2), message)
+
+    def test_get_logger_idempotent(self):
+        stream = StringIO()
+        get_logger('test_idempotent', stream=stream)
+        logger = get_logger('test_idempotent', stream=stream)
+        logger.info('once')
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertEqual(stream.getvalue().count('once'), 1)
+
+    def test_get_logger_json(self):
+        stream = StringIO()
+        expensive = mock.Mock(return_value=42)
+        logger = get_logger('test_json', stream=stream, json_format=True)
+        logger.debug('skipped', extra={'fields': {'value': expensive}})
+        expensive.assert_not_called()
+        logger.info('done %s', 'now', extra={'fields': {'value': expensive, 'route': 'list'}})
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['message'], 'done now')
+        self.assertEqual((entry['value'], entry['route']), (42, 'list'))
+        self.assertEqual((entry['level'], entry['logger']), ('INFO', 'test_json'))
+
+    def test_get_logger_queue_and_sampling(self):
+        stream = StringIO()
+        logger = get_logger('test_queue', logging.DEBUG, stream, use_queue=True, sample_every=3)
+        for i in range(9):
+            logger.debug(f'debug {i}')
+        logger.info('info')
+        stop_loggers()
+        self.assertEqual(logger.handlers, [])
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([v.split()[-2:] for v in lines[:3]], [['debug', '0'], ['debug', '3'], ['debug', '6']])
+        self.assertTrue(lines[3].endswith('info'))
+        self.assertEqual(len(lines), 4)
+
+
+class TestBotoConfig(unittest.TestCase):
+    boto = {
+        'default': {'retry_mode': 'adaptive', 'read_timeout': 5, 'max_pool_connections': 50},
+        'dev': {'read_timeout': 30},
+    }
+
+    def setUp(self):
+        fd, self.config_file = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump({'boto': self.boto}, fp)
+        self.addCleanup(os.unlink, self.config_file)
+
+    def test_settings_per_env(self):
+        settings = get_boto_settings('default', self.config_file)
+        self.assertEqual(settings['read_timeout'], 5)
+        self.assertEqual(settings['retry_mode'], 'adaptive')
+        self.assertEqual(settings['connect_timeout'], 60)
+
+        settings = get_boto_settings('dev', self.config_file)
+        self.assertEqual(settings['read_timeout'], 30)
+        self.assertEqual(settings['max_pool_connections'], 50)
+
+        with mock.patch.dict(os.environ, {'AIP_ENV': 'dev'}):
+            self.assertEqual(get_boto_settings(config_file=self.config_file)['read_timeout'], 30)
+
+    def test_config(self):
+        settings = get_boto_settings('default', self.config_file)
+        config = get_boto_config(settings, max_pool_connections=5)
+        self.assertEqual(config.max_pool_connections, 5)
+        self.assertEqual(config.read_timeout, 5)
+        self.assertEqual(config.retries, {'mode': 'adaptive', 'max_attempts': 5})
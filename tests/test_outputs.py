@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from aip.outputs import StackOutputs
+
+
+def stack(name, **outputs):
+    return {'StackName': name, 'Outputs': [{'OutputKey': k, 'OutputValue': v} for k, v in outputs.items()]}
+
+
+class TestStackOutputs(unittest.TestCase):
+    pages = [
+        {'Stacks': [
+            stack('Infra-Network', VpcId='vpc-123'),
+            stack('Infra-Compute', ClusterArn='arn:aws:ecs:us-east-1:123456789012:cluster/EricDemoCluster'),
+            stack('Other-Compute', ClusterArn='arn:aws:ecs:us-east-1:123456789012:cluster/Other'),
+            # stacks of other environments, named after Infra too
+            stack('Infra-dev-Compute', ClusterArn='arn:aws:ecs:us-east-1:123456789012:cluster/EricDemoDevCluster'),
+            stack('Infra-prod-Network', VpcId='vpc-prod'),
+        ]},
+        {'Stacks': [stack('Infra-Delivery', DistributionDomainName='d1.cloudfront.net'), {'StackName': 'Infra-Data'}]},
+    ]
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_file = os.path.join(cache_dir.name, 'aip', 'outputs.json')
+        self.client = mock.Mock()
+        self.client.get_paginator.return_value.paginate.return_value = self.pages
+        patcher = mock.patch('aip.outputs.get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def outputs(self, stack_name='Infra', **kwargs):
+        session = mock.Mock(region_name='us-east-1')
+        return StackOutputs(stack_name, session, cache_file=self.cache_file, **kwargs)
+
+    def test_lookup(self):
+        outputs = self.outputs()
+        self.assertEqual(outputs.get('ClusterArn'), 'arn:aws:ecs:us-east-1:123456789012:cluster/EricDemoCluster')
+        self.assertEqual(outputs.get('DistributionDomainName'), 'd1.cloudfront.net')
+        self.assertIsNone(outputs.get('TableName'))
+        self.assertEqual(outputs.of_stack('Network'), {'VpcId': 'vpc-123'})
+        self.assertEqual(outputs.of_stack('Data'), {})
+        self.assertEqual(outputs.of_stack('Pipelines'), {})
+        self.assertEqual(sorted(outputs.stacks), ['Compute', 'Data', 'Delivery', 'Network'])
+        self.client.get_paginator.assert_called_once_with('describe_stacks')
+        self.assertEqual(
+            self.outputs('Infra-dev').get('ClusterArn'), 'arn:aws:ecs:us-east-1:123456789012:cluster/EricDemoDevCluster')
+
+    def test_cached(self):
+        self.assertEqual(self.outputs().get('VpcId'), 'vpc-123')
+        self.assertEqual(self.outputs().get('VpcId'), 'vpc-123')
+        self.assertEqual(self.client.get_paginator.call_count, 1)
+
+        # other stacks are cached apart
+        self.assertTrue(self.outputs('Other').get('ClusterArn').endswith('/Other'))
+        self.assertEqual(self.client.get_paginator.call_count, 2)
+
+        outputs = self.outputs()
+        outputs.refresh()
+        self.assertEqual(self.client.get_paginator.call_count, 3)
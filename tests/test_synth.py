@@ -0,0 +1,122 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from aip.environments import Environment
+from aip.synth import SynthCache, changed_stacks, fingerprint, template_hash
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fp:
+        if isinstance(content, str):
+            fp.write(content)
+        else:
+            json.dump(content, fp)
+
+
+class TestFingerprint(unittest.TestCase):
+    environment = Environment(
+        name='default', stack_name='Infra', app='Demo', account='123456789012',
+        region='us-east-1', vpc_cidr='10.20.0.0/16', app_configs={'api': {'table_name': 'tasks'}},
+    )
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        write(os.path.join(self.root, 'app.py'), 'app = None\n')
+        write(os.path.join(self.root, 'aip', 'stacks', 'network.py'), 'vpc = None\n')
+        write(os.path.join(self.root, 'demoapp', 'api', 'config.json'), {'table_name': 'tasks'})
+
+    def key(self, environments=None, context=None):
+        return fingerprint(environments or [self.environment], context or {}, root=self.root)
+
+    def test_stable(self):
+        self.assertEqual(self.key(), self.key())
+        self.assertEqual(self.key(context={'a': 1, 'b': 2}), self.key(context={'b': 2, 'a': 1}))
+
+    def test_inputs(self):
+        key = self.key()
+        self.assertNotEqual(self.key(context={'envs': 'dev'}), key)
+        self.assertNotEqual(self.key([self.environment.replace(region='eu-west-1')]), key)
+
+        write(os.path.join(self.root, 'aip', 'stacks', 'network.py'), 'vpc = 1\n')
+        self.assertNotEqual(self.key(), key)
+        key = self.key()
+        write(os.path.join(self.root, 'demoapp', 'api', 'config.prod.json'), {'table_name': 'prod'})
+        self.assertNotEqual(self.key(), key)
+        key = self.key()
+        # not a synth input
+        write(os.path.join(self.root, 'demoapp', 'api', 'main.py'), 'app = None\n')
+        self.assertEqual(self.key(), key)
+
+
+class TestSynthCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = SynthCache(os.path.join(self.directory, 'cache'), keep=2)
+
+    def assembly(self, name, content):
+        outdir = os.path.join(self.directory, name)
+        write(os.path.join(outdir, 'manifest.json'), {'version': '1'})
+        write(os.path.join(outdir, 'Infra.template.json'), content)
+        return outdir
+
+    def test_store_restore(self):
+        outdir = os.path.join(self.directory, 'restored')
+        self.assertFalse(self.cache.restore('key', outdir))
+        self.cache.store('key', self.assembly('out', {'Resources': {}}))
+        self.assertTrue(self.cache.restore('key', outdir))
+        with open(os.path.join(outdir, 'Infra.template.json')) as fp:
+            self.assertEqual(json.load(fp), {'Resources': {}})
+
+    def test_prune(self):
+        for i in range(3):
+            self.cache.store(f'key{i}', self.assembly(f'out{i}', {'i': i}))
+            os.utime(os.path.join(self.cache.directory, f'key{i}'), (i, i))
+        self.assertEqual(sorted(os.listdir(self.cache.directory)), ['key1', 'key2'])
+
+
+class TestChangedStacks(unittest.TestCase):
+    templates = {
+        'Infra-Network': {'Resources': {'Vpc': {'Type': 'AWS::EC2::VPC'}}},
+        'Infra-Compute': {'Resources': {'Cluster': {'Type': 'AWS::ECS::Cluster'}}},
+        'Infra-Delivery': {'Resources': {'Bucket': {'Type': 'AWS::S3::Bucket'}}},
+        'Infra-Data': {},
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.outdir = directory.name
+        artifacts = {}
+        for name, template in self.templates.items():
+            write(os.path.join(self.outdir, f'{name}.template.json'), template)
+            artifacts[name] = {
+                'type': 'aws:cloudformation:stack',
+                'environment': 'aws://123456789012/us-east-1',
+                'properties': {'templateFile': f'{name}.template.json'},
+            }
+        write(os.path.join(self.outdir, 'manifest.json'), {'artifacts': artifacts})
+
+    def test_template_hash(self):
+        self.assertEqual(template_hash({'a': 1, 'b': [1, 2]}), template_hash({'b': [1, 2], 'a': 1}))
+        self.assertNotEqual(template_hash({'b': [1, 2]}), template_hash({'b': [2, 1]}))
+
+    def test_changed(self):
+        deployed = {
+            # same content, other key order
+            'Infra-Network': json.loads(json.dumps(self.templates['Infra-Network'], sort_keys=True)),
+            'Infra-Compute': {'Resources': {}},
+        }
+        with mock.patch('aip.synth.deployed_template', side_effect=lambda name, region: deployed.get(name)) as get:
+            self.assertEqual(changed_stacks(self.outdir), ['Infra-Compute', 'Infra-Delivery'])
+        # stacks without resources aren't looked up
+        self.assertEqual(sorted(v.args[0] for v in get.call_args_list), ['Infra-Compute', 'Infra-Delivery', 'Infra-Network'])
+        get.assert_any_call('Infra-Network', 'us-east-1')